@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+# Assembles the CI values files from the fragments listed in their `# source_fragments:` header comment.
+#
+# Each values file is `nothing-enabled-values.yaml` with its fragments deep-merged over it in order, as
+# `yq '. *= load(fragment)'` would. Maps are merged, anything else is replaced, so a fragment can remove
+# a value by setting it to null. The result is then tidied up as follows:
+# * Keys are sorted for diff stability if the fragments are reordered
+# * Null values are removed
+# * `enabled: true` is removed for the default enabled components
+# * Maps left empty by that are removed
+# * A comment lists the default enabled components that aren't configured at all
+#
+# It is written out as `yq -P` would, including the comments directly above keys and list items in the
+# fragments. Every fragment is parsed once, however many values files use it, and only values files whose
+# content has changed are written.
+#
+# From the project root: `python -m scripts.assemble_ci_values_files [values files directory]`
+
+import datetime
+import re
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Annotated, Any
+
+import typer
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    # PyYAML built without libyaml. The pure-Python loader parses identically, just slower
+    from yaml import SafeLoader
+
+_values_file_root = Path(__file__).parent.parent / "charts" / "matrix-stack" / "ci"
+
+_source_fragments_pattern = re.compile(r"#\s+source_fragments:\s*(.*)")
+
+# Their `enabled: true` is the chart default, so is removed to keep the values files minimal
+_default_enabled_components = (
+    "matrixRTC",
+    "elementWeb",
+    "initSecrets",
+    "postgres",
+    "matrixAuthenticationService",
+    "synapse",
+    "wellKnownDelegation",
+)
+# The default enabled components that work without any values
+_default_enabled_without_values = ("initSecrets", "postgres", "wellKnownDelegation")
+
+# How Go's YAML library resolves the tag of a plain scalar, which is what yq uses and is close to YAML 1.2's
+# core schema, rather than PyYAML's YAML 1.1 where e.g. `on` is a bool
+_null_values = ("", "~", "null", "Null", "NULL")
+_bool_values = ("true", "True", "TRUE", "false", "False", "FALSE")
+_false_values = ("false", "False", "FALSE")
+_special_float_values = (".inf", ".Inf", ".INF", "+.inf", "+.Inf", "+.INF", "-.inf", "-.Inf", "-.INF")
+_special_float_values += (".nan", ".NaN", ".NAN")
+_int_pattern = re.compile(r"^[-+]?(0[xX][0-9a-fA-F]+|0[oO][0-7]+|0[bB][01]+|[0-9]+)$")
+_float_pattern = re.compile(r"^[-+]?(\.[0-9]+|[0-9]+(\.[0-9]*)?)([eE][-+]?[0-9]+)?$")
+_timestamp_pattern = re.compile(
+    r"^[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}"
+    r"(([Tt]|[ \t]+)[0-9]{1,2}:[0-9]{1,2}:[0-9]{1,2}(\.[0-9]*)?([ \t]*(Z|[-+][0-9]{1,2}(:[0-9]{2})?))?)?$"
+)
+# `yq -P` keeps the quotes of strings that YAML 1.1 would read as bools
+_yaml_1_1_bool_pattern = re.compile(r"^(y|yes|n|no|on|off)$", re.IGNORECASE)
+
+
+def resolve_tag(value: str) -> str:
+    if value in _null_values:
+        return "null"
+    if value in _bool_values:
+        return "bool"
+    if value in _special_float_values:
+        return "float"
+    if value == "<<":
+        return "merge"
+    if value[0] not in "+-.0123456789":
+        return "str"
+    if _timestamp_pattern.match(value):
+        return "timestamp"
+    plain = value.replace("_", "")
+    if _int_pattern.match(plain):
+        return "int"
+    if _float_pattern.match(plain):
+        return "float"
+    return "str"
+
+
+class Plain(str):
+    """A scalar that isn't a string, e.g. a bool or a number, kept as it was written."""
+
+    def __new__(cls, value: str, tag: str):
+        plain = super().__new__(cls, value)
+        plain.tag = tag
+        return plain
+
+
+class QuotedString(str):
+    """A string that keeps the quotes it was written with."""
+
+    def __new__(cls, value: str, style: str):
+        quoted = super().__new__(cls, value)
+        quoted.style = style
+        return quoted
+
+
+class Mapping(dict):
+    """A map with the comment lines directly above each of its keys."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.comments: dict[str, list[str]] = {}
+
+
+class Sequence(list):
+    """A list with the comment lines directly above each of its items, by index."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.comments: dict[int, list[str]] = {}
+
+
+class _Loader(SafeLoader):
+    def resolve(self, kind, value, implicit):
+        if kind is yaml.ScalarNode and implicit[0]:
+            return f"tag:yaml.org,2002:{resolve_tag(value)}"
+        return super().resolve(kind, value, implicit)
+
+
+class _HeadComments:
+    """The comment lines directly above each line of a document, each claimed by the outermost node on that line."""
+
+    def __init__(self, lines: list[str], node: yaml.Node):
+        self.lines = lines
+        self.claimed: set[int] = set()
+        # Lines of multi-line scalars that happen to start with a # aren't comments
+        self.scalar_lines: set[int] = set()
+        self._find_scalar_lines(node)
+
+    def _find_scalar_lines(self, node: yaml.Node):
+        if isinstance(node, yaml.ScalarNode):
+            # A block scalar ends at the start of the line after its content
+            end_line = node.end_mark.line if node.end_mark.column == 0 else node.end_mark.line + 1
+            self.scalar_lines.update(range(node.start_mark.line, end_line))
+        elif isinstance(node, yaml.MappingNode):
+            for key_node, value_node in node.value:
+                self._find_scalar_lines(key_node)
+                self._find_scalar_lines(value_node)
+        elif isinstance(node, yaml.SequenceNode):
+            for item_node in node.value:
+                self._find_scalar_lines(item_node)
+
+    def take(self, line: int) -> list[str] | None:
+        if line in self.claimed:
+            return None
+        self.claimed.add(line)
+        comment_lines = []
+        for above in range(line - 1, -1, -1):
+            text = self.lines[above].strip()
+            if not text.startswith("#") or above in self.scalar_lines:
+                break
+            comment_lines.insert(0, text)
+        return comment_lines or None
+
+
+def _from_node(node: yaml.Node, head_comments: _HeadComments) -> Any:
+    if isinstance(node, yaml.MappingNode):
+        mapping = Mapping()
+        for key_node, value_node in node.value:
+            key = _from_node(key_node, head_comments)
+            comment = head_comments.take(key_node.start_mark.line)
+            if comment is not None:
+                mapping.comments[key] = comment
+            mapping[key] = _from_node(value_node, head_comments)
+        return mapping
+    if isinstance(node, yaml.SequenceNode):
+        sequence = Sequence()
+        for item_node in node.value:
+            comment = head_comments.take(item_node.start_mark.line)
+            if comment is not None:
+                sequence.comments[len(sequence)] = comment
+            sequence.append(_from_node(item_node, head_comments))
+        return sequence
+
+    tag = node.tag.removeprefix("tag:yaml.org,2002:")
+    if tag == "null":
+        return None
+    if tag != "str":
+        return Plain(node.value, tag)
+    if node.style in ("'", '"') and _yaml_1_1_bool_pattern.match(node.value):
+        return QuotedString(node.value, node.style)
+    return node.value
+
+
+def load(path: Path) -> Any:
+    """Parses a YAML file, keeping the comments directly above keys and list items."""
+    text = path.read_text("utf-8")
+    loader = _Loader(text)
+    try:
+        node = loader.get_single_node()
+    finally:
+        loader.dispose()
+    if node is None:
+        return None
+    return _from_node(node, _HeadComments(text.splitlines(), node))
+
+
+def merge(base: Any, overlay: Any) -> Any:
+    """Deep merges overlay over base without modifying either, as yq's `*` does."""
+    if not (isinstance(base, Mapping) and isinstance(overlay, Mapping)):
+        return overlay
+    merged = Mapping(base)
+    merged.comments = base.comments | overlay.comments
+    for key, value in overlay.items():
+        merged[key] = merge(merged[key], value) if key in merged else value
+    return merged
+
+
+def _sorted_without_nulls(value: Any) -> Any:
+    # Builds a new copy of every map and list, so the copy can be modified without touching the fragments
+    if isinstance(value, Mapping):
+        mapping = Mapping()
+        for key in sorted(value):
+            if value[key] is not None:
+                mapping[key] = _sorted_without_nulls(value[key])
+                if key in value.comments:
+                    mapping.comments[key] = value.comments[key]
+        return mapping
+    if isinstance(value, Sequence):
+        sequence = Sequence()
+        for index, item in enumerate(value):
+            if item is not None:
+                if index in value.comments:
+                    sequence.comments[len(sequence)] = value.comments[index]
+                sequence.append(_sorted_without_nulls(item))
+        return sequence
+    return value
+
+
+def _without_empty_maps(value: Any) -> Any:
+    # Only maps that are empty to start with are removed, not those that become empty as a result
+    if isinstance(value, Mapping):
+        empty_keys = [key for key, item in value.items() if isinstance(item, Mapping) and not item]
+        for key in empty_keys:
+            del value[key]
+            value.comments.pop(key, None)
+        for item in value.values():
+            _without_empty_maps(item)
+    elif isinstance(value, Sequence):
+        comments = value.comments
+        kept = [(index, item) for index, item in enumerate(value) if not (isinstance(item, Mapping) and not item)]
+        value[:] = [item for _, item in kept]
+        value.comments = {new: comments[old] for new, (old, _) in enumerate(kept) if old in comments}
+        for item in value:
+            _without_empty_maps(item)
+    return value
+
+
+def _is_truthy(value: Any) -> bool:
+    return value is not None and not (isinstance(value, Plain) and value.tag == "bool" and value in _false_values)
+
+
+def assemble_values(base: Any, fragments: Iterable[Any]) -> tuple[Mapping, str | None]:
+    """The values from merging the fragments over the base values and tidying them up, with their head comment."""
+    values = base
+    for fragment in fragments:
+        # yq leaves the values as they are when merging in an empty file
+        if fragment is not None:
+            values = merge(values, fragment)
+
+    values = _sorted_without_nulls(values)
+    for component in _default_enabled_components:
+        if isinstance(values.get(component), Mapping) and _is_truthy(values[component].get("enabled")):
+            del values[component]["enabled"]
+    values = _without_empty_maps(values)
+
+    unconfigured = [component for component in _default_enabled_without_values if component not in values]
+    if not unconfigured:
+        return values, None
+    return values, f"{', '.join(unconfigured)} don't have any required properties to be set and defaults to enabled"
+
+
+# The formatting of scalars follows libyaml, which both PyYAML and Go's YAML library are ports of. Lines are
+# never wrapped and anything multi-line is a literal block if possible
+_scalar_analyser = yaml.emitter.Emitter(None, allow_unicode=True)
+
+_double_quoted_escapes = {
+    "\0": "0",
+    "\x07": "a",
+    "\x08": "b",
+    "\x09": "t",
+    "\x0a": "n",
+    "\x0b": "v",
+    "\x0c": "f",
+    "\x0d": "r",
+    "\x1b": "e",
+    '"': '"',
+    "\\": "\\",
+    "\x85": "N",
+    "\xa0": "_",
+    "\u2028": "L",
+    "\u2029": "P",
+}
+
+
+def _double_quoted(value: str) -> str:
+    quoted = []
+    for character in value:
+        if character in _double_quoted_escapes:
+            quoted.append("\\" + _double_quoted_escapes[character])
+        elif character.isprintable() or character == " ":
+            quoted.append(character)
+        elif ord(character) <= 0xFF:
+            quoted.append(f"\\x{ord(character):02X}")
+        elif ord(character) <= 0xFFFF:
+            quoted.append(f"\\u{ord(character):04X}")
+        else:
+            quoted.append(f"\\U{ord(character):08X}")
+    return '"' + "".join(quoted) + '"'
+
+
+def _inline_scalar(value: Any, is_key: bool = False) -> str | None:
+    """The scalar as it is written on a single line, or None if it should be a literal block instead."""
+    if value is None:
+        return "null"
+    if isinstance(value, Plain):
+        return str(value)
+
+    analysis = _scalar_analyser.analyze_scalar(value)
+    style = getattr(value, "style", None)
+    if style is None and resolve_tag(value) != "str":
+        style = '"'
+    elif style is None:
+        if "\n" in value and not is_key and analysis.allow_block:
+            return None
+        if analysis.allow_block_plain and not (is_key and (analysis.empty or analysis.multiline)):
+            return value
+        style = "'"
+    if style == "'" and analysis.allow_single_quoted and not (is_key and analysis.multiline):
+        return "'" + value.replace("'", "''") + "'"
+    return _double_quoted(value)
+
+
+def _literal_block(value: str, indent: int) -> list[str]:
+    indicators = "2" if value[0] in " \n" else ""
+    if not value.endswith("\n"):
+        indicators += "-"
+    elif value == "\n" or value.endswith("\n\n"):
+        indicators += "+"
+    lines = value.split("\n")
+    if value.endswith("\n"):
+        lines.pop()
+    return [f"|{indicators}"] + [(" " * indent + line) if line else "" for line in lines]
+
+
+def _node_lines(value: Any, indent: int) -> list[str]:
+    """The lines of a map or list in block style, with the first line starting at the given indent."""
+    lines = []
+    if isinstance(value, Mapping):
+        for key, item in value.items():
+            lines += [" " * indent + comment for comment in value.comments.get(key, [])]
+            lines += _entry_lines(" " * indent + _inline_scalar(key, is_key=True) + ":", item, indent)
+    else:
+        for index, item in enumerate(value):
+            lines += [" " * indent + comment for comment in value.comments.get(index, [])]
+            if isinstance(item, Mapping | Sequence) and item:
+                item_lines = _node_lines(item, indent + 2)
+                lines.append(" " * indent + "- " + item_lines[0][indent + 2 :])
+                lines += item_lines[1:]
+            else:
+                lines += _entry_lines(" " * indent + "-", item, indent)
+    return lines
+
+
+def _entry_lines(prefix: str, value: Any, indent: int) -> list[str]:
+    if isinstance(value, Mapping | Sequence):
+        if not value:
+            return [f"{prefix} {'{}' if isinstance(value, Mapping) else '[]'}"]
+        return [prefix] + _node_lines(value, indent + 2)
+    inline = _inline_scalar(value)
+    if inline is None:
+        block = _literal_block(value, indent + 2)
+        return [f"{prefix} {block[0]}"] + block[1:]
+    return [f"{prefix} {inline}"]
+
+
+def dump(values: Mapping, head_comment: str | None = None) -> str:
+    """The values formatted as `yq -P` does."""
+    lines = [f"# {line}" for line in head_comment.split("\n")] if head_comment is not None else []
+    lines += _node_lines(values, 0) if values else ["{}"]
+    return "\n".join(lines) + "\n"
+
+
+def source_fragments(values_file: Path) -> str | None:
+    for line in values_file.read_text("utf-8").splitlines():
+        match = _source_fragments_pattern.search(line)
+        if match is not None:
+            return match.group(1)
+    return None
+
+
+def values_file_header(fragment_names: str, copyright_year: int) -> str:
+    # REUSE-IgnoreStart
+    return f"""# Copyright 2024-{copyright_year} New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+#
+# source_fragments: {fragment_names}
+# DO NOT EDIT DIRECTLY. Edit the fragment files to add / modify / remove values
+
+"""
+    # REUSE-IgnoreEnd
+
+
+class ValuesFileAssembly:
+    """The assembled values files of a CI directory, from its fragments each parsed once."""
+
+    def __init__(self, values_file_root: Path = _values_file_root, copyright_year: int | None = None):
+        self.values_file_root = values_file_root
+        self.copyright_year = copyright_year or datetime.date.today().year
+        self.values_files = {
+            values_file: source_fragments(values_file) for values_file in sorted(values_file_root.glob("*-values.yaml"))
+        }
+        self.base: Any = None
+        self.fragments: dict[str, Any] = {}
+
+    def _load_fragments(self, executor: ThreadPoolExecutor):
+        fragment_names = {
+            fragment_name
+            for fragment_names in self.values_files.values()
+            if fragment_names is not None
+            for fragment_name in fragment_names.split()
+        }
+        for fragment_name in fragment_names:
+            fragment_path = self.values_file_root / "fragments" / fragment_name
+            if not fragment_path.is_file():
+                raise FileNotFoundError(f"{fragment_path} must be a file that exists")
+        fragment_names = sorted(fragment_names)
+        paths = [self.values_file_root / "fragments" / fragment_name for fragment_name in fragment_names]
+        self.fragments = dict(zip(fragment_names, executor.map(load, paths), strict=True))
+
+    def contents(self, fragment_names: str) -> str:
+        values, head_comment = assemble_values(
+            self.base, [self.fragments[fragment_name] for fragment_name in fragment_names.split()]
+        )
+        return values_file_header(fragment_names, self.copyright_year) + dump(values, head_comment)
+
+    def _write_if_changed(self, values_file: Path, fragment_names: str) -> bool:
+        contents = self.contents(fragment_names)
+        if values_file.read_text("utf-8") == contents:
+            return False
+        values_file.write_text(contents, "utf-8")
+        return True
+
+    def assemble(self) -> dict[Path, bool | None]:
+        """Writes the values files whose contents have changed, returning which changed or None if skipped."""
+        with ThreadPoolExecutor() as executor:
+            self.base = load(self.values_file_root / "nothing-enabled-values.yaml")
+            self._load_fragments(executor)
+            to_assemble = {
+                values_file: fragment_names
+                for values_file, fragment_names in self.values_files.items()
+                if fragment_names is not None
+            }
+            changed = dict(
+                zip(to_assemble, executor.map(self._write_if_changed, to_assemble, to_assemble.values()), strict=True)
+            )
+        return {values_file: changed.get(values_file) for values_file in self.values_files}
+
+
+def assemble_ci_values_files(
+    values_file_root: Annotated[Path, typer.Argument()] = _values_file_root,
+):
+    if not values_file_root.is_dir():
+        raise typer.BadParameter(f"{values_file_root} must be a directory that exists")
+
+    assembly = ValuesFileAssembly(values_file_root)
+    for values_file, changed in assembly.assemble().items():
+        if changed is None:
+            print(f"{values_file} doesn't have a source_fragments header comment. Skipping")
+        elif changed:
+            print(f"Generated {values_file} from {assembly.values_files[values_file]}")
+
+
+def main():
+    typer.run(assemble_ci_values_files)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+# Builds values.schema.json and values.yaml of a chart from its source/ directory, only rebuilding
+# the outputs whose inputs have changed since they were last built.
+#
+# The content hashes of the inputs and the output of each build are recorded in .assembly-cache/. An output
+# is rebuilt if any of its inputs, including the script that builds it, has been added, removed or changed,
+# or if the output itself has been changed or removed since.
+#
+# From the project root: `python -m scripts.assemble_helm_charts [--force] [--watch] [chart directories...]`
+
+import datetime
+import hashlib
+import json
+import subprocess
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+from .construct_helm_schema import construct_helm_schema
+from .construct_helm_values import construct_values_file
+
+_project_root = Path(__file__).parent.parent
+_cache_directory = _project_root / ".assembly-cache"
+
+
+def file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+@dataclass(frozen=True)
+class Output:
+    name: str
+    # The files the output is built from, relative to the chart directory
+    input_patterns: tuple[str, ...]
+    # The script that builds the output, so that changes to how it is built also rebuild it
+    builder_script: Path
+    build: Callable[[Path, Path], None]
+    # Anything else the output depends on that isn't a file
+    extra_inputs: Callable[[], dict[str, str]] = dict
+
+    def inputs(self, chart_dir: Path) -> dict[str, str]:
+        paths = {path for pattern in self.input_patterns for path in chart_dir.glob(pattern) if path.is_file()}
+        hashes = {path.relative_to(chart_dir).as_posix(): file_hash(path) for path in sorted(paths)}
+        hashes[self.builder_script.relative_to(_project_root).as_posix()] = file_hash(self.builder_script)
+        return hashes | self.extra_inputs()
+
+
+def _copyright_year() -> dict[str, str]:
+    return {"copyright year": str(datetime.date.today().year)}
+
+
+def _build_values_schema(chart_dir: Path, destination: Path):
+    construct_helm_schema(chart_dir / "source" / "values.schema.json", destination)
+
+
+def _build_values(chart_dir: Path, destination: Path):
+    construct_values_file(chart_dir / "source" / "values.yaml.j2", destination)
+    # REUSE-IgnoreStart
+    subprocess.run(
+        [
+            "reuse",
+            "annotate",
+            f"--copyright=Copyright 2024-{datetime.date.today().year} New Vector Ltd",
+            "--license",
+            "AGPL-3.0-only",
+            str(destination),
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    # REUSE-IgnoreEnd
+
+
+outputs = (
+    Output(
+        name="values.schema.json",
+        input_patterns=("source/**/*.json",),
+        builder_script=Path(__file__).parent / "construct_helm_schema.py",
+        build=_build_values_schema,
+    ),
+    Output(
+        name="values.yaml",
+        input_patterns=("source/**/*.j2",),
+        builder_script=Path(__file__).parent / "construct_helm_values.py",
+        build=_build_values,
+        extra_inputs=_copyright_year,
+    ),
+)
+
+
+class ChartAssembly:
+    """The outputs of a chart and what they were last built from."""
+
+    def __init__(
+        self, chart_dir: Path, outputs: tuple[Output, ...] = outputs, cache_directory: Path = _cache_directory
+    ):
+        self.chart_dir = chart_dir
+        self.outputs = outputs
+        self.manifest_path = cache_directory / f"{chart_dir.resolve().name}.json"
+        try:
+            self.manifest: dict[str, dict] = json.loads(self.manifest_path.read_text("utf-8"))
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def is_up_to_date(self, output: Output, inputs: dict[str, str]) -> bool:
+        recorded = self.manifest.get(output.name)
+        output_path = self.chart_dir / output.name
+        return (
+            recorded is not None
+            and recorded["inputs"] == inputs
+            and output_path.is_file()
+            and recorded["output"] == file_hash(output_path)
+        )
+
+    def assemble(self, force: bool = False) -> dict[str, float | None]:
+        """Builds the outputs that are out of date, returning how long each took or None if it was up to date."""
+        timings: dict[str, float | None] = {}
+        for output in self.outputs:
+            inputs = output.inputs(self.chart_dir)
+            if not force and self.is_up_to_date(output, inputs):
+                timings[output.name] = None
+                continue
+
+            started_at = time.perf_counter()
+            output.build(self.chart_dir, self.chart_dir / output.name)
+            timings[output.name] = time.perf_counter() - started_at
+            self.manifest[output.name] = {"inputs": inputs, "output": file_hash(self.chart_dir / output.name)}
+
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        self.manifest_path.write_text(json.dumps(self.manifest, indent=2, sort_keys=True) + "\n", "utf-8")
+        return timings
+
+    def input_mtimes(self) -> dict[Path, int]:
+        """The modification time of every input, to cheaply notice when any are added, removed or changed."""
+        mtimes = {}
+        for output in self.outputs:
+            for pattern in output.input_patterns:
+                for path in self.chart_dir.glob(pattern):
+                    try:
+                        mtimes[path] = path.stat().st_mtime_ns
+                    except OSError:
+                        continue
+            mtimes[output.builder_script] = output.builder_script.stat().st_mtime_ns
+        return mtimes
+
+
+def _report(assembly: ChartAssembly, timings: dict[str, float | None]):
+    for name, seconds in timings.items():
+        status = "up to date" if seconds is None else f"built in {seconds * 1000:.0f}ms"
+        print(f"{assembly.chart_dir / name}: {status}")
+
+
+def assemble_helm_charts(
+    chart_dirs: Annotated[list[Path] | None, typer.Argument()] = None,
+    force: Annotated[bool, typer.Option(help="Rebuild every output, even if its inputs haven't changed")] = False,
+    watch: Annotated[bool, typer.Option(help="Keep running and rebuild the outputs whenever an input changes")] = False,
+    interval: Annotated[float, typer.Option(help="How often to check the inputs for changes, in seconds")] = 0.1,
+):
+    chart_dirs = chart_dirs or [_project_root / "charts" / "matrix-stack"]
+    for chart_dir in chart_dirs:
+        if not (chart_dir / "source" / "values.schema.json").is_file():
+            raise typer.BadParameter(f"{chart_dir}/source/values.schema.json not found")
+
+    assemblies = [ChartAssembly(chart_dir) for chart_dir in chart_dirs]
+    for assembly in assemblies:
+        _report(assembly, assembly.assemble(force))
+    if not watch:
+        return
+
+    # Polled, as it needs nothing beyond the standard library and stat-ing the few dozen inputs is cheap
+    print("Watching for changes, Ctrl+C to stop")
+    last_mtimes = [assembly.input_mtimes() for assembly in assemblies]
+    try:
+        while True:
+            time.sleep(interval)
+            for index, assembly in enumerate(assemblies):
+                mtimes = assembly.input_mtimes()
+                if mtimes == last_mtimes[index]:
+                    continue
+                last_mtimes[index] = mtimes
+                try:
+                    timings = assembly.assemble()
+                except Exception as e:
+                    # A half-saved source file shouldn't stop the watch
+                    print(f"{assembly.chart_dir}: failed to build: {e}")
+                    continue
+                _report(assembly, {name: seconds for name, seconds in timings.items() if seconds is not None})
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    typer.run(assemble_helm_charts)
+
+
+if __name__ == "__main__":
+    main()
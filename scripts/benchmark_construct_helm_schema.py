@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+# Times each stage of constructing the Helm schema from its source schema and sub-schemas.
+#
+# From the project root: `python -m scripts.benchmark_construct_helm_schema [source schema]`
+
+import json
+import time
+from pathlib import Path
+from typing import Annotated, Any
+
+import typer
+
+from .construct_helm_schema import SchemaWalker, SubSchemas, default_additionalProperties_to_off
+
+
+def count_refs(schema_part: Any) -> int:
+    if isinstance(schema_part, dict):
+        return int("$ref" in schema_part) + sum(count_refs(value) for value in schema_part.values())
+    if isinstance(schema_part, list):
+        return sum(count_refs(value) for value in schema_part)
+    return 0
+
+
+def benchmark_construct_helm_schema(
+    source_schema: Annotated[Path, typer.Argument()] = Path("charts/matrix-stack/source/values.schema.json"),
+    repeats: int = 20,
+):
+    timings: dict[str, list[float]] = {"read": [], "walk": [], "write": []}
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        schema_contents = json.loads(source_schema.read_text(encoding="UTF-8"))
+        timings["read"].append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        sub_schemas = SubSchemas(source_schema)
+        walker = SchemaWalker(
+            [lambda schema_part: default_additionalProperties_to_off(source_schema, schema_part)], sub_schemas
+        )
+        constructed = walker.walk(schema_contents)
+        timings["walk"].append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        json.dumps(constructed, indent=2)
+        timings["write"].append(time.perf_counter() - started_at)
+
+    sub_schema_paths = sorted(sub_schemas.parsed)
+    refs = count_refs(schema_contents) + sum(count_refs(sub_schemas.parsed[path]) for path in sub_schema_paths)
+    print(f"{source_schema}: {refs} $refs to {len(sub_schema_paths)} sub-schemas, each read and walked once")
+    print(f"{'stage':<8} {'best ms':>8} {'mean ms':>8}")
+    for stage, stage_timings in timings.items():
+        print(f"{stage:<8} {min(stage_timings) * 1000:>8.2f} {sum(stage_timings) / len(stage_timings) * 1000:>8.2f}")
+    print(f"{'total':<8} {sum(min(stage_timings) for stage_timings in timings.values()) * 1000:>8.2f}")
+
+
+def main():
+    typer.run(benchmark_construct_helm_schema)
+
+
+if __name__ == "__main__":
+    main()
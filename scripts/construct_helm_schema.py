@@ -13,31 +13,66 @@ import typer
 
 # Implements the visitor pattern over a JSON schema to return a mutated JSON schema.
 #
-# For a given JSON schema fragment a function will be called to either mutate or remove
-# this schema fragment (or parts of it).
+# For a given JSON schema fragment each function will be called in turn to either mutate or remove
+# this schema fragment (or parts of it). The schema is walked once, whatever the number of functions.
 # - For schema fragments that are objects, each sub-property will be recursively mutated
 #   after the fragment itself has been mutated
 # - For schema fragments that are arrays, the type of the array will be recursively mutated
 #   after the fragment itself has been mutated
 # - For schema fragments that are scalars, the value after mutation is simply returned
+#
+# If given sub-schemas, any `$ref` is inlined before the functions are called. Each referenced sub-schema
+# is only walked once and the result is shared by every fragment that references it, so the walked schema
+# must not be mutated afterwards.
+class SchemaWalker:
+    def __init__(self, callables: list[Callable[[dict[Any]], dict[Any]]], sub_schemas: "SubSchemas | None" = None):
+        self.callables = callables
+        self.sub_schemas = sub_schemas
+        self._walked_sub_schemas: dict[Path, dict[Any] | None] = {}
+        self._walking_sub_schemas: list[Path] = []
+
+    def walk(self, schema_part: dict[Any]) -> dict[Any]:
+        if self.sub_schemas is not None and "$ref" in schema_part:
+            return self._walk_sub_schema(schema_part)
+
+        # Copied once so the callables can mutate it, without mutating what was given
+        result = schema_part.copy()
+        for callable in self.callables:
+            result = callable(result)
+            if result is None:
+                return None
+
+        # This is an object, so look at all its properties recursively
+        if "properties" in result:
+            updated_properties = {}
+            for property in result["properties"]:
+                walked_property = self.walk(result["properties"][property])
+                # Skip re-adding properties that have been removed by the callable
+                if walked_property is not None:
+                    updated_properties[property] = walked_property
+            result["properties"] = updated_properties
+        # This is an array so look at the definition of the array items
+        elif "items" in result:
+            result["items"] = self.walk(result["items"])
+        return result
+
+    def _walk_sub_schema(self, schema_part: dict[Any]) -> dict[Any]:
+        sub_schema_path = self.sub_schemas.path(schema_part)
+        if sub_schema_path in self._walking_sub_schemas:
+            cycle = self._walking_sub_schemas[self._walking_sub_schemas.index(sub_schema_path) :] + [sub_schema_path]
+            raise Exception(f"Sub-schemas reference each other in a cycle: {' -> '.join(str(path) for path in cycle)}")
+
+        if sub_schema_path not in self._walked_sub_schemas:
+            self._walking_sub_schemas.append(sub_schema_path)
+            try:
+                self._walked_sub_schemas[sub_schema_path] = self.walk(self.sub_schemas.inline(schema_part))
+            finally:
+                self._walking_sub_schemas.pop()
+        return self._walked_sub_schemas[sub_schema_path]
+
+
 def schema_walker(schema_part: dict[Any], callable: Callable[[dict[any]], dict[any]]) -> dict[Any]:
-    result = callable(schema_part.copy())
-    if result is None:
-        return None
-
-    # This is an object, so look at all its properties recursively
-    if "properties" in result:
-        updated_properties = {}
-        for property in result["properties"]:
-            walked_property = schema_walker(result["properties"][property], callable)
-            # Skip re-adding properties that have been removed by the callable
-            if walked_property is not None:
-                updated_properties[property] = walked_property
-        result["properties"] = updated_properties
-    # This is an array so look at the definition of the array items
-    elif "items" in result:
-        result["items"] = schema_walker(result["items"], callable)
-    return result
+    return SchemaWalker([callable]).walk(schema_part)
 
 
 # Inline any sub-schemas referenced in other files
@@ -49,26 +84,46 @@ def schema_walker(schema_part: dict[Any], callable: Callable[[dict[any]], dict[a
 # inline the sub-schemas. Symlinks were tried but they were obnoxiously noisy due to
 # https://helm.sh/blog/2019-10-30-helm-symlink-security-notice/. We don't want to rely on keeping
 # complex sub-schemas in-sync for multiple charts/containers/etc, so use this script to merge
-def inline_sub_schemas(source_schema: Path, schema_part: dict[Any]) -> dict[Any]:
-    # We're currently assuming that all $refs are file relative refs.
-    # This won't always be true but lets keep this as simple as we need it for now
-    if "$ref" in schema_part:
+#
+# Each sub-schema is read and parsed once, however many times it is referenced
+class SubSchemas:
+    def __init__(self, source_schema: Path):
+        self.source_schema = source_schema
+        # Every sub-schema read so far, by its resolved path
+        self.parsed: dict[Path, dict[Any]] = {}
+
+    def path(self, schema_part: dict[Any]) -> Path:
+        # We're currently assuming that all $refs are file relative refs.
+        # This won't always be true but lets keep this as simple as we need it for now
         # If we're inlining a sub-schema we're only returning things from the inlined sub-schema
         assert len(schema_part.keys()) == 1
 
         sub_schema_ref = schema_part["$ref"]
-        sub_schema = source_schema.parent / sub_schema_ref.replace("file://", "")
-        if not sub_schema.exists() or not sub_schema.is_file():
-            raise Exception(f"{sub_schema} does not exist relative to {source_schema}. Please appropriately create it")
+        return (self.source_schema.parent / sub_schema_ref.replace("file://", "")).resolve()
 
-        inlined_sub_schema = json.loads(sub_schema.read_text(encoding="UTF-8"))
+    def inline(self, schema_part: dict[Any]) -> dict[Any]:
+        sub_schema = self.path(schema_part)
+        if sub_schema not in self.parsed:
+            if not sub_schema.exists() or not sub_schema.is_file():
+                raise Exception(
+                    f"{sub_schema} does not exist relative to {self.source_schema}. Please appropriately create it"
+                )
 
-        # It doesn't make sense for the root of the inlined sub-schema to immediately be referencing something else
-        assert "$ref" not in inlined_sub_schema
-        # We're only inlining objects or arrays for now to keep this easy to reason about
-        assert inlined_sub_schema["type"] in ["object", "array"]
+            inlined_sub_schema = json.loads(sub_schema.read_text(encoding="UTF-8"))
 
-        return inlined_sub_schema
+            # It doesn't make sense for the root of the inlined sub-schema to immediately be referencing something else
+            assert "$ref" not in inlined_sub_schema
+            # We're only inlining objects or arrays for now to keep this easy to reason about
+            assert inlined_sub_schema["type"] in ["object", "array"]
+            self.parsed[sub_schema] = inlined_sub_schema
+
+        # The parsed sub-schema is shared, so is only ever copied and not mutated
+        return self.parsed[sub_schema]
+
+
+def inline_sub_schemas(source_schema: Path, schema_part: dict[Any]) -> dict[Any]:
+    if "$ref" in schema_part:
+        return SubSchemas(source_schema).inline(schema_part)
 
     return schema_part
 
@@ -85,12 +140,10 @@ def default_additionalProperties_to_off(_: Path, schema_part: dict[Any]) -> dict
 
 def construct_helm_schema(source_schema: Path, destination_schema: Path):
     schema_manipulators = [
-        lambda schema_part: inline_sub_schemas(source_schema, schema_part),
         lambda schema_part: default_additionalProperties_to_off(source_schema, schema_part),
     ]
     schema_contents = json.loads(source_schema.read_text(encoding="UTF-8"))
-    for schema_manipulator in schema_manipulators:
-        schema_contents = schema_walker(schema_contents, schema_manipulator)
+    schema_contents = SchemaWalker(schema_manipulators, SubSchemas(source_schema)).walk(schema_contents)
 
     destination_schema.write_text(json.dumps(schema_contents, indent=2) + "\n")
 
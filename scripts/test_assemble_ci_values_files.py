@@ -0,0 +1,102 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+from .assemble_ci_values_files import ValuesFileAssembly, values_file_header
+
+_ci_directory = Path(__file__).parent.parent / "charts" / "matrix-stack" / "ci"
+
+
+def test_assembles_the_committed_values_files_unchanged():
+    committed_year = re.search(r"Copyright 2024-(\d+)", (_ci_directory / "pytest-synapse-values.yaml").read_text())
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        values_file_root = Path(temporary_folder) / "ci"
+        shutil.copytree(_ci_directory, values_file_root)
+
+        changed = ValuesFileAssembly(values_file_root, int(committed_year.group(1))).assemble()
+        assert [values_file.name for values_file, was_changed in changed.items() if was_changed] == []
+        assert sum(was_changed is False for was_changed in changed.values()) > 40
+        for values_file in changed:
+            assert values_file.read_bytes() == (_ci_directory / values_file.name).read_bytes()
+
+
+def test_merges_fragments_and_tidies_the_values():
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        values_file_root = Path(temporary_folder)
+        (values_file_root / "fragments").mkdir()
+        (values_file_root / "nothing-enabled-values.yaml").write_text(
+            "# Copyright\n\nsynapse:\n  enabled: false\nelementWeb:\n  enabled: false\n"
+        )
+        (values_file_root / "fragments" / "first.yaml").write_text(
+            """# Copyright
+
+synapse:
+  enabled: true
+  extraArgs:
+  - --first
+  workers:
+    # A comment
+    event-persister:
+      enabled: true
+  ingress:
+    host: synapse.localhost
+"""
+        )
+        (values_file_root / "fragments" / "second.yaml").write_text(
+            """elementWeb:
+  enabled: true
+  additional:
+    config: |
+      {"key": "value"}
+  annotations: {}
+synapse:
+  extraArgs:
+  - --second
+  ingress:
+    host: ~
+  workers:
+    event-persister:
+      enabled: "true"
+"""
+        )
+        values_file = values_file_root / "combined-values.yaml"
+        values_file.write_text("# source_fragments: first.yaml second.yaml\n")
+
+        assert ValuesFileAssembly(values_file_root, 2025).assemble()[values_file] is True
+        assert values_file.read_text() == values_file_header("first.yaml second.yaml", 2025) + (
+            "# initSecrets, postgres, wellKnownDelegation don't have any required properties to be set and defaults to"
+            " enabled\n"
+            """elementWeb:
+  additional:
+    config: |
+      {"key": "value"}
+synapse:
+  extraArgs:
+    - --second
+  workers:
+    # A comment
+    event-persister:
+      enabled: "true"
+"""
+        )
+
+
+def test_only_writes_the_values_files_that_changed():
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        values_file_root = Path(temporary_folder) / "ci"
+        shutil.copytree(_ci_directory, values_file_root)
+        assembly = ValuesFileAssembly(values_file_root, 2025)
+        assembly.assemble()
+
+        fragment = values_file_root / "fragments" / "matrix-rtc-host-mode.yaml"
+        fragment.write_text(fragment.read_text() + "\nextra: value\n")
+        changed = ValuesFileAssembly(values_file_root, 2025).assemble()
+        assert [values_file.name for values_file, was_changed in changed.items() if was_changed] == [
+            "matrix-rtc-host-mode-values.yaml"
+        ]
+        assert "extra: value\n" in (values_file_root / "matrix-rtc-host-mode-values.yaml").read_text()
@@ -0,0 +1,46 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from .assemble_helm_charts import ChartAssembly, outputs
+
+
+def test_only_rebuilds_outputs_whose_inputs_or_output_changed():
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        chart_dir = Path(temporary_folder) / "chart"
+        shutil.copytree(Path(__file__).parent / "testdata" / "schema_construction", chart_dir / "source")
+        (chart_dir / "source" / "schema.json").rename(chart_dir / "source" / "values.schema.json")
+        values_schema_output = tuple(output for output in outputs if output.name == "values.schema.json")
+
+        def assemble():
+            assembly = ChartAssembly(chart_dir, values_schema_output, Path(temporary_folder) / "cache")
+            return assembly.assemble()["values.schema.json"]
+
+        assert assemble() is not None
+        assert assemble() is None
+
+        # A changed sub-schema
+        sub_schema = json.loads((chart_dir / "source" / "sub_schema1.json").read_text())
+        sub_schema["properties"]["third"] = {"type": "string"}
+        (chart_dir / "source" / "sub_schema1.json").write_text(json.dumps(sub_schema))
+        assert assemble() is not None
+        values_schema = json.loads((chart_dir / "values.schema.json").read_text())
+        assert "third" in values_schema["properties"]["merged"]["properties"]
+        assert assemble() is None
+
+        # An added input
+        (chart_dir / "source" / "sub_schema2.json").write_text(json.dumps(sub_schema))
+        assert assemble() is not None
+        assert assemble() is None
+
+        # A changed or removed output
+        (chart_dir / "values.schema.json").write_text("{}")
+        assert assemble() is not None
+        (chart_dir / "values.schema.json").unlink()
+        assert assemble() is not None
+        assert assemble() is None
@@ -9,6 +9,8 @@ from pathlib import Path
 import pytest
 
 from .construct_helm_schema import (
+    SchemaWalker,
+    SubSchemas,
     construct_helm_schema,
     default_additionalProperties_to_off,
     inline_sub_schemas,
@@ -102,6 +104,50 @@ def test_schema_walker_visits_array_items():
     assert visited[1] == schema_part["items"]
 
 
+def test_schema_walker_calls_each_callable_in_order_in_one_walk():
+    schema_part = {"properties": {"nested": {"visits": []}}, "visits": []}
+
+    def first(visitor):
+        visitor["visits"] = visitor["visits"] + ["first"]
+        return visitor
+
+    def second(visitor):
+        visitor["visits"] = visitor["visits"] + ["second"]
+        return visitor
+
+    result = SchemaWalker([first, second]).walk(schema_part)
+    assert result["visits"] == ["first", "second"]
+    assert result["properties"]["nested"]["visits"] == ["first", "second"]
+    assert schema_part["visits"] == []
+
+
+def test_schema_walker_walks_each_sub_schema_once_and_shares_it():
+    source_root = Path(__file__).parent / "testdata" / "schema_construction"
+    schema_part = {
+        "type": "object",
+        "properties": {"a": {"$ref": "file://sub_schema1.json"}, "b": {"$ref": "file://sub_schema1.json"}},
+    }
+
+    visited = []
+
+    def handle_visit(visitor):
+        visited.append(visitor)
+        return visitor
+
+    result = SchemaWalker([handle_visit], SubSchemas(source_root / "schema.json")).walk(schema_part)
+    assert result["properties"]["a"] is result["properties"]["b"]
+    assert result["properties"]["a"]["properties"].keys() == set(["first", "second"])
+    # The root, the sub-schema and its 2 properties
+    assert len(visited) == 4
+
+
+def test_schema_walker_detects_sub_schemas_referencing_each_other():
+    source_root = Path(__file__).parent / "testdata" / "schema_construction"
+    walker = SchemaWalker([lambda x: x], SubSchemas(source_root / "schema.json"))
+    with pytest.raises(Exception, match="cycle"):
+        walker.walk({"$ref": "file://cyclic_sub_schema1.json"})
+
+
 def test_leaves_schema_part_for_non_object_alone():
     assert "additionalProperties" not in default_additionalProperties_to_off(None, {"type": "integer"})
     assert "additionalProperties" not in default_additionalProperties_to_off(None, {"type": "string"})
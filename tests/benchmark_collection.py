@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+# Reports how long pytest takes to collect the tests and which imports that time goes on.
+#
+# Each test directory is collected in a fresh interpreter with `python -X importtime`, so the
+# import times are those of a cold start, e.g. `pytest -k one_test` in a dev loop.
+#
+# From the project root: `python -m tests.benchmark_collection [test directories...]`
+
+import os
+import re
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+# `import time:      self [us] |  cumulative | imported package`, indented by the depth of the import
+_importtime_pattern = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+# The integration tests read their values file when they are collected
+_default_test_values_file = "charts/matrix-stack/ci/pytest-synapse-values.yaml"
+
+
+@dataclass(frozen=True)
+class ImportTime:
+    module: str
+    depth: int
+    self_seconds: float
+    cumulative_seconds: float
+
+
+def parse_importtime(stderr: str) -> list[ImportTime]:
+    import_times = []
+    for line in stderr.splitlines():
+        match = _importtime_pattern.match(line)
+        if match is not None:
+            import_times.append(
+                ImportTime(
+                    module=match.group(4),
+                    depth=len(match.group(3)) // 2,
+                    self_seconds=int(match.group(1)) / 1_000_000,
+                    cumulative_seconds=int(match.group(2)) / 1_000_000,
+                )
+            )
+    return import_times
+
+
+def collect(test_directory: Path, keyword: str | None) -> tuple[float, list[ImportTime]]:
+    command = [sys.executable, "-X", "importtime", "-m", "pytest", "--collect-only", "-q", "-p", "no:cacheprovider"]
+    # Otherwise pytest captures the import times of the conftest.py files and the test modules
+    command += ["-s", str(test_directory)]
+    if keyword is not None:
+        command += ["-k", keyword]
+
+    started_at = time.perf_counter()
+    result = subprocess.run(
+        command,
+        env={"TEST_VALUES_FILE": _default_test_values_file} | os.environ,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started_at
+    if result.returncode not in (0, 5):
+        errors = "\n".join(line for line in result.stderr.splitlines() if not _importtime_pattern.match(line))
+        raise RuntimeError(f"Collecting {test_directory} failed:\n{result.stdout}{errors}")
+    return elapsed, parse_importtime(result.stderr)
+
+
+def benchmark_collection(
+    test_directories: Annotated[list[Path] | None, typer.Argument()] = None,
+    keyword: Annotated[str | None, typer.Option("-k", help="Only collect tests matching this expression")] = None,
+    repeats: int = 3,
+    top: int = 15,
+):
+    test_directories = test_directories or [Path("tests/manifests"), Path("tests/integration")]
+    for test_directory in test_directories:
+        try:
+            # The quickest run is the one least affected by anything else on the machine
+            runs = [collect(test_directory, keyword) for _ in range(repeats)]
+        except RuntimeError as e:
+            print(e)
+            continue
+        elapsed, import_times = min(runs, key=lambda run: run[0])
+
+        print(f"{test_directory}: collected in {elapsed:.2f}s, best of {repeats}")
+        print(f"  {'cumulative ms':>13} {'self ms':>8}  top-level import")
+        top_level = [import_time for import_time in import_times if import_time.depth == 0]
+        for import_time in sorted(top_level, key=lambda import_time: -import_time.cumulative_seconds)[:top]:
+            print(
+                f"  {import_time.cumulative_seconds * 1000:>13.1f} {import_time.self_seconds * 1000:>8.1f}  "
+                f"{import_time.module}"
+            )
+        print(
+            f"  {sum(import_time.cumulative_seconds for import_time in top_level) * 1000:>13.1f} {'':>8}  "
+            f"total of {len(top_level)} top-level imports"
+        )
+        print()
+
+
+def main():
+    typer.run(benchmark_collection)
+
+
+if __name__ == "__main__":
+    main()
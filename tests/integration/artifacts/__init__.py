@@ -2,6 +2,13 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-only
 
-from .certs import CertKey, generate_ca, generate_cert, get_ca
+__all__ = ["get_ca", "generate_ca", "generate_cert", "key_pools", "default_key_type", "CertKey"]
 
-__all__ = ["get_ca", "generate_ca", "generate_cert", "CertKey"]
+
+def __getattr__(name):
+    # Imported on first use so that collecting the tests doesn't import cryptography
+    if name in __all__:
+        from . import certs
+
+        return getattr(certs, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
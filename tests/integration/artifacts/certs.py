@@ -5,28 +5,42 @@
 from __future__ import annotations
 
 import datetime
+import multiprocessing
 import os
+import threading
 import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Literal
 
 import pytz
 from cryptography import x509
+from cryptography.exceptions import InvalidSignature
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from cryptography.hazmat.primitives.asymmetric.ec import EllipticCurvePrivateKey
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
 from cryptography.hazmat.primitives.serialization import load_pem_private_key, pkcs12
 from cryptography.x509 import Certificate
 from cryptography.x509.oid import NameOID
 from platformdirs import user_cache_dir
 
+KeyType = Literal["rsa", "ecdsa"]
+
+_cache_directory = Path(user_cache_dir("pytest-ess", "element"))
+# Cached certificates are regenerated once they have less than this left before they expire
+_minimum_remaining_validity = datetime.timedelta(days=1)
+
 
 @dataclass(frozen=True)
 class CertKey:
     ca: CertKey
     cert: Certificate
-    key: RSAPrivateKey
+    key: RSAPrivateKey | EllipticCurvePrivateKey
 
     def cert_bundle_as_pfx(self, password: bytes = None) -> bytes:
         if password is None:
@@ -60,8 +74,25 @@ class CertKey:
         ).decode("utf-8")
 
 
+def _load_key(pem: bytes) -> RSAPrivateKey | EllipticCurvePrivateKey:
+    # Only keys generated here are loaded, so their slow validation is skipped
+    return load_pem_private_key(pem, None, default_backend(), unsafe_skip_rsa_key_validation=True)
+
+
+def _is_reusable(cert: Certificate, issuer: CertKey | None) -> bool:
+    if cert.not_valid_after_utc - datetime.datetime.now(pytz.UTC) < _minimum_remaining_validity:
+        return False
+    if issuer is not None:
+        # The issuer may have been regenerated since
+        try:
+            cert.verify_directly_issued_by(issuer.cert)
+        except (ValueError, TypeError, InvalidSignature):
+            return False
+    return True
+
+
 def get_ca(name, root_ca=None) -> CertKey:
-    ca_filename = Path(user_cache_dir("pytest-ess", "element")) / Path(name.lower().replace(" ", "-"))
+    ca_filename = _cache_directory / Path(name.lower().replace(" ", "-"))
     cert_path = ca_filename.with_suffix(".crt")
     key_path = ca_filename.with_suffix(".key")
     bundle_path = (ca_filename.parent / (ca_filename.name + "-bundle")).with_suffix(".pem")
@@ -71,10 +102,10 @@ def get_ca(name, root_ca=None) -> CertKey:
 
     if os.path.exists(cert_path) and os.path.exists(key_path):
         with open(key_path, "rb") as pem_in:
-            private_key = load_pem_private_key(pem_in.read(), None, default_backend())
+            private_key = _load_key(pem_in.read())
         with open(cert_path, "rb") as pem_in:
             cert = x509.load_pem_x509_certificate(pem_in.read(), default_backend())
-        if cert.not_valid_after_utc < pytz.UTC.localize(datetime.datetime.now()):
+        if _is_reusable(cert, root_ca):
             certkey = CertKey(ca=root_ca, cert=cert, key=private_key)
     if not certkey:
         certkey = generate_ca(name, root_ca)
@@ -140,11 +171,71 @@ def generate_ca(name, root_ca=None) -> CertKey:
     return ca
 
 
-def generate_cert(ca, dns_names: list[str]) -> CertKey:
+def generate_key(key_type: KeyType) -> RSAPrivateKey | EllipticCurvePrivateKey:
+    if key_type == "ecdsa":
+        return ec.generate_private_key(ec.SECP256R1(), backend=default_backend())
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+
+
+def _generate_key_as_pem(key_type: KeyType) -> bytes:
+    # Keys can't be pickled so are passed back from the worker processes as PEM
+    return generate_key(key_type).private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+
+
+class KeyPool:
+    """Private keys of one type generated ahead of when they are needed, in a process pool."""
+
+    def __init__(self, key_type: KeyType):
+        self.key_type = key_type
+        self._executor: ProcessPoolExecutor | None = None
+        self._keys: deque[Future[bytes]] = deque()
+        self._lock = threading.Lock()
+
+    def fill(self, count: int):
+        """Starts generating keys until there are at least count available or being generated."""
+        with self._lock:
+            if self._executor is None:
+                # Spawned rather than forked as the tests run threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=min(count, os.cpu_count() or 1), mp_context=multiprocessing.get_context("spawn")
+                )
+            while len(self._keys) < count:
+                self._keys.append(self._executor.submit(_generate_key_as_pem, self.key_type))
+
+    def take(self) -> RSAPrivateKey | EllipticCurvePrivateKey:
+        with self._lock:
+            key_pem = self._keys.popleft() if self._keys else None
+        if key_pem is None:
+            return generate_key(self.key_type)
+        try:
+            return _load_key(key_pem.result())
+        except BrokenProcessPool:
+            return generate_key(self.key_type)
+
+    def close(self):
+        with self._lock:
+            self._keys.clear()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+key_pools: dict[KeyType, KeyPool] = {"rsa": KeyPool("rsa"), "ecdsa": KeyPool("ecdsa")}
+
+
+def default_key_type() -> KeyType:
+    return "ecdsa" if os.environ.get("PYTEST_ESS_CERT_KEY_TYPE") == "ecdsa" else "rsa"
+
+
+def generate_cert(ca, dns_names: list[str], key: RSAPrivateKey | EllipticCurvePrivateKey | None = None) -> CertKey:
     one_day = datetime.timedelta(1, 0, 0)
 
     # Now we want to generate a cert from that root
-    cert_key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+    cert_key = key or generate_key("rsa")
     new_subject = x509.Name(
         [
             x509.NameAttribute(NameOID.COMMON_NAME, dns_names[0]),
@@ -4,4 +4,8 @@
 
 pytest_plugins = [
     "integration.fixtures",
+    "integration.fixtures.bootstrap",
+    "integration.fixtures.deployments",
+    "integration.fixtures.http",
+    "integration.fixtures.readiness",
 ]
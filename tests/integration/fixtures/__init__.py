@@ -3,9 +3,10 @@
 # SPDX-License-Identifier: AGPL-3.0-only
 
 from .ca import ca, ssl_context
-from .cluster import cluster, ess_namespace, helm_client, ingress, kube_client, prometheus_operator_crds, registry
+from .cluster import cluster, helm_client, ingress, kube_client, prometheus_operator_crds, registry
 from .data import ESSData, generated_data
-from .helm import helm_prerequisites, ingress_ready, matrix_stack, secrets_generated
+from .deployments import Deployment
+from .helm import ingress_ready, matrix_stack, secrets_generated
 from .matrix_tools import build_matrix_tools, loaded_matrix_tools
 from .users import users
 
@@ -13,11 +14,10 @@ __all__ = [
     build_matrix_tools,
     ca,
     cluster,
-    ess_namespace,
+    Deployment,
     ESSData,
     generated_data,
     helm_client,
-    helm_prerequisites,
     ingress,
     ingress_ready,
     kube_client,
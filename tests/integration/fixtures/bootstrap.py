@@ -0,0 +1,62 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import pytest
+
+from ..lib.bootstrap import Bootstrap, Step
+from .ca import create_ca
+from .cluster import (
+    create_helm_client,
+    create_kube_client,
+    install_ingress,
+    install_prometheus_operator_crds,
+    start_cluster,
+    start_registry,
+)
+from .deployments import start_deployments
+from .matrix_tools import build_matrix_tools_image, load_matrix_tools_image
+from .readiness import start_readiness
+
+bootstrap_key = pytest.StashKey[Bootstrap]()
+
+
+def bootstrap_steps() -> list[Step]:
+    return [
+        Step("cluster", start_cluster),
+        Step("helm_client", create_helm_client),
+        Step("kube_client", create_kube_client),
+        Step("readiness", start_readiness),
+        Step("ingress", install_ingress),
+        Step("registry", start_registry),
+        Step("prometheus_operator_crds", install_prometheus_operator_crds),
+        Step("build_matrix_tools", build_matrix_tools_image),
+        Step("loaded_matrix_tools", load_matrix_tools_image),
+        Step("ca", create_ca),
+        Step("deployments", start_deployments),
+    ]
+
+
+@pytest.fixture(autouse=True, scope="session")
+async def bootstrap(pytestconfig: pytest.Config):
+    session_bootstrap = Bootstrap(bootstrap_steps())
+    pytestconfig.stash[bootstrap_key] = session_bootstrap
+    try:
+        yield await session_bootstrap.run()
+    finally:
+        await session_bootstrap.teardown()
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus: int, config: pytest.Config):
+    session_bootstrap = config.stash.get(bootstrap_key, None)
+    if session_bootstrap is None or not session_bootstrap.timings:
+        return
+
+    terminalreporter.write_sep("-", "Bootstrap")
+    for line in session_bootstrap.gantt():
+        terminalreporter.write_line(line)
+    for name, deployment in sorted(session_bootstrap.results.get("deployments", {}).items()):
+        if deployment.bootstrap.timings:
+            terminalreporter.write_sep("-", f"Bootstrap of {name}")
+            for line in deployment.bootstrap.gantt():
+                terminalreporter.write_line(line)
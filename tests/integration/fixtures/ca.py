@@ -2,18 +2,32 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-only
 
+import asyncio
 import ssl
+from typing import Any
 
 import pytest
 
-from ..artifacts import get_ca
+from .. import artifacts
+from .deployments import deployment_values_files
 
 
-@pytest.fixture(autouse=True, scope="session")
-async def ca():
-    root_ca = get_ca("ESS CA")
-    delegated_ca = get_ca("ESS CA Delegated", root_ca)
-    return delegated_ca
+async def create_ca():
+    # Start generating the keys of the certificates for the ingresses of every deployment while everything else is
+    # set up
+    key_pool = artifacts.key_pools[artifacts.default_key_type()]
+    key_pool.fill(5 * len(deployment_values_files()))
+
+    root_ca = await asyncio.to_thread(artifacts.get_ca, "ESS CA")
+    delegated_ca = await asyncio.to_thread(artifacts.get_ca, "ESS CA Delegated", root_ca)
+    yield delegated_ca
+
+    key_pool.close()
+
+
+@pytest.fixture(scope="session")
+def ca(bootstrap: dict[str, Any]):
+    return bootstrap["ca"]
 
 
 @pytest.fixture(scope="session")
@@ -2,13 +2,14 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-only
 
+from __future__ import annotations
+
 import asyncio
 import os
 from collections.abc import AsyncGenerator
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import pyhelm3
 import pytest
 import yaml
 from lightkube import AsyncClient, KubeConfig
@@ -16,10 +17,16 @@ from lightkube.models.meta_v1 import ObjectMeta
 from lightkube.resources.core_v1 import Namespace, Service
 from pytest_kubernetes.options import ClusterOptions
 from pytest_kubernetes.providers import KindManager
-from python_on_whales import docker
 
 from .data import ESSData
 
+# pyhelm3 and python_on_whales are imported by the fixtures that use them rather than when collecting the tests
+if TYPE_CHECKING:
+    import pyhelm3
+    from python_on_whales import Container
+
+    from ..lib.readiness import ReadinessEngine
+
 
 class PotentiallyExistingKindCluster(KindManager):
     def __init__(self, cluster_name, cluster_config=None):
@@ -50,7 +57,9 @@ class PotentiallyExistingKindCluster(KindManager):
             # The cluster requires extraMounts. These are relative paths from the cluster config file
             # as they'll be different for everyone + CI.
             # We save off the current working directory incase it is important, change to the folder
-            # with the cluster config file and then change back afterwards
+            # with the cluster config file and then change back afterwards.
+            # As the working directory is per-process, the bootstrap steps that run alongside this must only
+            # use absolute paths
             cwd = os.getcwd()
             try:
                 fixtures_folder = Path(__file__).parent.resolve()
@@ -65,30 +74,28 @@ class PotentiallyExistingKindCluster(KindManager):
             return super()._on_delete()
 
 
-@pytest.fixture(autouse=True, scope="session")
-async def cluster():
+async def start_cluster():
     # This name must match what `setup_test_cluster.sh` would create
-    this_cluster = PotentiallyExistingKindCluster("ess-helm")
-    this_cluster.create(ClusterOptions(cluster_config="kind.yml"))
+    this_cluster = await asyncio.to_thread(PotentiallyExistingKindCluster, "ess-helm")
+    await asyncio.to_thread(this_cluster.create, ClusterOptions(cluster_config="kind.yml"))
 
     yield this_cluster
 
-    this_cluster.delete()
+    await asyncio.to_thread(this_cluster.delete)
 
 
-@pytest.fixture(scope="session")
-async def helm_client(cluster):
-    yield pyhelm3.Client(kubeconfig=cluster.kubeconfig, kubecontext=cluster.context)
+async def create_helm_client(cluster):
+    import pyhelm3
 
+    return pyhelm3.Client(kubeconfig=cluster.kubeconfig, kubecontext=cluster.context)
 
-@pytest.fixture(scope="session")
-async def kube_client(cluster):
+
+async def create_kube_client(cluster):
     kube_config = KubeConfig.from_file(cluster.kubeconfig)
-    yield AsyncClient(config=kube_config)
+    return AsyncClient(config=kube_config)
 
 
-@pytest.fixture(autouse=True, scope="session")
-async def ingress(cluster, kube_client, helm_client: pyhelm3.Client):
+async def install_ingress(kube_client, readiness: ReadinessEngine, helm_client: pyhelm3.Client):
     chart = await helm_client.get_chart("ingress-nginx", repo="https://kubernetes.github.io/ingress-nginx")
 
     values_file = Path(__file__).parent.resolve() / Path("files/charts/ingress-nginx.yml")
@@ -103,23 +110,16 @@ async def ingress(cluster, kube_client, helm_client: pyhelm3.Client):
         wait=True,
     )
 
-    await asyncio.to_thread(
-        cluster.wait,
-        name="endpoints/ingress-nginx-controller-admission",
-        waitfor="jsonpath='{.subsets[].addresses}'",
-        namespace="ingress-nginx",
-    )
-    await asyncio.to_thread(
-        cluster.wait,
-        name="lease/ingress-nginx-leader",
-        waitfor="jsonpath='{.spec.holderIdentity}'",
-        namespace="ingress-nginx",
+    await asyncio.gather(
+        readiness.endpoints_ready("ingress-nginx-controller-admission", "ingress-nginx"),
+        readiness.lease_held("ingress-nginx-leader", "ingress-nginx"),
     )
     return (await kube_client.get(Service, name="ingress-nginx-controller", namespace="ingress-nginx")).spec.clusterIP
 
 
-@pytest.fixture(autouse=True, scope="session")
-async def registry(cluster):
+def _start_registry() -> tuple[str, Container]:
+    from python_on_whales import docker
+
     pytest_registry_container_name = "pytest-ess-helm-registry"
     test_cluster_registry_container_name = "ess-helm-registry"
 
@@ -148,15 +148,20 @@ async def registry(cluster):
     if container.id not in kind_network.containers:
         docker.network.connect(kind_network, container, alias="registry")
 
+    return container_name, container
+
+
+async def start_registry(cluster):
+    container_name, container = await asyncio.to_thread(_start_registry)
+
     yield
 
-    if container_name == pytest_registry_container_name:
-        container.stop()
-        container.remove()
+    if container_name == "pytest-ess-helm-registry":
+        await asyncio.to_thread(container.stop)
+        await asyncio.to_thread(container.remove)
 
 
-@pytest.fixture(autouse=True, scope="session")
-async def prometheus_operator_crds(helm_client):
+async def install_prometheus_operator_crds(helm_client):
     if os.environ.get("SKIP_SERVICE_MONITORS_CRDS", "false") == "false":
         chart = await helm_client.get_chart(
             "prometheus-operator-crds", repo="https://prometheus-community.github.io/helm-charts"
@@ -174,11 +179,10 @@ async def prometheus_operator_crds(helm_client):
         )
 
 
-@pytest.fixture(scope="session")
-async def ess_namespace(
-    cluster: PotentiallyExistingKindCluster, kube_client: pyhelm3.Client, generated_data: ESSData
+async def create_ess_namespace(
+    cluster: PotentiallyExistingKindCluster, kube_client: AsyncClient, generated_data: ESSData
 ) -> AsyncGenerator[Namespace, Any]:
-    (major_version, minor_version) = cluster.version()
+    (major_version, minor_version) = await asyncio.to_thread(cluster.version)
     namespace = await kube_client.create(
         Namespace(
             metadata=ObjectMeta(
@@ -203,3 +207,36 @@ async def ess_namespace(
 
     if os.environ.get("PYTEST_KEEP_CLUSTER", "") != "1":
         await kube_client.delete(Namespace, name=generated_data.ess_namespace)
+
+
+# The session fixtures below are set up together, as concurrently as possible, by the bootstrap fixture
+
+
+@pytest.fixture(scope="session")
+def cluster(bootstrap: dict[str, Any]) -> PotentiallyExistingKindCluster:
+    return bootstrap["cluster"]
+
+
+@pytest.fixture(scope="session")
+def helm_client(bootstrap: dict[str, Any]) -> pyhelm3.Client:
+    return bootstrap["helm_client"]
+
+
+@pytest.fixture(scope="session")
+def kube_client(bootstrap: dict[str, Any]) -> AsyncClient:
+    return bootstrap["kube_client"]
+
+
+@pytest.fixture(scope="session")
+def ingress(bootstrap: dict[str, Any]) -> str:
+    return bootstrap["ingress"]
+
+
+@pytest.fixture(scope="session")
+def registry(bootstrap: dict[str, Any]):
+    return bootstrap["registry"]
+
+
+@pytest.fixture(scope="session")
+def prometheus_operator_crds(bootstrap: dict[str, Any]):
+    return bootstrap["prometheus_operator_crds"]
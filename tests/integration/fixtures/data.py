@@ -2,14 +2,19 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-only
 
+from __future__ import annotations
+
 import random
 import secrets
 import string
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
 import pytest
 
-from ..artifacts import CertKey
+if TYPE_CHECKING:
+    from ..artifacts import CertKey
+    from .deployments import Deployment
 
 
 def unsafe_token(size):
@@ -42,10 +47,14 @@ class ESSData:
         return f"ess-test-{self.secrets_random}.localhost"
 
 
-@pytest.fixture(scope="session")
-async def generated_data(ca):
+async def generate_data(ca):
     return ESSData(
         secrets_random=random_string(string.ascii_lowercase + string.digits, 8),
         ca=ca,
         mas_oidc_client_secret=secrets.token_urlsafe(36),
     )
+
+
+@pytest.fixture
+def generated_data(deployment: Deployment) -> ESSData:
+    return deployment.data
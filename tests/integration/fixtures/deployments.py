@@ -0,0 +1,148 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from ..lib.bootstrap import Bootstrap, Step
+from ..lib.utils import value_file_has
+from .cluster import create_ess_namespace
+from .data import ESSData, generate_data
+from .helm import create_helm_prerequisites, install_matrix_stack
+
+
+def deployment_values_files() -> list[Path]:
+    """The values files to deploy, from TEST_VALUES_FILES if set and TEST_VALUES_FILE otherwise."""
+    if os.environ.get("TEST_VALUES_FILES"):
+        return [Path(values_file) for values_file in os.environ["TEST_VALUES_FILES"].replace(",", " ").split()]
+    return [Path(os.environ["TEST_VALUES_FILE"])]
+
+
+def deployment_name(values_file: Path) -> str:
+    return values_file.name.removesuffix(".yaml").removesuffix("-values")
+
+
+@dataclass
+class Deployment:
+    """The matrix-stack chart deployed with one values file, into its own namespace."""
+
+    name: str
+    values_file: Path
+    data: ESSData
+    bootstrap: Bootstrap = field(init=False, repr=False)
+    # Completes once the chart has been installed
+    ready: asyncio.Future[dict[str, Any]] = field(init=False, repr=False)
+    # The users created for the tests, by the names they were requested with
+    users: dict[tuple[str, ...], asyncio.Future] = field(default_factory=dict, repr=False)
+
+    @property
+    def results(self) -> dict[str, Any]:
+        return self.bootstrap.results
+
+    def value_file_has(self, property_path, expected=None) -> bool:
+        return value_file_has(self.values_file, property_path, expected)
+
+
+def deployment_steps() -> list[Step]:
+    return [
+        Step("ess_namespace", create_ess_namespace),
+        Step("helm_prerequisites", create_helm_prerequisites),
+        Step("matrix_stack", install_matrix_stack),
+    ]
+
+
+async def start_deployments(
+    cluster, kube_client, helm_client, ca, ingress, prometheus_operator_crds, loaded_matrix_tools
+):
+    """Starts deploying every values file concurrently without waiting, so each test only waits for its own."""
+    session_results = {
+        "cluster": cluster,
+        "kube_client": kube_client,
+        "helm_client": helm_client,
+        "ca": ca,
+        "ingress": ingress,
+        "prometheus_operator_crds": prometheus_operator_crds,
+        "loaded_matrix_tools": loaded_matrix_tools,
+    }
+    deployments: dict[str, Deployment] = {}
+    for values_file in deployment_values_files():
+        deployment = Deployment(deployment_name(values_file), values_file, await generate_data(ca))
+        deployment.bootstrap = Bootstrap(
+            deployment_steps(),
+            inputs=session_results | {"deployment": deployment, "generated_data": deployment.data},
+        )
+        deployment.ready = asyncio.ensure_future(deployment.bootstrap.run())
+        deployments[deployment.name] = deployment
+
+    yield deployments
+
+    async def teardown(deployment: Deployment):
+        # Stops any deployment that no test waited for
+        deployment.ready.cancel()
+        await asyncio.gather(deployment.ready, return_exceptions=True)
+        await deployment.bootstrap.teardown()
+
+    await asyncio.gather(*[teardown(deployment) for deployment in deployments.values()])
+
+
+@pytest.fixture(autouse=True)
+async def deployment(request, bootstrap: dict[str, Any]) -> Deployment:
+    # Read from the test rather than request.param, which is shared with the other parametrized fixtures
+    this_deployment = bootstrap["deployments"][request.node.callspec.params["deployment"]]
+    await this_deployment.ready
+    return this_deployment
+
+
+def pytest_configure(config: pytest.Config):
+    config.addinivalue_line(
+        "markers",
+        "skipif_values(property_path, expected, reason): skip the test for the deployments whose values file has the "
+        "property with the expected value",
+    )
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc):
+    if "deployment" in metafunc.fixturenames:
+        names = [deployment_name(values_file) for values_file in deployment_values_files()]
+        metafunc.parametrize("deployment", names, indirect=True, ids=names)
+
+
+def pytest_collection_modifyitems(items: list[pytest.Item]):
+    values_files = {deployment_name(values_file): values_file for values_file in deployment_values_files()}
+    for item in items:
+        callspec = getattr(item, "callspec", None)
+        if callspec is None or "deployment" not in callspec.params:
+            continue
+
+        name = callspec.params["deployment"]
+        item.user_properties.append(("deployment", name))
+        for marker in item.iter_markers("skipif_values"):
+            if value_file_has(values_files[name], *marker.args):
+                # Added as a skip marker on the test itself, as that is what pytest-asyncio-cooperative checks for
+                item.add_marker(pytest.mark.skip(reason=marker.kwargs.get("reason", "")))
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus: int, config: pytest.Config):
+    outcomes: dict[str, Counter[str]] = {}
+    for category in ("passed", "failed", "error", "skipped"):
+        for report in terminalreporter.stats.get(category, []):
+            name = dict(getattr(report, "user_properties", ())).get("deployment")
+            # Only count each test once, rather than once for each of its setup, call and teardown
+            if name is not None and (report.when == "call" or category in ("error", "skipped")):
+                outcomes.setdefault(name, Counter())[category] += 1
+    if len(outcomes) < 2:
+        return
+
+    terminalreporter.write_sep("-", "Deployments")
+    for name, counts in sorted(outcomes.items()):
+        summary = ", ".join(f"{count} {category}" for category, count in counts.items())
+        terminalreporter.write_line(f"{name}: {summary}")
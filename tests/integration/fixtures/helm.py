@@ -2,29 +2,35 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-only
 
+from __future__ import annotations
+
 import asyncio
 import base64
 import os
+from typing import TYPE_CHECKING
 
-import pyhelm3
 import pytest
 import yaml
 from lightkube import AsyncClient
 from lightkube.models.meta_v1 import ObjectMeta
-from lightkube.resources.core_v1 import Namespace, Secret, Service
-from lightkube.resources.networking_v1 import Ingress
+from lightkube.resources.core_v1 import Namespace, Secret
+
+from ..lib.helpers import kubernetes_docker_secret, kubernetes_tls_secret
+from ..lib.readiness import ReadinessEngine
+from ..lib.utils import DockerAuth, docker_config_json
 
-from ..lib.helpers import kubernetes_docker_secret, kubernetes_tls_secret, wait_for_endpoint_ready
-from ..lib.utils import DockerAuth, docker_config_json, value_file_has
-from .data import ESSData
+if TYPE_CHECKING:
+    import pyhelm3
 
+    from .deployments import Deployment
 
-@pytest.fixture(scope="session")
-async def helm_prerequisites(
-    kube_client: AsyncClient, helm_client: pyhelm3.Client, ca, ess_namespace: Namespace, generated_data: ESSData
+
+async def create_helm_prerequisites(
+    kube_client: AsyncClient, helm_client: pyhelm3.Client, ca, ess_namespace: Namespace, deployment: Deployment
 ):
+    generated_data = deployment.data
     resources = []
-    setups = []
+    tls_secrets = []
 
     # On CI, public runners need read access to dockerhub.io
     if os.environ.get("CI"):
@@ -44,8 +50,8 @@ async def helm_prerequisites(
             ),
         )
 
-    if value_file_has("matrixRTC.enabled", True):
-        resources.append(
+    if deployment.value_file_has("matrixRTC.enabled", True):
+        tls_secrets.append(
             kubernetes_tls_secret(
                 f"{generated_data.release_name}-matrix-rtc-tls",
                 generated_data.ess_namespace,
@@ -55,8 +61,8 @@ async def helm_prerequisites(
             )
         )
 
-    if value_file_has("elementWeb.enabled", True):
-        resources.append(
+    if deployment.value_file_has("elementWeb.enabled", True):
+        tls_secrets.append(
             kubernetes_tls_secret(
                 f"{generated_data.release_name}-element-web-tls",
                 generated_data.ess_namespace,
@@ -66,8 +72,8 @@ async def helm_prerequisites(
             )
         )
 
-    if value_file_has("matrixAuthenticationService.enabled", True):
-        resources.append(
+    if deployment.value_file_has("matrixAuthenticationService.enabled", True):
+        tls_secrets.append(
             kubernetes_tls_secret(
                 f"{generated_data.release_name}-mas-web-tls",
                 generated_data.ess_namespace,
@@ -98,8 +104,8 @@ clients:
             )
         )
 
-    if value_file_has("synapse.enabled", True):
-        resources.append(
+    if deployment.value_file_has("synapse.enabled", True):
+        tls_secrets.append(
             kubernetes_tls_secret(
                 f"{generated_data.release_name}-synapse-web-tls",
                 generated_data.ess_namespace,
@@ -124,8 +130,8 @@ retention:
             )
         )
 
-    if value_file_has("wellKnownDelegation.enabled", True):
-        resources.append(
+    if deployment.value_file_has("wellKnownDelegation.enabled", True):
+        tls_secrets.append(
             kubernetes_tls_secret(
                 f"{generated_data.release_name}-well-known-web-tls",
                 generated_data.ess_namespace,
@@ -135,19 +141,22 @@ retention:
             )
         )
 
-    return asyncio.gather(*setups, *[kube_client.create(resource) for resource in resources])
+    resources += await asyncio.gather(*tls_secrets)
+    await asyncio.gather(*[kube_client.create(resource) for resource in resources])
 
 
-@pytest.fixture(autouse=True, scope="session")
-async def matrix_stack(
+async def install_matrix_stack(
     helm_client: pyhelm3.Client,
     ingress,
     helm_prerequisites,
     ess_namespace: Namespace,
-    generated_data: ESSData,
+    deployment: Deployment,
     loaded_matrix_tools: dict,
 ):
-    with open(os.environ["TEST_VALUES_FILE"]) as stream:
+    import pyhelm3
+
+    generated_data = deployment.data
+    with open(deployment.values_file) as stream:
         values = yaml.safe_load(stream)
 
     values["serverName"] = generated_data.server_name
@@ -182,37 +191,37 @@ async def matrix_stack(
     assert revision.status == pyhelm3.ReleaseRevisionStatus.DEPLOYED
 
 
-@pytest.fixture(scope="session")
-def ingress_ready(cluster, kube_client: AsyncClient, matrix_stack, generated_data: ESSData):
+@pytest.fixture
+def matrix_stack(deployment: Deployment):
+    # The deployment fixture has already waited for the release to be installed
+    return deployment.results["matrix_stack"]
+
+
+@pytest.fixture
+def ingress_ready(readiness: ReadinessEngine, deployment: Deployment):
+    generated_data = deployment.data
+
     async def _ingress_ready(ingress_suffix):
-        await asyncio.to_thread(
-            cluster.wait,
-            name=f"ingress/{generated_data.release_name}-{ingress_suffix}",
-            namespace=generated_data.ess_namespace,
-            waitfor="jsonpath='{.status.loadBalancer.ingress[0].ip}'",
+        ingress = await readiness.ingress_has_address(
+            f"{generated_data.release_name}-{ingress_suffix}", generated_data.ess_namespace
         )
-        ingress = await kube_client.get(
-            Ingress, f"{generated_data.release_name}-{ingress_suffix}", namespace=generated_data.ess_namespace
+        await asyncio.gather(
+            *[
+                readiness.endpoint_slices_ready(path.backend.service.name, generated_data.ess_namespace)
+                for rule in ingress.spec.rules
+                for path in rule.http.paths
+            ]
         )
-        for rule in ingress.spec.rules:
-            for path in rule.http.paths:
-                service = await kube_client.get(
-                    Service, path.backend.service.name, namespace=generated_data.ess_namespace
-                )
-                await wait_for_endpoint_ready(service.metadata.name, generated_data.ess_namespace, cluster, kube_client)
 
     return _ingress_ready
 
 
-@pytest.fixture(scope="session")
-def secrets_generated(cluster, kube_client: AsyncClient, matrix_stack, generated_data: ESSData):
+@pytest.fixture
+def secrets_generated(readiness: ReadinessEngine, kube_client: AsyncClient, deployment: Deployment):
+    generated_data = deployment.data
+
     async def _secrets_generated(secret_key) -> str:
-        await asyncio.to_thread(
-            cluster.wait,
-            name=f"job/{generated_data.release_name}-init-secrets",
-            namespace=generated_data.ess_namespace,
-            waitfor="condition=complete",
-        )
+        await readiness.job_complete(f"{generated_data.release_name}-init-secrets", generated_data.ess_namespace)
         generated_secret = await kube_client.get(
             Secret, namespace=generated_data.ess_namespace, name=f"{generated_data.release_name}-generated"
         )
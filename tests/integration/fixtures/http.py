@@ -0,0 +1,27 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import pytest
+
+from ..lib.utils import http_client_pool
+
+
+@pytest.fixture(autouse=True, scope="session")
+async def http_clients():
+    yield http_client_pool
+
+    # The pooled connections belong to the event loop the tests ran in, so are closed from it
+    await http_client_pool.close()
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus: int, config: pytest.Config):
+    if not http_client_pool.stats:
+        return
+
+    terminalreporter.write_sep("-", "HTTP connection pool")
+    for host, stats in sorted(http_client_pool.stats.items()):
+        terminalreporter.write_line(
+            f"{host}: {stats.requests} requests over {stats.connections_created} connections "
+            f"({stats.connections_reused} reused), {stats.connect_seconds:.2f}s connecting"
+        )
@@ -2,20 +2,28 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-only
 
+from __future__ import annotations
+
+import asyncio
 import os
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 import pytest
-from python_on_whales import Image, docker
+
+if TYPE_CHECKING:
+    from python_on_whales import Image
 
 
-@pytest.fixture(autouse=True, scope="session")
-async def build_matrix_tools():
+async def build_matrix_tools_image():
     # Until the image is made publicly available
     # In local runs we always have to build it
     if os.environ.get("BUILD_MATRIX_TOOLS"):
+        from python_on_whales import docker
+
         project_folder = Path(__file__).parent.parent.parent.parent.resolve()
-        docker.buildx.bake(
+        await asyncio.to_thread(
+            docker.buildx.bake,
             files=str(project_folder / "docker-bake.hcl"),
             targets="matrix-tools",
             set={"*.tags": "localhost:5000/matrix-tools:pytest"},
@@ -23,13 +31,14 @@ async def build_matrix_tools():
         )
 
 
-@pytest.fixture(autouse=True, scope="session")
-async def loaded_matrix_tools(registry, build_matrix_tools: Image):
+async def load_matrix_tools_image(registry, build_matrix_tools: Image):
     # Until the image is made publicly available
     # In local runs we always have to build it
     if os.environ.get("BUILD_MATRIX_TOOLS"):
-        docker.push("localhost:5000/matrix-tools:pytest")
-        matrix_tools = docker.image.inspect("localhost:5000/matrix-tools:pytest")
+        from python_on_whales import docker
+
+        await asyncio.to_thread(docker.push, "localhost:5000/matrix-tools:pytest")
+        matrix_tools = await asyncio.to_thread(docker.image.inspect, "localhost:5000/matrix-tools:pytest")
         return {
             "repository": "matrix-tools",
             "registry": "localhost:5000",
@@ -38,3 +47,13 @@ async def loaded_matrix_tools(registry, build_matrix_tools: Image):
         }
     else:
         return {}
+
+
+@pytest.fixture(scope="session")
+def build_matrix_tools(bootstrap: dict[str, Any]):
+    return bootstrap["build_matrix_tools"]
+
+
+@pytest.fixture(scope="session")
+def loaded_matrix_tools(bootstrap: dict[str, Any]) -> dict:
+    return bootstrap["loaded_matrix_tools"]
@@ -0,0 +1,43 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from typing import Any
+
+import pytest
+from lightkube import AsyncClient
+
+from ..lib.readiness import ReadinessEngine
+
+readiness_engine_key = pytest.StashKey[ReadinessEngine]()
+
+
+async def start_readiness(kube_client: AsyncClient):
+    engine = ReadinessEngine(kube_client)
+    yield engine
+
+    await engine.close()
+
+
+# Autouse so that the conditions waited for while bootstrapping are reported even if no test waits for any
+@pytest.fixture(autouse=True, scope="session")
+def readiness(pytestconfig: pytest.Config, bootstrap: dict[str, Any]) -> ReadinessEngine:
+    engine = bootstrap["readiness"]
+    pytestconfig.stash[readiness_engine_key] = engine
+    return engine
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus: int, config: pytest.Config):
+    engine = config.stash.get(readiness_engine_key, None)
+    if engine is None or not engine.timings:
+        return
+
+    terminalreporter.write_sep("-", f"Readiness conditions ({engine.watch_count} watches)")
+    for timing in sorted(engine.timings, key=lambda timing: timing.seconds, reverse=True):
+        if timing.met:
+            status = ""
+        elif timing.error is not None:
+            status = f" (failed: {timing.error})"
+        else:
+            status = " (timed out)"
+        terminalreporter.write_line(f"{timing.seconds:7.2f}s {timing.description}{status}")
@@ -8,20 +8,19 @@ import pytest
 
 from ..lib.matrix_authentication_service import create_mas_user, get_client_token
 from ..lib.synapse import create_synapse_user
-from ..lib.utils import value_file_has
-from .data import ESSData
+from .deployments import Deployment
 
 
-@pytest.fixture(scope="session")
-async def users(request, matrix_stack, secrets_generated, generated_data: ESSData, ssl_context, ingress_ready):
+async def _create_users(requested_users, deployment: Deployment, secrets_generated, ssl_context, ingress_ready):
+    generated_data = deployment.data
     await ingress_ready("synapse")
-    if value_file_has("matrixAuthenticationService.enabled", True):
+    if deployment.value_file_has("matrixAuthenticationService.enabled", True):
         await ingress_ready("matrix-authentication-service")
 
     wait_for_users = []
-    if value_file_has("matrixAuthenticationService.enabled", True):
+    if deployment.value_file_has("matrixAuthenticationService.enabled", True):
         admin_token = await get_client_token(f"mas.{generated_data.server_name}", generated_data, ssl_context)
-        for user in request.param:
+        for user in requested_users:
             wait_for_users.append(
                 create_mas_user(
                     f"mas.{generated_data.server_name}",
@@ -34,7 +33,7 @@ async def users(request, matrix_stack, secrets_generated, generated_data: ESSDat
             )
     else:
         synapse_registration_shared_secret = await secrets_generated("SYNAPSE_REGISTRATION_SHARED_SECRET")
-        for user in request.param:
+        for user in requested_users:
             wait_for_users.append(
                 create_synapse_user(
                     f"synapse.{generated_data.server_name}",
@@ -46,3 +45,15 @@ async def users(request, matrix_stack, secrets_generated, generated_data: ESSDat
                 )
             )
     return await asyncio.gather(*wait_for_users)
+
+
+@pytest.fixture
+async def users(request, deployment: Deployment, secrets_generated, ssl_context, ingress_ready):
+    # Read from the test rather than request.param, which is shared with the other parametrized fixtures
+    requested_users = request.node.callspec.params["users"]
+    # Each user is only created once per deployment, however many tests ask for it
+    if requested_users not in deployment.users:
+        deployment.users[requested_users] = asyncio.ensure_future(
+            _create_users(requested_users, deployment, secrets_generated, ssl_context, ingress_ready)
+        )
+    return await deployment.users[requested_users]
@@ -0,0 +1,150 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import asyncio
+import graphlib
+import inspect
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class Step:
+    """A step of setting up the test environment.
+
+    Like a pytest fixture, `run` is an async function or an async generator that yields once, with any teardown after
+    the yield. Its parameters are the names of the steps it depends on and it is called with their results.
+    """
+
+    name: str
+    run: Callable[..., Awaitable[Any] | AsyncGenerator[Any, None]]
+
+    @property
+    def depends_on(self) -> tuple[str, ...]:
+        return tuple(inspect.signature(self.run).parameters)
+
+
+@dataclass(frozen=True)
+class StepTiming:
+    name: str
+    # Seconds since the bootstrap started
+    started_at: float
+    finished_at: float
+
+    @property
+    def seconds(self) -> float:
+        return self.finished_at - self.started_at
+
+
+class Bootstrap:
+    """Runs the steps as soon as the steps they depend on have finished, so independent steps run concurrently.
+
+    Steps can also depend on inputs, values that are available before any step runs.
+    """
+
+    def __init__(self, steps: Iterable[Step], inputs: dict[str, Any] | None = None):
+        self.steps = {step.name: step for step in steps}
+        self.inputs = inputs or {}
+        graph = {
+            step.name: tuple(name for name in step.depends_on if name not in self.inputs)
+            for step in self.steps.values()
+        }
+        for name, depends_on in graph.items():
+            missing = set(depends_on) - graph.keys()
+            if missing:
+                raise ValueError(f"Step {name} depends on unknown steps: {', '.join(sorted(missing))}")
+        # Raises graphlib.CycleError if the steps depend on each other
+        self._order = tuple(graphlib.TopologicalSorter(graph).static_order())
+
+        self.results: dict[str, Any] = {}
+        self.timings: dict[str, StepTiming] = {}
+        self._teardowns: list[tuple[str, AsyncGenerator[Any, None]]] = []
+
+    async def run(self) -> dict[str, Any]:
+        started_at = time.monotonic()
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def run_step(step: Step):
+            await asyncio.gather(*[tasks[name] for name in step.depends_on if name not in self.inputs])
+            dependencies = [
+                self.inputs[name] if name in self.inputs else tasks[name].result() for name in step.depends_on
+            ]
+            step_started_at = time.monotonic() - started_at
+            result = step.run(*dependencies)
+            if inspect.isasyncgen(result):
+                try:
+                    value = await result.__anext__()
+                except BaseException:
+                    # e.g. cancelled as another step failed, so it won't be torn down
+                    await result.aclose()
+                    raise
+                self._teardowns.append((step.name, result))
+            else:
+                value = await result
+            self.timings[step.name] = StepTiming(step.name, step_started_at, time.monotonic() - started_at)
+            return value
+
+        # Every step a step depends on is earlier in the order, so has a task to wait on
+        for name in self._order:
+            tasks[name] = asyncio.create_task(run_step(self.steps[name]), name=f"bootstrap {name}")
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        self.results = {name: task.result() for name, task in tasks.items()}
+        return self.results
+
+    async def teardown(self):
+        """Tears down the steps that were set up, each before any step it depended on."""
+        errors = []
+        while self._teardowns:
+            name, generator = self._teardowns.pop()
+            try:
+                await generator.__anext__()
+            except StopAsyncIteration:
+                continue
+            except Exception as e:
+                errors.append(e)
+                continue
+            errors.append(RuntimeError(f"Step {name} yielded more than once"))
+        if errors:
+            raise errors[0]
+
+    def critical_path(self) -> list[str]:
+        """The chain of steps, each waiting on the previous, that ended with the last step to finish."""
+        if not self.timings:
+            return []
+        path = [max(self.timings.values(), key=lambda timing: timing.finished_at).name]
+        while True:
+            finished_dependencies = [
+                self.timings[name] for name in self.steps[path[-1]].depends_on if name in self.timings
+            ]
+            if not finished_dependencies:
+                break
+            path.append(max(finished_dependencies, key=lambda timing: timing.finished_at).name)
+        return list(reversed(path))
+
+    def gantt(self, width: int = 60) -> list[str]:
+        """When each step ran, as lines of a Gantt chart with the critical path marked by `*`."""
+        if not self.timings:
+            return []
+        total_seconds = max(timing.finished_at for timing in self.timings.values()) or 1
+        critical_path = self.critical_path()
+        name_width = max(len(name) for name in self.timings)
+        lines = []
+        for timing in sorted(self.timings.values(), key=lambda timing: (timing.started_at, timing.finished_at)):
+            start = min(round(timing.started_at / total_seconds * width), width - 1)
+            length = max(1, round(timing.finished_at / total_seconds * width) - start)
+            bar = (" " * start + "#" * length).ljust(width)
+            marker = "*" if timing.name in critical_path else " "
+            lines.append(
+                f"{marker} {timing.name:<{name_width}} |{bar}| {timing.started_at:6.1f}s -> {timing.finished_at:6.1f}s"
+            )
+        lines.append(f"Critical path: {' -> '.join(critical_path)} ({total_seconds:.1f}s)")
+        return lines
@@ -0,0 +1,26 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import pytest
+
+
+# The tests of the library run without a cluster, so override the autouse fixtures that bootstrap one
+@pytest.fixture
+def bootstrap():
+    return None
+
+
+@pytest.fixture
+def readiness():
+    return None
+
+
+@pytest.fixture
+def http_clients():
+    return None
+
+
+@pytest.fixture
+def deployment():
+    return None
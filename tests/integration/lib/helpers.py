@@ -2,14 +2,19 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-only
 
+from __future__ import annotations
+
 import asyncio
-import time
 from collections.abc import Awaitable
+from typing import TYPE_CHECKING
 
 from lightkube.models.meta_v1 import ObjectMeta
-from lightkube.resources.core_v1 import Endpoints, Namespace, Secret
+from lightkube.resources.core_v1 import Namespace, Secret
+
+from .. import artifacts
 
-from ..artifacts import CertKey, generate_cert
+if TYPE_CHECKING:
+    from ..artifacts import CertKey
 
 
 def namespace(name: str) -> Awaitable[Namespace]:
@@ -25,10 +30,10 @@ def kubernetes_docker_secret(name: str, namespace: str, docker_config_json: str)
     return secret
 
 
-def kubernetes_tls_secret(
-    name: str, namespace: str, ca: CertKey, dns_names: list[str], bundled=False
-) -> Awaitable[Secret]:
-    certificate = generate_cert(ca, dns_names)
+async def kubernetes_tls_secret(name: str, namespace: str, ca: CertKey, dns_names: list[str], bundled=False) -> Secret:
+    # Not cached, as the DNS names include the random server name of the run. The key was generated ahead of time
+    key = await asyncio.to_thread(artifacts.key_pools[artifacts.default_key_type()].take)
+    certificate = artifacts.generate_cert(ca, dns_names, key=key)
     secret = Secret(
         type="kubernetes.io/tls",
         metadata=ObjectMeta(name=name, namespace=namespace, labels={"app.kubernetes.io/managed-by": "pytest"}),
@@ -38,24 +43,3 @@ def kubernetes_tls_secret(
         },
     )
     return secret
-
-
-async def wait_for_endpoint_ready(name, namespace, cluster, kube_client):
-    await asyncio.to_thread(
-        cluster.wait,
-        name=f"endpoints/{name}",
-        namespace=namespace,
-        waitfor="jsonpath='{.subsets[].addresses}'",
-    )
-    # We wait maximum 30 seconds for the endpoints to be ready
-    start_time = time.time()
-    while time.time() - start_time < 30:
-        endpoint = await kube_client.get(Endpoints, name=name, namespace=namespace)
-
-        for subset in endpoint.subsets:
-            if not subset or subset.notReadyAddresses or not subset.addresses or not subset.ports:
-                await asyncio.sleep(0.1)
-                break
-        else:
-            break
-    return endpoint
@@ -3,31 +3,20 @@
 # SPDX-License-Identifier: AGPL-3.0-only
 
 from ssl import SSLContext
-from urllib.parse import urlparse
-
-import aiohttp
-from aiohttp_retry import RetryClient
 
 from ..fixtures import ESSData
-from .utils import aiohttp_post_json, retry_options
+from .utils import aiohttp_post_json, http_client_pool
 
 
 async def get_client_token(mas_fqdn: str, generated_data: ESSData, ssl_context: SSLContext) -> str:
+    import aiohttp
+
     client_credentials_data = {"grant_type": "client_credentials", "scope": "urn:mas:admin urn:mas:graphql:*"}
-    url = f"https://{mas_fqdn}/oauth2/token"
-    host = urlparse(url).hostname
-
-    async with (
-        aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session,
-        RetryClient(session, retry_options=retry_options, raise_for_status=True) as retry,
-        retry.post(
-            url.replace(host, "127.0.0.1"),
-            headers={"Host": host},
-            server_hostname=host,
-            data=client_credentials_data,
-            auth=aiohttp.BasicAuth("000000000000000PYTESTADM1N", generated_data.mas_oidc_client_secret),
-        ) as response,
-    ):
+    async with http_client_pool.client(ssl_context).post(
+        f"https://{mas_fqdn}/oauth2/token",
+        data=client_credentials_data,
+        auth=aiohttp.BasicAuth("000000000000000PYTESTADM1N", generated_data.mas_oidc_client_secret),
+    ) as response:
         return (await response.json())["access_token"]
 
 
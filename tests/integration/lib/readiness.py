@@ -0,0 +1,235 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from lightkube import AsyncClient
+from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.resources.batch_v1 import Job
+from lightkube.resources.coordination_v1 import Lease
+from lightkube.resources.core_v1 import Endpoints
+from lightkube.resources.discovery_v1 import EndpointSlice
+from lightkube.resources.networking_v1 import Ingress
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# How long to wait for a watch to be re-established after it fails
+_rewatch_delay_seconds = 1
+# How many times in a row a watch can fail before its waiters fail, e.g. as the API isn't served or is forbidden
+_max_watch_failures = 5
+
+
+@dataclass(frozen=True)
+class ConditionTiming:
+    description: str
+    seconds: float
+    met: bool
+    # Why the condition can't be met, if waiting for it failed other than by timing out
+    error: str | None = None
+
+
+class _WatchStream:
+    """A single watch of one resource type in one namespace, holding the latest version of each object.
+
+    Every waiter on that resource type and namespace is woken by, and checks its condition against, this one stream.
+    """
+
+    def __init__(self, kube_client: AsyncClient, resource: type, namespace: str):
+        self.kube_client = kube_client
+        self.resource = resource
+        self.namespace = namespace
+        self.objects: dict[str, Any] = {}
+        self.changed = asyncio.Condition()
+        # Set once the watch has failed too many times in a row to carry on, failing every waiter
+        self.error: Exception | None = None
+        self.task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        failures = 0
+        while True:
+            try:
+                # Without a resource version the watch starts with an ADDED event for every existing object
+                async for event, obj in self.kube_client.watch(self.resource, namespace=self.namespace):
+                    failures = 0
+                    async with self.changed:
+                        if event == "DELETED":
+                            self.objects.pop(obj.metadata.name, None)
+                        else:
+                            self.objects[obj.metadata.name] = obj
+                        self.changed.notify_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                logger.warning(
+                    "Watch of %s in %s failed (%d of %d): %r",
+                    self.resource.__name__,
+                    self.namespace,
+                    failures,
+                    _max_watch_failures,
+                    e,
+                )
+                async with self.changed:
+                    # Objects deleted while disconnected would otherwise never be removed
+                    self.objects = {}
+                    if failures >= _max_watch_failures:
+                        self.error = e
+                        self.changed.notify_all()
+                        return
+                await asyncio.sleep(_rewatch_delay_seconds)
+
+    def _check(self, predicate: Callable[[dict[str, Any]], T | None]) -> T | None:
+        if self.error is not None:
+            resource_name = self.resource.__name__
+            raise RuntimeError(f"Can't watch {resource_name} in {self.namespace}: {self.error!r}") from self.error
+        return predicate(self.objects)
+
+    async def wait_for(self, predicate: Callable[[dict[str, Any]], T | None]) -> T:
+        async with self.changed:
+            return await self.changed.wait_for(lambda: self._check(predicate))
+
+
+class ReadinessEngine:
+    """Waits for resources to become ready using a watch per resource type and namespace, shared by every waiter.
+
+    How long each wait took is recorded in `timings`.
+    """
+
+    def __init__(self, kube_client: AsyncClient, timeout: float = 300):
+        self.kube_client = kube_client
+        self.timeout = timeout
+        self._streams: dict[tuple[type, str], _WatchStream] = {}
+        self.timings: list[ConditionTiming] = []
+        # How many watches were started, including those since closed
+        self.watch_count = 0
+
+    def _stream(self, resource: type, namespace: str) -> _WatchStream:
+        if (resource, namespace) not in self._streams:
+            self._streams[(resource, namespace)] = _WatchStream(self.kube_client, resource, namespace)
+            self.watch_count += 1
+        return self._streams[(resource, namespace)]
+
+    async def wait_for(
+        self,
+        resource: type,
+        namespace: str,
+        predicate: Callable[[dict[str, Any]], T | None],
+        description: str,
+        timeout: float | None = None,
+    ) -> T:
+        """Waits until the predicate, given the current objects by name, returns something other than None or False."""
+        started_at = time.monotonic()
+        try:
+            async with asyncio.timeout(timeout or self.timeout):
+                result = await self._stream(resource, namespace).wait_for(predicate)
+        except TimeoutError as e:
+            self.timings.append(ConditionTiming(description, time.monotonic() - started_at, met=False))
+            raise TimeoutError(f"Timed out waiting for {description}") from e
+        except Exception as e:
+            # e.g. the Job failed or the resource can't be watched
+            self.timings.append(ConditionTiming(description, time.monotonic() - started_at, met=False, error=str(e)))
+            raise
+        self.timings.append(ConditionTiming(description, time.monotonic() - started_at, met=True))
+        return result
+
+    async def endpoint_slices_ready(self, service_name: str, namespace: str) -> list[EndpointSlice]:
+        """Waits until the service has endpoints with ports and all of them are ready."""
+
+        def ready(endpoint_slices: dict[str, EndpointSlice]) -> list[EndpointSlice] | None:
+            service_slices = [
+                endpoint_slice
+                for endpoint_slice in endpoint_slices.values()
+                if (endpoint_slice.metadata.labels or {}).get("kubernetes.io/service-name") == service_name
+            ]
+            endpoints = [endpoint for endpoint_slice in service_slices for endpoint in endpoint_slice.endpoints or []]
+            if not endpoints or not any(endpoint_slice.ports for endpoint_slice in service_slices):
+                return None
+            # A missing ready condition means ready
+            if any(endpoint.conditions is not None and endpoint.conditions.ready is False for endpoint in endpoints):
+                return None
+            return service_slices
+
+        return await self.wait_for(EndpointSlice, namespace, ready, f"endpoint slices of {namespace}/{service_name}")
+
+    async def endpoints_ready(self, name: str, namespace: str) -> Endpoints:
+        """Waits until every subset of the Endpoints has addresses and ports and none are not ready."""
+
+        def ready(all_endpoints: dict[str, Endpoints]) -> Endpoints | None:
+            endpoints = all_endpoints.get(name)
+            if endpoints is None or not endpoints.subsets:
+                return None
+            for subset in endpoints.subsets:
+                if not subset or subset.notReadyAddresses or not subset.addresses or not subset.ports:
+                    return None
+            return endpoints
+
+        return await self.wait_for(Endpoints, namespace, ready, f"endpoints/{name} in {namespace}")
+
+    async def ingress_has_address(self, name: str, namespace: str) -> Ingress:
+        def has_address(ingresses: dict[str, Ingress]) -> Ingress | None:
+            ingress = ingresses.get(name)
+            if ingress is None or ingress.status is None or ingress.status.loadBalancer is None:
+                return None
+            load_balancer_ingresses = ingress.status.loadBalancer.ingress or []
+            return ingress if load_balancer_ingresses and load_balancer_ingresses[0].ip else None
+
+        return await self.wait_for(Ingress, namespace, has_address, f"ingress/{name} in {namespace} to have an address")
+
+    async def job_complete(self, name: str, namespace: str) -> Job:
+        """Waits until the Job has completed, failing straight away if it has failed."""
+
+        def complete(jobs: dict[str, Job]) -> Job | None:
+            job = jobs.get(name)
+            if job is None or job.status is None:
+                return None
+            for condition in job.status.conditions or []:
+                if condition.type == "Failed" and condition.status == "True":
+                    raise RuntimeError(f"job/{name} in {namespace} failed: {condition.message}")
+                if condition.type == "Complete" and condition.status == "True":
+                    return job
+            return None
+
+        return await self.wait_for(Job, namespace, complete, f"job/{name} in {namespace} to complete")
+
+    async def statefulset_rolled_out(self, name: str, namespace: str) -> StatefulSet:
+        """Waits until every replica of the StatefulSet is ready and running its latest revision."""
+
+        def rolled_out(statefulsets: dict[str, StatefulSet]) -> StatefulSet | None:
+            statefulset = statefulsets.get(name)
+            if statefulset is None or statefulset.status is None:
+                return None
+            status = statefulset.status
+            replicas = statefulset.spec.replicas if statefulset.spec.replicas is not None else 1
+            if (
+                (status.observedGeneration or 0) >= (statefulset.metadata.generation or 0)
+                and (status.readyReplicas or 0) == replicas
+                and (status.updatedReplicas or 0) == replicas
+                and status.currentRevision == status.updateRevision
+            ):
+                return statefulset
+            return None
+
+        return await self.wait_for(StatefulSet, namespace, rolled_out, f"statefulset/{name} in {namespace} to roll out")
+
+    async def lease_held(self, name: str, namespace: str) -> Lease:
+        def held(leases: dict[str, Lease]) -> Lease | None:
+            lease = leases.get(name)
+            return lease if lease is not None and lease.spec is not None and lease.spec.holderIdentity else None
+
+        return await self.wait_for(Lease, namespace, held, f"lease/{name} in {namespace} to be held")
+
+    async def close(self):
+        for stream in self._streams.values():
+            stream.task.cancel()
+        await asyncio.gather(*[stream.task for stream in self._streams.values()], return_exceptions=True)
+        self._streams.clear()
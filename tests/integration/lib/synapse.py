@@ -66,7 +66,6 @@ async def create_synapse_user(
 async def upload_media(synapse_fqdn: str, user_access_token: str, file_path: Path, ssl_context: SSLContext):
     headers = {}
     headers["Authorization"] = f"Bearer {user_access_token}"
-    headers["Host"] = synapse_fqdn
 
     content_type, _ = mimetypes.guess_type(file_path)
     if not content_type:
@@ -78,8 +77,7 @@ async def upload_media(synapse_fqdn: str, user_access_token: str, file_path: Pat
         async with (
             aiohttp_client(ssl_context) as client,
             client.post(
-                "https://127.0.0.1/_matrix/media/v3/upload",
-                server_hostname=synapse_fqdn,
+                f"https://{synapse_fqdn}/_matrix/media/v3/upload",
                 headers=headers,
                 params=params,
                 data=f.read(),
@@ -97,7 +95,6 @@ async def download_media(
 ):
     headers = {}
     headers["Authorization"] = f"Bearer {user_access_token}"
-    headers["Host"] = synapse_fqdn
     content_id = content_upload_json["content_uri"].replace(f"mxc://{server_name}/", "")
 
     # Initialize SHA-256 hasher
@@ -105,9 +102,8 @@ async def download_media(
     async with (
         aiohttp_client(ssl_context) as client,
         client.get(
-            f"https://127.0.0.1/_matrix/client/v1/media/download/{server_name}/{content_id}",
+            f"https://{synapse_fqdn}/_matrix/client/v1/media/download/{server_name}/{content_id}",
             headers=headers,
-            server_hostname=synapse_fqdn,
         ) as response,
     ):
         # Process the stream in chunks
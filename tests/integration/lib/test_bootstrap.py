@@ -0,0 +1,124 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import asyncio
+import graphlib
+
+import pytest
+
+from .bootstrap import Bootstrap, Step, StepTiming
+
+
+@pytest.mark.asyncio_cooperative
+async def test_bootstrap_runs_independent_steps_concurrently_and_dependent_steps_in_order():
+    events = []
+    c_started = asyncio.Event()
+
+    async def a(name):
+        events.append("a started")
+        # Only finishes once c has started, so waits forever if the independent steps run one at a time
+        await asyncio.wait_for(c_started.wait(), 5)
+        events.append("a finished")
+        return f"a for {name}"
+
+    async def b(a):
+        events.append("b started")
+        return f"b after {a}"
+
+    async def c():
+        c_started.set()
+        return "c"
+
+    results = await Bootstrap([Step("b", b), Step("a", a), Step("c", c)], inputs={"name": "test"}).run()
+    assert results == {"a": "a for test", "b": "b after a for test", "c": "c"}
+    assert events == ["a started", "a finished", "b started"]
+
+
+def test_bootstrap_rejects_unknown_and_cyclic_dependencies():
+    async def a(b):
+        pass
+
+    async def b(a):
+        pass
+
+    async def c(missing):
+        pass
+
+    with pytest.raises(ValueError, match="Step c depends on unknown steps: missing"):
+        Bootstrap([Step("c", c)])
+    with pytest.raises(graphlib.CycleError):
+        Bootstrap([Step("a", a), Step("b", b)])
+
+
+@pytest.mark.asyncio_cooperative
+async def test_bootstrap_tears_down_steps_in_reverse():
+    events = []
+
+    def step(name: str):
+        async def run():
+            events.append(f"{name} set up")
+            yield name
+            events.append(f"{name} torn down")
+
+        return run
+
+    async def b(a):
+        events.append("b set up")
+        yield "b"
+        events.append("b torn down")
+
+    bootstrap = Bootstrap([Step("a", step("a")), Step("b", b)])
+    assert await bootstrap.run() == {"a": "a", "b": "b"}
+    await bootstrap.teardown()
+    assert events == ["a set up", "b set up", "b torn down", "a torn down"]
+
+
+@pytest.mark.asyncio_cooperative
+async def test_bootstrap_closes_steps_cancelled_while_setting_up():
+    events = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+            yield "slow"
+        finally:
+            events.append("slow closed")
+
+    async def failing():
+        raise RuntimeError("failed")
+
+    bootstrap = Bootstrap([Step("slow", slow), Step("failing", failing)])
+    with pytest.raises(RuntimeError, match="failed"):
+        await bootstrap.run()
+    assert events == ["slow closed"]
+    # Nothing finished setting up, so there is nothing to tear down
+    await bootstrap.teardown()
+
+
+def test_bootstrap_reports_the_critical_path():
+    async def a():
+        pass
+
+    async def b():
+        pass
+
+    async def c(a, b):
+        pass
+
+    bootstrap = Bootstrap([Step("a", a), Step("b", b), Step("c", c)])
+    assert bootstrap.critical_path() == []
+    assert bootstrap.gantt() == []
+    bootstrap.timings = {
+        "a": StepTiming("a", 0, 1),
+        "b": StepTiming("b", 0, 3),
+        "c": StepTiming("c", 3, 4),
+    }
+
+    assert bootstrap.critical_path() == ["b", "c"]
+    assert bootstrap.gantt(width=8) == [
+        "  a |##      |    0.0s ->    1.0s",
+        "* b |######  |    0.0s ->    3.0s",
+        "* c |      ##|    3.0s ->    4.0s",
+        "Critical path: b -> c (4.0s)",
+    ]
@@ -0,0 +1,97 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from lightkube.resources.batch_v1 import Job
+
+from . import readiness
+from .readiness import ReadinessEngine
+
+
+class FakeKubeClient:
+    """Serves every watch from one queue of events, raising any exception put on it instead."""
+
+    def __init__(self):
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.watches = 0
+
+    async def watch(self, resource: type, namespace: str):
+        self.watches += 1
+        while True:
+            event = await self.events.get()
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+
+def job(name: str, condition_type: str, message: str | None = None) -> SimpleNamespace:
+    return SimpleNamespace(
+        metadata=SimpleNamespace(name=name),
+        status=SimpleNamespace(conditions=[SimpleNamespace(type=condition_type, status="True", message=message)]),
+    )
+
+
+@pytest.mark.asyncio_cooperative
+async def test_readiness_waiters_share_one_watch():
+    kube_client = FakeKubeClient()
+    engine = ReadinessEngine(kube_client)
+    waiters = [asyncio.create_task(engine.job_complete("migrate", "ns")) for _ in range(2)]
+    await asyncio.sleep(0)
+    kube_client.events.put_nowait(("ADDED", job("other", "Complete")))
+    kube_client.events.put_nowait(("ADDED", job("migrate", "Complete")))
+
+    assert [completed.metadata.name for completed in await asyncio.gather(*waiters)] == ["migrate", "migrate"]
+    assert kube_client.watches == 1
+    await engine.close()
+    assert engine.watch_count == 1
+    assert [(timing.description, timing.met) for timing in engine.timings] == [
+        ("job/migrate in ns to complete", True),
+        ("job/migrate in ns to complete", True),
+    ]
+
+
+@pytest.mark.asyncio_cooperative
+async def test_readiness_fails_waiting_for_a_failed_job():
+    kube_client = FakeKubeClient()
+    engine = ReadinessEngine(kube_client)
+    kube_client.events.put_nowait(("ADDED", job("migrate", "Failed", "BackoffLimitExceeded")))
+
+    with pytest.raises(RuntimeError, match="job/migrate in ns failed: BackoffLimitExceeded"):
+        await engine.job_complete("migrate", "ns")
+    await engine.close()
+    assert engine.timings[0].met is False
+    assert engine.timings[0].error == "job/migrate in ns failed: BackoffLimitExceeded"
+
+
+@pytest.mark.asyncio_cooperative
+async def test_readiness_fails_waiters_once_the_watch_keeps_failing(monkeypatch):
+    monkeypatch.setattr(readiness, "_rewatch_delay_seconds", 0)
+    kube_client = FakeKubeClient()
+    engine = ReadinessEngine(kube_client)
+    # A failure after an event doesn't count towards the failures in a row
+    kube_client.events.put_nowait(ConnectionError("reset"))
+    kube_client.events.put_nowait(("ADDED", job("other", "Complete")))
+    for _ in range(readiness._max_watch_failures):
+        kube_client.events.put_nowait(PermissionError("forbidden"))
+
+    with pytest.raises(RuntimeError, match="Can't watch Job in ns"):
+        await engine.job_complete("migrate", "ns")
+    await engine.close()
+    assert kube_client.watches == readiness._max_watch_failures + 1
+    assert "forbidden" in engine.timings[0].error
+
+
+@pytest.mark.asyncio_cooperative
+async def test_readiness_times_out():
+    kube_client = FakeKubeClient()
+    engine = ReadinessEngine(kube_client)
+
+    with pytest.raises(TimeoutError, match="Timed out waiting for job/migrate in ns to complete"):
+        await engine.wait_for(Job, "ns", lambda jobs: jobs.get("migrate"), "job/migrate in ns to complete", 0.1)
+    await engine.close()
+    assert engine.timings[0].met is False
+    assert engine.timings[0].error is None
@@ -2,26 +2,36 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-only
 
+from __future__ import annotations
+
 import asyncio
 import base64
 import json
-import os
+import socket
+import time
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
+from functools import cache
 from pathlib import Path
 from ssl import SSLContext
-from typing import Any
-from urllib.parse import urlparse
+from typing import TYPE_CHECKING, Any
 
-import aiohttp
 import yaml
-from aiohttp_retry import JitterRetry, RetryClient
 from lightkube.generic_resource import async_load_in_cluster_generic_resources, get_generic_resource
 from lightkube.resources.apiextensions_v1 import CustomResourceDefinition
 from pytest_kubernetes.providers import AClusterManager
 
-retry_options = JitterRetry(attempts=12, statuses=[500, 503], retry_all_server_errors=False)
+# aiohttp is imported when first used rather than when collecting the tests
+if TYPE_CHECKING:
+    from aiohttp_retry import JitterRetry, RetryClient
+
+
+@cache
+def retry_options() -> JitterRetry:
+    from aiohttp_retry import JitterRetry
+
+    return JitterRetry(attempts=12, statuses=[500, 503], retry_all_server_errors=False)
 
 
 @dataclass
@@ -59,13 +69,103 @@ def b64encode(value: str):
     return base64.b64encode(value.encode("utf-8")).decode("utf-8")
 
 
+class LoopbackResolver:
+    """Resolves every hostname to 127.0.0.1, where the test cluster's ingress listens.
+
+    Implements aiohttp's AbstractResolver interface. Requests keep their real hostname so that aiohttp sets
+    the Host header and TLS SNI itself and pools connections per hostname.
+    """
+
+    async def resolve(self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET) -> list[dict]:
+        return [
+            {
+                "hostname": host,
+                "host": "127.0.0.1",
+                "port": port,
+                "family": socket.AF_INET,
+                "proto": 0,
+                "flags": socket.AI_NUMERICHOST,
+            }
+        ]
+
+    async def close(self):
+        pass
+
+
+@dataclass
+class ConnectionPoolStats:
+    # Including retries
+    requests: int = 0
+    # Each of which was a TCP connection and TLS handshake
+    connections_created: int = 0
+    connections_reused: int = 0
+    connect_seconds: float = 0.0
+
+
+class HTTPClientPool:
+    """An HTTP client per SSL context shared by the whole test session, keeping connections alive between requests.
+
+    Must be closed from the event loop the clients were first used in.
+    """
+
+    def __init__(self, limit_per_host: int = 10, keepalive_timeout: float = 30):
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        # Keyed by the id of the SSL context, which is held so that the id isn't reused
+        self._clients: dict[int, tuple[SSLContext, RetryClient]] = {}
+        self.stats: dict[str, ConnectionPoolStats] = {}
+
+    def client(self, ssl_context: SSLContext) -> RetryClient:
+        if id(ssl_context) not in self._clients:
+            self._clients[id(ssl_context)] = (ssl_context, self._create_client(ssl_context))
+        return self._clients[id(ssl_context)][1]
+
+    def _create_client(self, ssl_context: SSLContext) -> RetryClient:
+        import aiohttp
+        from aiohttp_retry import RetryClient
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_connection_create_start.append(self._on_connection_create_start)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reused)
+        connector = aiohttp.TCPConnector(
+            ssl=ssl_context,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            resolver=LoopbackResolver(),
+        )
+        session = aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+        return RetryClient(session, retry_options=retry_options(), raise_for_status=True)
+
+    async def _on_request_start(self, session, context, params):
+        context.host = params.url.host
+        self.stats.setdefault(context.host, ConnectionPoolStats()).requests += 1
+
+    async def _on_connection_create_start(self, session, context, params):
+        context.connect_started_at = time.monotonic()
+
+    async def _on_connection_create_end(self, session, context, params):
+        stats = self.stats[context.host]
+        stats.connections_created += 1
+        stats.connect_seconds += time.monotonic() - context.connect_started_at
+
+    async def _on_connection_reused(self, session, context, params):
+        self.stats[context.host].connections_reused += 1
+
+    async def close(self):
+        for _, client in self._clients.values():
+            await client.close()
+        self._clients.clear()
+
+
+http_client_pool = HTTPClientPool()
+
+
 @asynccontextmanager
 async def aiohttp_client(ssl_context: SSLContext) -> AsyncGenerator[RetryClient]:
-    async with (
-        aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session,
-        RetryClient(session, retry_options=retry_options, raise_for_status=True) as client,
-    ):
-        yield client
+    """The session's pooled client for the SSL context, which stays open for other requests afterwards."""
+    yield http_client_pool.client(ssl_context)
 
 
 async def aiottp_get_json(url: str, ssl_context: SSLContext) -> Any:
@@ -78,16 +178,7 @@ async def aiottp_get_json(url: str, ssl_context: SSLContext) -> Any:
     Returns:
         Any: the Json dict response
     """
-    host = urlparse(url).hostname
-
-    async with (
-        aiohttp_client(ssl_context) as client,
-        client.get(
-            url.replace(host, "127.0.0.1"),
-            headers={"Host": host},
-            server_hostname=host,
-        ) as response,
-    ):
+    async with http_client_pool.client(ssl_context).get(url) as response:
         return await response.json()
 
 
@@ -106,14 +197,7 @@ async def aiohttp_post_json(url: str, data: dict, headers: dict, ssl_context: SS
     Returns:
         Any: the Json dict response
     """
-    host = urlparse(url).hostname
-
-    async with (
-        aiohttp_client(ssl_context) as client,
-        client.post(
-            url.replace(host, "127.0.0.1"), headers=headers | {"Host": host}, server_hostname=host, json=data
-        ) as response,
-    ):
+    async with http_client_pool.client(ssl_context).post(url, headers=headers, json=data) as response:
         # If we can 204: NO CONTENT, we dont want to try to parse json
         if response.status != 204:
             return await response.json()
@@ -121,31 +205,38 @@ async def aiohttp_post_json(url: str, data: dict, headers: dict, ssl_context: SS
             return {}
 
 
-def value_file_has(property_path, expected=None):
-    """
-    Check if a nested property (given as a dot-separated string) is would be true if the chart was installed/templated.
-    """
-
-    def merge(a: dict, b: dict, path=None):
-        if not path:
-            path = []
-        for key in b:
-            if key in a:
-                if isinstance(a[key], dict) and isinstance(b[key], dict):
-                    merge(a[key], b[key], path + [str(key)])
-                elif type(a[key]) is not type(b[key]):
-                    raise Exception("Conflict at " + ".".join(path + [str(key)]))
-                else:
-                    a[key] = b[key]
+def _merge(a: dict, b: dict, path=None):
+    if not path:
+        path = []
+    for key in b:
+        if key in a:
+            if isinstance(a[key], dict) and isinstance(b[key], dict):
+                _merge(a[key], b[key], path + [str(key)])
+            elif type(a[key]) is not type(b[key]):
+                raise Exception("Conflict at " + ".".join(path + [str(key)]))
             else:
                 a[key] = b[key]
-        return a
+        else:
+            a[key] = b[key]
+    return a
+
 
-    with (
-        open(Path().resolve() / "charts" / "matrix-stack" / "values.yaml") as base_value_file,
-        open(os.environ["TEST_VALUES_FILE"]) as test_value_file,
-    ):
-        data = merge(yaml.safe_load(base_value_file), yaml.safe_load(test_value_file))
+@cache
+def _merged_values(chart_values_path: Path, test_values_path: str) -> dict[str, Any]:
+    """The chart's values with the test values file merged over them, read once per test session.
+
+    Shared between every caller, so must not be modified.
+    """
+    with open(chart_values_path) as base_value_file, open(test_values_path) as test_value_file:
+        return _merge(yaml.safe_load(base_value_file), yaml.safe_load(test_value_file))
+
+
+def value_file_has(values_file: Path, property_path, expected=None):
+    """
+    Check if a nested property (given as a dot-separated string) is would be true if the chart was installed/templated
+    with the given values file.
+    """
+    data = _merged_values(Path().resolve() / "charts" / "matrix-stack" / "values.yaml", str(values_file))
 
     keys = property_path.split(".")
     for key in keys:
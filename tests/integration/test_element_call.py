@@ -5,10 +5,10 @@
 import pytest
 
 from .fixtures import ESSData
-from .lib.utils import aiohttp_post_json, value_file_has
+from .lib.utils import aiohttp_post_json
 
 
-@pytest.mark.skipif(value_file_has("matrixRTC.enabled", False), reason="ElementWeb not deployed")
+@pytest.mark.skipif_values("matrixRTC.enabled", False, reason="ElementWeb not deployed")
 @pytest.mark.parametrize("users", [("matrix-rtc-user",)], indirect=True)
 @pytest.mark.asyncio_cooperative
 async def test_element_call_livekit_jwt(ingress_ready, users, generated_data: ESSData, ssl_context):
@@ -5,10 +5,10 @@
 import pytest
 
 from .fixtures import ESSData
-from .lib.utils import aiottp_get_json, value_file_has
+from .lib.utils import aiottp_get_json
 
 
-@pytest.mark.skipif(value_file_has("elementWeb.enabled", False), reason="ElementWeb not deployed")
+@pytest.mark.skipif_values("elementWeb.enabled", False, reason="ElementWeb not deployed")
 @pytest.mark.asyncio_cooperative
 async def test_element_web_can_access_config_json(ingress_ready, generated_data: ESSData, ssl_context):
     await ingress_ready("element-web")
@@ -5,10 +5,10 @@
 import pytest
 
 from .fixtures import ESSData
-from .lib.utils import aiohttp_post_json, value_file_has
+from .lib.utils import aiohttp_post_json
 
 
-@pytest.mark.skipif(value_file_has("matrixAuthenticationService.enabled", False), reason="MAS not deployed")
+@pytest.mark.skipif_values("matrixAuthenticationService.enabled", False, reason="MAS not deployed")
 @pytest.mark.asyncio_cooperative
 async def test_matrix_authentication_service_graphql_endpoint(ingress_ready, generated_data: ESSData, ssl_context):
     await ingress_ready("matrix-authentication-service")
@@ -11,7 +11,7 @@ from lightkube import operators as op
 from lightkube.resources.core_v1 import Pod, Service
 
 from .fixtures.data import ESSData
-from .lib.helpers import wait_for_endpoint_ready
+from .lib.readiness import ReadinessEngine
 from .lib.utils import read_service_monitor_kind
 
 
@@ -56,8 +56,8 @@ async def test_services_have_matching_labels(
 @pytest.mark.asyncio_cooperative
 @pytest.mark.usefixtures("matrix_stack")
 async def test_services_have_endpoints(
-    cluster,
     kube_client: AsyncClient,
+    readiness: ReadinessEngine,
     generated_data: ESSData,
 ):
     endpoints_to_wait = []
@@ -66,9 +66,7 @@ async def test_services_have_endpoints(
         Service, namespace=generated_data.ess_namespace, labels={"app.kubernetes.io/part-of": op.in_(["matrix-stack"])}
     ):
         assert service.metadata is not None, f"Encountered a service without metadata : {service}"
-        endpoints_to_wait.append(
-            wait_for_endpoint_ready(service.metadata.name, generated_data.ess_namespace, cluster, kube_client)
-        )
+        endpoints_to_wait.append(readiness.endpoints_ready(service.metadata.name, generated_data.ess_namespace))
         services[service.metadata.name] = service
 
     for endpoint in await asyncio.gather(*endpoints_to_wait):
@@ -7,17 +7,18 @@ from pathlib import Path
 
 import pytest
 
-from .fixtures import ESSData
+from .fixtures import Deployment, ESSData
 from .lib.synapse import assert_downloaded_content, download_media, upload_media
-from .lib.utils import KubeCtl, aiohttp_client, aiohttp_post_json, aiottp_get_json, value_file_has
+from .lib.utils import KubeCtl, aiohttp_client, aiohttp_post_json, aiottp_get_json
 
 
-@pytest.mark.skipif(value_file_has("synapse.enabled", False), reason="Synapse not deployed")
+@pytest.mark.skipif_values("synapse.enabled", False, reason="Synapse not deployed")
 @pytest.mark.asyncio_cooperative
 async def test_synapse_can_access_client_api(
     ingress_ready,
     ssl_context,
     generated_data: ESSData,
+    deployment: Deployment,
 ):
     await ingress_ready("synapse")
 
@@ -26,11 +27,11 @@ async def test_synapse_can_access_client_api(
     )
     assert "unstable_features" in json_content
 
-    supports_qr_code_login = value_file_has("matrixAuthenticationService.enabled", True)
+    supports_qr_code_login = deployment.value_file_has("matrixAuthenticationService.enabled", True)
     assert supports_qr_code_login == json_content["unstable_features"]["org.matrix.msc4108"]
 
 
-@pytest.mark.skipif(value_file_has("synapse.enabled", False), reason="Synapse not deployed")
+@pytest.mark.skipif_values("synapse.enabled", False, reason="Synapse not deployed")
 @pytest.mark.parametrize("users", [("sliding-sync-user",)], indirect=True)
 @pytest.mark.asyncio_cooperative
 async def test_simplified_sliding_sync_syncs(ssl_context, users, generated_data: ESSData):
@@ -46,7 +47,7 @@ async def test_simplified_sliding_sync_syncs(ssl_context, users, generated_data:
     assert "pos" in sync_result
 
 
-@pytest.mark.skipif(value_file_has("synapse.enabled", False), reason="Synapse not deployed")
+@pytest.mark.skipif_values("synapse.enabled", False, reason="Synapse not deployed")
 @pytest.mark.parametrize("users", [("media-upload-unauth",)], indirect=True)
 @pytest.mark.asyncio_cooperative
 async def test_synapse_media_upload_fetch_authenticated(
@@ -54,6 +55,7 @@ async def test_synapse_media_upload_fetch_authenticated(
     ssl_context,
     users,
     generated_data: ESSData,
+    deployment: Deployment,
 ):
     user_access_token = users[0]
 
@@ -78,7 +80,7 @@ async def test_synapse_media_upload_fetch_authenticated(
 
     media_pod_suffix = (
         "synapse-media-repository-0"
-        if value_file_has("synapse.workers.media-repository.enabled", True)
+        if deployment.value_file_has("synapse.workers.media-repository.enabled", True)
         else "synapse-main-0"
     )
     media_pod = f"{generated_data.release_name}-{media_pod_suffix}"
@@ -93,9 +95,11 @@ async def test_synapse_media_upload_fetch_authenticated(
     )
 
 
-@pytest.mark.skipif(value_file_has("synapse.enabled", False), reason="MAS not deployed")
+@pytest.mark.skipif_values("synapse.enabled", False, reason="MAS not deployed")
 @pytest.mark.asyncio_cooperative
-async def test_rendezvous_cors_headers_are_only_set_with_mas(ingress_ready, generated_data: ESSData, ssl_context):
+async def test_rendezvous_cors_headers_are_only_set_with_mas(
+    ingress_ready, generated_data: ESSData, deployment: Deployment, ssl_context
+):
     await ingress_ready("synapse")
     async with (
         aiohttp_client(ssl_context) as client,
@@ -107,7 +111,7 @@ async def test_rendezvous_cors_headers_are_only_set_with_mas(ingress_ready, gene
         assert response.headers["Access-Control-Allow-Origin"] == "*"
 
         assert "Access-Control-Allow-Headers" in response.headers
-        supports_qr_code_login = value_file_has("matrixAuthenticationService.enabled", True)
+        supports_qr_code_login = deployment.value_file_has("matrixAuthenticationService.enabled", True)
         assert ("If-Match" in response.headers["Access-Control-Allow-Headers"]) == supports_qr_code_login
 
         assert "Access-Control-Expose-Headers" in response.headers
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+# Compares how quickly the `helm template` output of the CI values files can be parsed by
+# the pure-Python loader, by libyaml and by libyaml across a pool of worker processes.
+#
+# From the project root: `python -m tests.manifests.benchmark_yaml_parsing [values files...]`
+
+import asyncio
+import subprocess
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Annotated, Any
+
+import typer
+import yaml
+
+from . import manifest_parsing
+
+
+def render(values_file: Path) -> str:
+    return subprocess.run(
+        ["helm", "template", "benchmark", "charts/matrix-stack", "--values", str(values_file)],
+        check=True,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+def throughput(parse: Callable[[str], list[Any]], rendered: str, repeats: int) -> float:
+    """The best throughput, in MiB/s, from a number of parses of the rendered output."""
+    best = float("inf")
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        parse(rendered)
+        best = min(best, time.perf_counter() - started_at)
+    return len(rendered) / 1024 / 1024 / best
+
+
+def pure_python(rendered: str) -> list[Any]:
+    return [document for document in yaml.load_all(rendered, Loader=yaml.SafeLoader) if document is not None]
+
+
+def parallel(rendered: str) -> list[Any]:
+    return asyncio.run(manifest_parsing.parse_manifests(rendered, parallel=True))
+
+
+def benchmark_yaml_parsing(
+    values_files: Annotated[list[Path] | None, typer.Argument()] = None,
+    repeats: int = 5,
+):
+    values_files = values_files or sorted(Path("charts/matrix-stack/ci").glob("*-values.yaml"))
+    if manifest_parsing.SafeLoader is yaml.SafeLoader:
+        print("PyYAML has been built without libyaml, the libyaml results are for the pure-Python loader")
+
+    # Start the worker processes before anything is timed
+    parallel("---\nkind: Warmup\n")
+
+    print(f"{'values file':<60} {'MiB':>6} {'python MiB/s':>13} {'libyaml MiB/s':>14} {'parallel MiB/s':>15}")
+    try:
+        for values_file in values_files:
+            try:
+                rendered = render(values_file)
+            except subprocess.CalledProcessError as e:
+                print(f"{values_file.name:<60} failed to render: {e.stderr.strip()}")
+                continue
+
+            assert pure_python(rendered) == manifest_parsing.parse_documents(rendered) == parallel(rendered)
+            print(
+                f"{values_file.name:<60} {len(rendered) / 1024 / 1024:>6.2f} "
+                f"{throughput(pure_python, rendered, repeats):>13.2f} "
+                f"{throughput(manifest_parsing.parse_documents, rendered, repeats):>14.2f} "
+                f"{throughput(parallel, rendered, repeats):>15.2f}"
+            )
+    finally:
+        manifest_parsing.shutdown()
+
+
+def main():
+    typer.run(benchmark_yaml_parsing)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import io
+import os
+import re
+import tarfile
+from pathlib import Path
+
+# The chart directory that each package was built from. Cache keys and the template to kinds map
+# are computed from the directory, as the package itself isn't reproducible byte for byte
+chart_sources: dict[Path, Path] = {}
+
+_version_pattern = re.compile(r"^version:.*$", re.MULTILINE)
+
+
+def chart_source(chart_ref: Path | str) -> Path:
+    chart_ref = Path(chart_ref).resolve()
+    return chart_sources.get(chart_ref, chart_ref)
+
+
+async def package_chart(chart_path: Path, destination: Path) -> Path:
+    """Packages the chart directory into a .tgz in the destination directory once, so renders don't re-read it."""
+    import pyhelm3
+
+    await pyhelm3.Command().run(["package", str(chart_path), "--destination", str(destination)])
+    (package,) = destination.glob("*.tgz")
+    chart_sources[package.resolve()] = chart_path.resolve()
+    return package
+
+
+def with_chart_version(package: Path, version: str) -> Path:
+    """A copy of the packaged chart with only the version in its Chart.yaml changed.
+
+    Every other member of the package is copied across as-is, without being unpacked to disk.
+    """
+    versioned_package = package.with_name(f"{package.name.removesuffix('.tgz')}+{version}.tgz")
+    # Written then renamed so that concurrent callers never see a partial package
+    temporary_package = versioned_package.with_suffix(f".{os.getpid()}.tmp")
+    with tarfile.open(package, "r:gz") as source, tarfile.open(temporary_package, "w:gz") as destination:
+        for member in source.getmembers():
+            contents = source.extractfile(member) if member.isfile() else None
+            # The package contains a single top-level directory named after the chart
+            if member.name.count("/") == 1 and member.name.endswith("/Chart.yaml"):
+                chart_yaml = _version_pattern.sub(f'version: "{version}"', contents.read().decode("utf-8"), count=1)
+                contents = io.BytesIO(chart_yaml.encode("utf-8"))
+                member.size = len(chart_yaml.encode("utf-8"))
+            destination.addfile(member, contents)
+    temporary_package.replace(versioned_package)
+
+    chart_sources[versioned_package.resolve()] = chart_source(package)
+    return versioned_package
@@ -0,0 +1,129 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import re
+from collections.abc import Callable, Iterable
+from functools import cache
+from pathlib import Path
+
+# Only top-level `kind:`s start a manifest. Indented ones are e.g. the `kind` of a roleRef or subject
+_kind_pattern = re.compile(r"^kind:\s*([A-Za-z0-9]+)\s*$", re.MULTILINE)
+_define_pattern = re.compile(r'\{\{-?\s*define\s+"([^"]+)"\s*-?\}\}')
+_include_pattern = re.compile(r'\b(?:include|template)\s+"([^"]+)"')
+# e.g. `include (printf "element-io.%s.labels" $nameSuffix)`
+_include_printf_pattern = re.compile(r'\b(?:include|template)\s+\(printf\s+"([^"]+)"')
+_files_get_pattern = re.compile(r'\.Files\.Get\s+"([^"]+)"')
+
+
+def _defines(tpl_source: str) -> dict[str, str]:
+    """The body of each named template in a helpers file.
+
+    Each body runs up to the start of the next define, which is sufficient for finding the
+    kinds and includes within it.
+    """
+    matches = list(_define_pattern.finditer(tpl_source))
+    bodies = {}
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(tpl_source)
+        bodies[match.group(1)] = tpl_source[match.end() : end]
+    return bodies
+
+
+@cache
+def template_kinds(chart_path: Path | str) -> dict[str, frozenset[str]]:
+    """The kinds of manifest that each template file in the chart can emit.
+
+    Keyed by the path of the template relative to the chart, as `helm template --show-only` expects.
+    Kinds emitted by named templates in the chart's helpers (e.g. the ServiceAccount from
+    `element-io.ess-library.serviceAccount`) are attributed to the template files that include them.
+    """
+    chart_root = Path(chart_path)
+    define_bodies: dict[str, str] = {}
+    for tpl_path in sorted((chart_root / "templates").rglob("*.tpl")):
+        define_bodies.update(_defines(tpl_path.read_text("utf-8")))
+
+    define_kinds: dict[str, frozenset[str]] = {}
+
+    def kinds_in_define(name: str) -> frozenset[str]:
+        if name not in define_kinds:
+            # Provisionally empty so that recursive named templates terminate
+            define_kinds[name] = frozenset()
+            if name in define_bodies:
+                define_kinds[name] = _kinds_in(define_bodies[name], kinds_in_define)
+        return define_kinds[name]
+
+    templates = {}
+    for template_path in sorted((chart_root / "templates").rglob("*.yaml")):
+        kinds = _kinds_in(template_path.read_text("utf-8"), kinds_in_define)
+        if kinds:
+            templates[template_path.relative_to(chart_root).as_posix()] = kinds
+    return templates
+
+
+def _kinds_in(source: str, kinds_in_define: Callable[[str], frozenset[str]]) -> frozenset[str]:
+    kinds = set(_kind_pattern.findall(source))
+    for include in _include_pattern.findall(source):
+        kinds.update(kinds_in_define(include))
+    return frozenset(kinds)
+
+
+def templates_emitting(chart_path: Path | str, kinds: Iterable[str]) -> tuple[str, ...]:
+    """The template files in the chart that can emit any of the given kinds."""
+    kinds = set(kinds)
+    return tuple(template for template, template_kinds in template_kinds(chart_path).items() if kinds & template_kinds)
+
+
+@cache
+def template_dependencies(chart_path: Path | str) -> dict[str, frozenset[str]]:
+    """The files in the chart that the output of each template file depends on.
+
+    Keyed, like the dependencies, by the path relative to the chart. This is the template itself,
+    the helpers files of every named template it includes (directly or via other named templates)
+    and every file it, or the named templates, read with `.Files.Get`. Includes of names built with
+    `printf` depend on every named template the format string could match.
+    """
+    chart_root = Path(chart_path)
+    defines: dict[str, tuple[str, str]] = {}
+    for tpl_path in sorted((chart_root / "templates").rglob("*.tpl")):
+        tpl_relative_path = tpl_path.relative_to(chart_root).as_posix()
+        for name, body in _defines(tpl_path.read_text("utf-8")).items():
+            defines[name] = (tpl_relative_path, body)
+
+    resolved: dict[str, frozenset[str]] = {}
+
+    def resolve(reference: str, source: Callable[[], tuple[str, str] | None]) -> frozenset[str]:
+        if reference not in resolved:
+            # Provisionally empty so that recursive references terminate
+            resolved[reference] = frozenset()
+            path_and_source = source()
+            if path_and_source is not None:
+                path, body = path_and_source
+                resolved[reference] = frozenset({path}) | dependencies_of(body)
+        return resolved[reference]
+
+    def read_file(path: str) -> tuple[str, str] | None:
+        file_path = chart_root / path
+        return (path, file_path.read_text("utf-8")) if file_path.is_file() else None
+
+    def dependencies_of(source: str) -> frozenset[str]:
+        names = set(_include_pattern.findall(source))
+        for name_format in _include_printf_pattern.findall(source):
+            name_pattern = re.compile(".+".join(re.escape(part) for part in name_format.split("%s")))
+            names.update(name for name in defines if name_pattern.fullmatch(name))
+
+        dependencies = set()
+        for name in names:
+            dependencies.update(resolve(f"define:{name}", lambda name=name: defines.get(name)))
+        for path in _files_get_pattern.findall(source):
+            # Files read are often themselves templated with `tpl` and so can include named templates
+            dependencies.update(resolve(f"file:{path}", lambda path=path: read_file(path)) or {path})
+        return frozenset(dependencies)
+
+    templates = {}
+    for template_path in sorted((chart_root / "templates").rglob("*.yaml")):
+        template_relative_path = template_path.relative_to(chart_root).as_posix()
+        templates[template_relative_path] = frozenset({template_relative_path}) | dependencies_of(
+            template_path.read_text("utf-8")
+        )
+    return templates
@@ -3,5 +3,9 @@
 # SPDX-License-Identifier: AGPL-3.0-only
 
 pytest_plugins = [
+    "manifests.perf_report",
+    "manifests.impact_analysis",
+    "manifests.render_snapshots",
+    "manifests.sharding",
     "manifests.utils",
 ]
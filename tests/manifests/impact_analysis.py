@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+# Selects the manifest tests affected by a change to the chart.
+#
+# As a pytest plugin this records which chart templates each test's renders came from in the pytest
+# cache. As a script it combines that with the static dependencies of each template on helpers,
+# config files, values, etc. and a git diff to print the tests to run, one per line. If no tests are
+# affected it prints arguments that only collect the manifest tests, so that pytest doesn't run every test.
+#
+# From the project root: `pytest $(python -m tests.manifests.impact_analysis --base origin/main)`
+
+import json
+import re
+import subprocess
+import sys
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Annotated
+
+import pytest
+import typer
+
+from . import values_files_to_deployables_details
+from .chart_templates import template_dependencies
+from .perf_report import current_attribution
+from .rendered_manifests import RenderedManifests
+
+_chart_path = Path("charts/matrix-stack")
+_tests_path = Path("tests/manifests")
+_cache_key = "ess-helm/rendered-templates"
+
+# The chart templates that each test's renders came from, keyed by test node id
+rendered_templates_by_test: dict[str, set[str]] = {}
+values_file_by_test: dict[str, str | None] = {}
+
+
+def record_render(rendered: RenderedManifests):
+    attribution = current_attribution()
+    if attribution is None:
+        return
+
+    rendered_templates_by_test.setdefault(attribution.test, set()).update(rendered.source_templates)
+    values_file_by_test[attribution.test] = attribution.values_file
+
+
+def _records() -> dict[str, dict]:
+    return {
+        test: {"values_file": values_file_by_test[test], "templates": sorted(templates)}
+        for test, templates in rendered_templates_by_test.items()
+    }
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    for test, record in getattr(node, "workeroutput", {}).get("ess_helm_rendered_templates", {}).items():
+        rendered_templates_by_test.setdefault(test, set()).update(record["templates"])
+        values_file_by_test[test] = record["values_file"]
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int):
+    if hasattr(session.config, "workeroutput"):
+        # A pytest-xdist worker only recorded its own tests, so the controller merges them before writing
+        session.config.workeroutput["ess_helm_rendered_templates"] = _records()
+        return
+    if not rendered_templates_by_test or not hasattr(session.config, "cache"):
+        return
+
+    # Merged with what was recorded by previous runs, as this run may only have been a selection of tests
+    recorded = session.config.cache.get(_cache_key, {})
+    recorded.update(_records())
+    session.config.cache.set(_cache_key, recorded)
+
+
+@dataclass
+class Impact:
+    # Everything needs to be re-run
+    full_run: bool = False
+    # Chart templates, relative to the chart, whose output might have changed
+    templates: set[str] = field(default_factory=set)
+    # Values files whose every test needs to run, as the values themselves changed
+    values_files: set[str] = field(default_factory=set)
+    # Test modules that have changed and so need to run in full
+    test_modules: set[str] = field(default_factory=set)
+
+
+def _values_files_with_components(component_names: set[str]) -> set[str]:
+    return {
+        values_file
+        for values_file, deployables_details in values_files_to_deployables_details.items()
+        if any(
+            {deployable_details.name, deployable_details.helm_key, deployable_details.value_file_prefix}
+            & component_names
+            for deployable_details in deployables_details
+        )
+    }
+
+
+def _values_files_with_fragment(fragment: str) -> set[str]:
+    values_files = set()
+    for values_file in values_files_to_deployables_details:
+        values_file_path = _chart_path / "ci" / values_file
+        if not values_file_path.exists():
+            continue
+        for line in values_file_path.read_text("utf-8").splitlines():
+            if line.startswith("# source_fragments:") and fragment in line.split(":", 1)[1].split():
+                values_files.add(values_file)
+    return values_files
+
+
+def analyse(changed_paths: Iterable[str]) -> Impact:
+    impact = Impact()
+    dependencies = template_dependencies(_chart_path)
+    chart_prefix = f"{_chart_path.as_posix()}/"
+
+    changed_paths = set(changed_paths)
+    # The values file and schema are generated from source/. If any source has changed then they
+    # will have changed as a result, and the source changes tell us more about what is affected
+    source_changed = any(path.startswith(f"{chart_prefix}source/") for path in changed_paths)
+
+    for path in sorted(changed_paths):
+        if path.startswith(chart_prefix):
+            chart_relative_path = path.removeprefix(chart_prefix)
+            parts = chart_relative_path.split("/")
+            if parts[0] in ("templates", "configs"):
+                impact.templates.update(
+                    template
+                    for template, template_dependencies in dependencies.items()
+                    if chart_relative_path in template_dependencies
+                )
+                if parts[0] == "templates" and chart_relative_path.endswith(".yaml"):
+                    # Including templates that have been deleted
+                    impact.templates.add(chart_relative_path)
+            elif parts[0] == "ci" and len(parts) == 2:
+                impact.values_files.add(parts[1])
+            elif parts[0] == "ci" and parts[1] == "fragments":
+                impact.values_files.update(_values_files_with_fragment(parts[2]))
+            elif parts[0] == "source" and len(parts) == 2 and parts[1] not in ("values.schema.json", "values.yaml.j2"):
+                impact.values_files.update(_values_files_with_components({parts[1].split(".")[0]}))
+            elif parts[0] == "source" and len(parts) > 2 and parts[1] != "common":
+                impact.values_files.update(_values_files_with_components({parts[1]}))
+            elif (parts[0] in ("values.yaml", "values.schema.json") and source_changed) or parts[0] in (
+                "README.md",
+                "CHANGELOG.md",
+                "user_values",
+            ):
+                continue
+            else:
+                impact.full_run = True
+        elif path.startswith(f"{_tests_path.as_posix()}/"):
+            if Path(path).name.startswith("test_"):
+                impact.test_modules.add(path)
+            else:
+                # Test infrastructure, which every test depends on
+                impact.full_run = True
+        elif path in ("pyproject.toml", "poetry.lock"):
+            impact.full_run = True
+    return impact
+
+
+def _values_file_of(test: str) -> str | None:
+    parameters = re.search(r"\[([^\]]+)\]$", test)
+    if parameters is not None and parameters.group(1) in values_files_to_deployables_details:
+        return parameters.group(1)
+    return None
+
+
+def _component_of(template: str) -> str | None:
+    parts = template.split("/")
+    return parts[1] if len(parts) > 2 and parts[0] == "templates" else None
+
+
+def _values_files_possibly_rendering(template: str) -> set[str]:
+    """The values files that a template could render for, from the components that own its directory."""
+    component = _component_of(template)
+    values_files = _values_files_with_components({component}) if component is not None else set()
+    # Templates that no component owns, e.g. shared ones, could render for any values file
+    return values_files or set(values_files_to_deployables_details)
+
+
+def select_tests(impact: Impact, collected_tests: Iterable[str], recorded: dict[str, dict]) -> list[str]:
+    """The collected tests that need to run for the given impact.
+
+    A test needs to run if its module changed, if its values file changed or if any of the templates
+    its renders came from, as recorded by a previous run, might have changed. Tests with no recorded
+    renders run if the changed templates were rendered for their values file by any other test, or if
+    nothing at all has been recorded for their values file.
+
+    A changed template that rendered nothing for a values file in the recorded run may render something
+    now, e.g. if its enable guard changed. Every test of that values file runs if one of its components
+    owns the template, or if no component does.
+    """
+    if impact.full_run:
+        return [_tests_path.as_posix()]
+
+    templates_by_values_file: dict[str, set[str]] = {}
+    for record in recorded.values():
+        if record["values_file"] is not None:
+            templates_by_values_file.setdefault(record["values_file"], set()).update(record["templates"])
+
+    values_files_with_new_renders = set()
+    for values_file, rendered_for_values_file in templates_by_values_file.items():
+        for template in impact.templates - rendered_for_values_file:
+            if values_file in _values_files_possibly_rendering(template):
+                values_files_with_new_renders.add(values_file)
+
+    selected = []
+    for test in collected_tests:
+        values_file = _values_file_of(test)
+        record = recorded.get(test)
+        if (
+            test.split("::")[0] in impact.test_modules
+            or values_file in impact.values_files
+            or values_file in values_files_with_new_renders
+        ):
+            selected.append(test)
+        elif record is not None:
+            if impact.templates & set(record["templates"]):
+                selected.append(test)
+        elif values_file is not None and impact.templates:
+            rendered_for_values_file = templates_by_values_file.get(values_file)
+            if rendered_for_values_file is None or impact.templates & rendered_for_values_file:
+                selected.append(test)
+    return selected
+
+
+# Collects the manifest tests without running any. pytest with no arguments would run every test in the repository
+_no_tests = ["--collect-only", "-qq", _tests_path.as_posix()]
+
+
+def selection_arguments(impact: Impact, collected_tests: Iterable[str], recorded: dict[str, dict]) -> list[str]:
+    """The arguments to give pytest to run the tests that need to run for the given impact."""
+    return select_tests(impact, collected_tests, recorded) or _no_tests
+
+
+def _git_lines(*args: str) -> list[str]:
+    return [line for line in subprocess.check_output(["git", *args], text=True).splitlines() if line]
+
+
+def changed_paths_since(base: str) -> set[str]:
+    return (
+        set(_git_lines("diff", "--name-only", f"{base}...HEAD"))
+        | set(_git_lines("diff", "--name-only", "HEAD"))
+        | set(_git_lines("ls-files", "--others", "--exclude-standard"))
+    )
+
+
+def collect_tests() -> list[str]:
+    output = subprocess.run(
+        [sys.executable, "-m", "pytest", "--collect-only", "-q", _tests_path.as_posix()],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return [line for line in output.splitlines() if "::" in line]
+
+
+def impact_analysis(
+    base: Annotated[str, typer.Option(help="The git ref to compare HEAD and the working tree against")] = "main",
+    cache_dir: Annotated[Path, typer.Option(help="The pytest cache directory")] = Path(".pytest_cache"),
+):
+    impact = analyse(changed_paths_since(base))
+    recorded_path = cache_dir / "v" / _cache_key
+    if recorded_path.exists():
+        recorded = json.loads(recorded_path.read_text("utf-8"))
+    else:
+        print(
+            f"No renders recorded in {recorded_path}, run the manifest tests to record them. "
+            "Selecting tests by values file only",
+            file=sys.stderr,
+        )
+        recorded = {}
+
+    if impact.full_run:
+        print(_tests_path.as_posix())
+        return
+
+    arguments = selection_arguments(impact, collect_tests(), recorded)
+    print(f"{0 if arguments == _no_tests else len(arguments)} tests selected", file=sys.stderr)
+    for argument in arguments:
+        print(argument)
+
+
+def main():
+    typer.run(impact_analysis)
+
+
+if __name__ == "__main__":
+    main()
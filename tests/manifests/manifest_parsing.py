@@ -0,0 +1,101 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import asyncio
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    # PyYAML built without libyaml. The pure-Python loader parses identically, just slower
+    from yaml import SafeLoader
+
+_document_separator = re.compile(r"^---\s*$", re.MULTILINE)
+
+# Below this the cost of sending documents to and from worker processes outweighs parsing them in
+# parallel. Overridden with PYTEST_ESS_PARALLEL_PARSE_MB
+_parallel_parse_threshold = int(float(os.environ.get("PYTEST_ESS_PARALLEL_PARSE_MB", "2")) * 1024 * 1024)
+
+_worker_count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+_executor: ProcessPoolExecutor | None = None
+# Set once creating or using the process pool has failed, after which everything is parsed in-process
+_executor_unavailable = False
+
+
+def split_documents(rendered: str) -> list[str]:
+    """Split a multi-document YAML stream, as output by `helm template`, into its documents.
+
+    Helm only emits document separators at the start of a line and indents the contents of block
+    scalars, so a line of just `---` always starts a new document.
+    """
+    return [document for document in _document_separator.split(rendered) if document.strip()]
+
+
+def parse_documents(rendered: str) -> list[Any]:
+    return [document for document in yaml.load_all(rendered, Loader=SafeLoader) if document is not None]
+
+
+def _batches(documents: list[str], batch_count: int) -> list[str]:
+    """Group the documents into at most `batch_count` streams of roughly equal size, keeping their order."""
+    target_size = sum(len(document) for document in documents) / batch_count
+    batches: list[list[str]] = [[]]
+    batch_size = 0
+    for document in documents:
+        if batch_size >= target_size and len(batches) < batch_count:
+            batches.append([])
+            batch_size = 0
+        batches[-1].append(document)
+        batch_size += len(document)
+    return ["\n---\n".join(batch) for batch in batches]
+
+
+def _get_executor() -> ProcessPoolExecutor | None:
+    global _executor, _executor_unavailable
+    if _executor is None and not _executor_unavailable and _worker_count > 1:
+        try:
+            # spawn rather than fork as the event loop and its threads are running in this process
+            _executor = ProcessPoolExecutor(_worker_count, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError):
+            _executor_unavailable = True
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+async def parse_manifests(rendered: str, parallel: bool | None = None) -> list[Any]:
+    """Parse the output of `helm template` into a list of manifests, dropping empty documents.
+
+    Uses libyaml when PyYAML has been built with it. Large outputs, or all outputs if `parallel` is
+    set, are split into batches of documents which are parsed concurrently in a pool of worker processes.
+    """
+    global _executor_unavailable
+    if parallel is None:
+        parallel = len(rendered) >= _parallel_parse_threshold
+    executor = _get_executor() if parallel else None
+    if executor is None:
+        return parse_documents(rendered)
+
+    batches = _batches(split_documents(rendered), _worker_count)
+    loop = asyncio.get_running_loop()
+    try:
+        parsed_batches = await asyncio.gather(
+            *[loop.run_in_executor(executor, parse_documents, batch) for batch in batches]
+        )
+    except (BrokenProcessPool, OSError):
+        _executor_unavailable = True
+        shutdown()
+        return parse_documents(rendered)
+    return [document for parsed_batch in parsed_batches for document in parsed_batch]
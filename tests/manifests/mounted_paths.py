@@ -0,0 +1,64 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import re
+from collections.abc import Iterable, Iterator
+
+from .prefix_trie import PrefixTrie
+
+# A mounted path can only be referenced at the start of some content or after whitespace or a quote,
+# so the content is split once into the tokens that could be such a reference
+_path_token_pattern = re.compile(r"(?:^|(?<=[\s\"]))/[^\s\"]*")
+# The key referenced after `<mount parent>/` in a token
+_key_pattern = re.compile(r"[^)`;,]+")
+
+# The negative lookbehind prevents matching subnets like "192.168.0.0/16", "fe80::/10"
+# And also things that do not start with / like "text/xml"
+# The pattern [^\s\n\")`:%;,/]+[^\s\n\")`:%;,]+ is a regex that will find paths like /path/to/file
+# It expects to find absolute paths only
+# It is possible to add noqa in the content to ignore this path
+_absolute_path_pattern = re.compile(r"((?<![0-9a-zA-Z:])/[^\s\n\")`:'%;,/]+[^\s\n\")`:'%;,]+(?!.*noqa))")
+_absolute_path_excludes = ("://", "/bin/sh", "helm.sh/")
+
+
+class MountedPathsIndex:
+    """Where a container's mounted keys, and paths under the parents they are mounted in, are referenced.
+
+    Built from a single pass over the container's contents, i.e. its env, command and args and the
+    contents of its mounted ConfigMaps, each given as a (description, content) pair.
+    """
+
+    def __init__(self, mounted_keys: Iterable[str], mount_parents: Iterable[str], contents: Iterable[tuple[str, str]]):
+        mounted_keys = set(mounted_keys)
+        parent_prefixes = {f"{parent}/": parent for parent in mount_parents}
+        trie = PrefixTrie(mounted_keys | parent_prefixes.keys())
+
+        # The mounted keys that appear in any of the contents
+        self.used_keys: set[str] = set()
+        # For each mount parent, the `<parent>/<key>` paths referenced and the description of where
+        self.references: dict[str, list[tuple[str, str]]] = {parent: [] for parent in parent_prefixes.values()}
+        for description, content in contents:
+            for token in _path_token_pattern.finditer(content):
+                for prefix in trie.prefixes_of(token.group()):
+                    if prefix in mounted_keys:
+                        self.used_keys.add(prefix)
+                    if prefix not in parent_prefixes:
+                        continue
+
+                    key = _key_pattern.match(token.group(), len(prefix))
+                    if key is None:
+                        continue
+                    # Anything with noqa later on the same line isn't checked
+                    line_end = content.find("\n", token.start() + key.end())
+                    if "noqa" in content[token.start() + key.end() : line_end if line_end != -1 else None]:
+                        continue
+                    self.references[parent_prefixes[prefix]].append((f"{prefix}{key.group()}", description))
+
+
+def find_absolute_paths(contents: Iterable[str]) -> Iterator[str]:
+    for content in contents:
+        assert type(content) is str, f"Content must be a string: {content}"
+        for line in content.split("\n"):
+            if not any(exclude in line for exclude in _absolute_path_excludes):
+                yield from _absolute_path_pattern.findall(line)
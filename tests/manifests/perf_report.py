@@ -0,0 +1,216 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import json
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import pytest
+
+
+@dataclass
+class PerfCounters:
+    renders: int = 0
+    helm_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    manifest_bytes: int = 0
+    memory_cache_hits: int = 0
+    disk_cache_hits: int = 0
+    coalesced_renders: int = 0
+    values_seconds: float = 0.0
+    setup_seconds: float = 0.0
+    call_seconds: float = 0.0
+
+
+@dataclass(frozen=True)
+class Attribution:
+    test: str
+    values_file: str | None
+
+
+# Which test (and so values file) the work in the current task is being done for. Copied into
+# the tasks that the work starts, so a render is attributed to the test that started it
+_attribution: ContextVar[Attribution | None] = ContextVar("ess_perf_attribution", default=None)
+
+
+def current_attribution() -> Attribution | None:
+    return _attribution.get()
+
+
+class PerfRecorder:
+    """Collects where the time in the manifest tests goes, per test and per values file."""
+
+    def __init__(self):
+        self.by_values_file: dict[str, PerfCounters] = {}
+        self.by_test: dict[str, PerfCounters] = {}
+        # The time helm took to render each unmodified values file. This is what is compared to the baseline
+        self.base_render_seconds: dict[str, float] = {}
+
+    @contextmanager
+    def attribute_to(self, node: pytest.Item) -> Iterator[None]:
+        callspec = getattr(node, "callspec", None)
+        values_file = callspec.params.get("values_file") if callspec is not None else None
+        token = _attribution.set(Attribution(node.nodeid, values_file))
+        try:
+            yield
+        finally:
+            _attribution.reset(token)
+
+    def _counters(self) -> list[PerfCounters]:
+        attribution = _attribution.get()
+        if attribution is None:
+            return []
+
+        counters = [self.by_test.setdefault(attribution.test, PerfCounters())]
+        if attribution.values_file is not None:
+            counters.append(self.by_values_file.setdefault(attribution.values_file, PerfCounters()))
+        return counters
+
+    def record_render(self, helm_seconds: float, parse_seconds: float, manifest_bytes: int, base_render: bool):
+        for counters in self._counters():
+            counters.renders += 1
+            counters.helm_seconds += helm_seconds
+            counters.parse_seconds += parse_seconds
+            counters.manifest_bytes += manifest_bytes
+
+        attribution = _attribution.get()
+        if base_render and attribution is not None and attribution.values_file is not None:
+            self.base_render_seconds[attribution.values_file] = helm_seconds
+
+    def record_cache_hit(self, from_disk: bool):
+        for counters in self._counters():
+            if from_disk:
+                counters.disk_cache_hits += 1
+            else:
+                counters.memory_cache_hits += 1
+
+    def record_coalesced_render(self):
+        for counters in self._counters():
+            counters.coalesced_renders += 1
+
+    def record_values(self, seconds: float):
+        for counters in self._counters():
+            counters.values_seconds += seconds
+
+    def record_test_phase(self, when: str, seconds: float):
+        for counters in self._counters():
+            if when == "setup":
+                counters.setup_seconds += seconds
+            elif when == "call":
+                counters.call_seconds += seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "values_files": {name: asdict(counters) for name, counters in sorted(self.by_values_file.items())},
+            "tests": {name: asdict(counters) for name, counters in sorted(self.by_test.items())},
+            "base_render_seconds": dict(sorted(self.base_render_seconds.items())),
+        }
+
+    def merge(self, recorded: dict):
+        """Adds what another recorder recorded, from its `as_dict()`, e.g. that of a pytest-xdist worker."""
+        for counters_by_name, recorded_by_name in (
+            (self.by_values_file, recorded["values_files"]),
+            (self.by_test, recorded["tests"]),
+        ):
+            for name, recorded_counters in recorded_by_name.items():
+                counters = counters_by_name.setdefault(name, PerfCounters())
+                for counter, value in recorded_counters.items():
+                    setattr(counters, counter, getattr(counters, counter) + value)
+        self.base_render_seconds.update(recorded["base_render_seconds"])
+
+    def regressions(self, baseline: dict[str, float], threshold: float) -> dict[str, tuple[float, float]]:
+        """Values files whose base render took more than `threshold` times as long as in the baseline.
+
+        Values files that weren't rendered by helm this run, e.g. as they came from the render cache,
+        can't be compared and are skipped.
+        """
+        return {
+            values_file: (baseline[values_file], seconds)
+            for values_file, seconds in self.base_render_seconds.items()
+            if values_file in baseline and seconds > baseline[values_file] * threshold
+        }
+
+
+perf_recorder = PerfRecorder()
+regressed_values_files: dict[str, tuple[float, float]] = {}
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_makereport(item: pytest.Item, call: pytest.CallInfo):
+    report = yield
+    with perf_recorder.attribute_to(item):
+        perf_recorder.record_test_phase(report.when, report.duration)
+    return report
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    recorded = getattr(node, "workeroutput", {}).get("ess_helm_perf")
+    if recorded is not None:
+        perf_recorder.merge(recorded)
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int):
+    if hasattr(session.config, "workeroutput"):
+        # A pytest-xdist worker only recorded its own tests, so the controller merges them and writes the report
+        session.config.workeroutput["ess_helm_perf"] = perf_recorder.as_dict()
+        return
+
+    if "PYTEST_ESS_PERF_REPORT" in os.environ:
+        Path(os.environ["PYTEST_ESS_PERF_REPORT"]).write_text(json.dumps(perf_recorder.as_dict(), indent=2), "utf-8")
+
+    if "PYTEST_ESS_PERF_BASELINE" not in os.environ:
+        return
+
+    baseline_path = Path(os.environ["PYTEST_ESS_PERF_BASELINE"])
+    if not baseline_path.exists() or os.environ.get("PYTEST_ESS_PERF_UPDATE_BASELINE", "0") == "1":
+        baseline = json.loads(baseline_path.read_text("utf-8")) if baseline_path.exists() else {}
+        baseline.update(perf_recorder.base_render_seconds)
+        baseline_path.write_text(json.dumps(dict(sorted(baseline.items())), indent=2), "utf-8")
+        return
+
+    threshold = float(os.environ.get("PYTEST_ESS_PERF_THRESHOLD", "1.5"))
+    regressed_values_files.update(perf_recorder.regressions(json.loads(baseline_path.read_text("utf-8")), threshold))
+    if regressed_values_files and session.exitstatus == pytest.ExitCode.OK:
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus: int, config: pytest.Config):
+    if "PYTEST_ESS_PERF_REPORT" not in os.environ and "PYTEST_ESS_PERF_BASELINE" not in os.environ:
+        return
+
+    terminalreporter.write_sep("-", "manifest test performance")
+    terminalreporter.write_line(
+        f"{'values file':<60} {'renders':>7} {'helm s':>8} {'parse s':>8} {'MiB':>7} "
+        f"{'mem hits':>8} {'disk hits':>9} {'coalesced':>9} {'tests s':>8}"
+    )
+    by_helm_time = sorted(perf_recorder.by_values_file.items(), key=lambda item: item[1].helm_seconds, reverse=True)
+    for values_file, counters in by_helm_time:
+        terminalreporter.write_line(
+            f"{values_file:<60} {counters.renders:>7} {counters.helm_seconds:>8.2f} {counters.parse_seconds:>8.2f} "
+            f"{counters.manifest_bytes / 1024 / 1024:>7.1f} {counters.memory_cache_hits:>8} "
+            f"{counters.disk_cache_hits:>9} {counters.coalesced_renders:>9} {counters.call_seconds:>8.2f}"
+        )
+
+    terminalreporter.write_line("")
+    terminalreporter.write_line("slowest tests:")
+    by_duration = sorted(
+        perf_recorder.by_test.items(),
+        key=lambda item: item[1].setup_seconds + item[1].call_seconds,
+        reverse=True,
+    )
+    for test, counters in by_duration[:10]:
+        terminalreporter.write_line(
+            f"{counters.setup_seconds + counters.call_seconds:>8.2f}s {test} ({counters.renders} renders, "
+            f"{counters.helm_seconds:.2f}s in helm, {counters.parse_seconds:.2f}s parsing)"
+        )
+
+    for values_file, (baseline_seconds, seconds) in sorted(regressed_values_files.items()):
+        terminalreporter.write_line(
+            f"{values_file} took {seconds:.2f}s to render vs {baseline_seconds:.2f}s in the baseline", red=True
+        )
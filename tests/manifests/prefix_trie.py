@@ -0,0 +1,34 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from collections.abc import Iterable, Iterator
+
+
+class PrefixTrie:
+    """A set of strings which finds every one of them that is a prefix of a string in a single walk of it."""
+
+    # The key under which a node stores the string that ends at it. Never a character of a string
+    _string_key = None
+
+    def __init__(self, strings: Iterable[str]):
+        self._root: dict = {}
+        for string in strings:
+            node = self._root
+            for character in string:
+                node = node.setdefault(character, {})
+            node[self._string_key] = string
+
+    def prefixes_of(self, text: str) -> Iterator[str]:
+        node = self._root
+        for character in text:
+            if self._string_key in node:
+                yield node[self._string_key]
+            node = node.get(character)
+            if node is None:
+                return
+        if self._string_key in node:
+            yield node[self._string_key]
+
+    def has_prefix_of(self, text: str) -> bool:
+        return next(self.prefixes_of(text), None) is not None
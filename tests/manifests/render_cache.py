@@ -0,0 +1,239 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import pickle
+import time
+import zlib
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+# The parts of the chart that can change the output of `helm template`. Everything else in the
+# chart directory (ci/, source/, etc) is either .helmignore-d or has no bearing on the render
+_chart_inputs = ("templates", "configs", "values.yaml", "values.schema.json", "Chart.yaml")
+
+# Part of every key, so that entries pickled by older versions of the tests are never loaded. Bump this
+# whenever the cached objects change shape, e.g. an attribute is added to RenderedManifests
+cache_format_version = 2
+
+
+@cache
+def chart_tree_hash(chart_path: Path | str) -> str:
+    """Content hash of everything in the chart that can influence a render.
+
+    Memoised per chart path for the session. Charts that are modified on disk mid-session
+    must render with `skip_cache=True`.
+    """
+    chart_root = Path(chart_path)
+    digest = hashlib.sha256()
+    for chart_input in _chart_inputs:
+        input_path = chart_root / chart_input
+        if input_path.is_dir():
+            paths = sorted(path for path in input_path.rglob("*") if path.is_file())
+        elif input_path.is_file():
+            paths = [input_path]
+        else:
+            paths = []
+
+        for path in paths:
+            digest.update(path.relative_to(chart_root).as_posix().encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(path.read_bytes())
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def render_cache_key(
+    chart_path: Path | str,
+    chart_version: str,
+    values_hash: str,
+    additional_apis: list[str],
+    release_name: str,
+    helm_version: str,
+    kinds: list[str] | None = None,
+) -> str:
+    return hashlib.sha256(
+        json.dumps(
+            {
+                "format": cache_format_version,
+                "chart": chart_tree_hash(chart_path),
+                # Packaged charts can have a different version to the chart directory they were built from
+                "chart_version": chart_version,
+                "values": values_hash,
+                "additional_apis": sorted(additional_apis),
+                "release_name": release_name,
+                "helm_version": helm_version,
+                # Renders filtered down to some kinds are distinct from the full render
+                "kinds": kinds,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+# How often a render locked by another process is checked for
+_lock_poll_seconds = 0.05
+# Lock files are only removed once they can't be in use by any reasonable run
+_stale_lock_seconds = 24 * 60 * 60
+
+
+@contextmanager
+def locked(path: Path) -> Iterator[None]:
+    """Holds an exclusive lock on the file at path, blocking until it can be taken.
+
+    For short critical sections shared between processes, e.g. picking the release name.
+    """
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@dataclass
+class RenderCacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    # Renders that another process was already running and were waited on rather than rendered again
+    shared: int = 0
+
+
+class RenderCache:
+    """An on-disk, content-addressed store of parsed `helm template` output.
+
+    Each entry is a single zlib compressed pickle of the parsed render. The file mtime
+    is bumped on every hit so that eviction can remove the least recently used entries first
+    once the cache grows beyond `max_bytes`.
+
+    The directory can be shared by concurrent processes, e.g. pytest-xdist workers. Entries are
+    written atomically and a render is locked while it runs, so that any other process wanting
+    the same render waits for it rather than running `helm template` too.
+
+    Entries that can't be unpickled, or that aren't an instance of `entry_type` when it is given, are
+    treated as misses and rendered again.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, entry_type: type | None = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entry_type = entry_type
+        self.stats = RenderCacheStats()
+        self._locks_directory = directory / "locks"
+        self._locks_directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pickle.z"
+
+    def _load(self, key: str) -> Any | None:
+        path = self._path(key)
+        try:
+            entry = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            templates = pickle.loads(zlib.decompress(entry))
+        # Entries written by other versions of the tests can fail to unpickle in any number of ways,
+        # e.g. an AttributeError for a class that has since been renamed
+        except Exception:
+            return None
+        if self.entry_type is not None and not isinstance(templates, self.entry_type):
+            return None
+
+        os.utime(path)
+        return templates
+
+    def get(self, key: str) -> Any | None:
+        templates = self._load(key)
+        if templates is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return templates
+
+    @asynccontextmanager
+    async def _render_lock(self, key: str):
+        path = self._locks_directory / f"{key}.lock"
+        with open(path, "a") as lock_file:
+            # Opening it doesn't change the mtime that eviction looks at
+            os.utime(lock_file.fileno())
+            # Polled rather than blocking so that the event loop carries on with other renders meanwhile
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(_lock_poll_seconds)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    async def get_or_render(self, key: str, render: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """The cached entry for key, rendering and storing it if there isn't one.
+
+        Returns the entry and whether it came from the cache, including from a render by another process.
+        """
+        templates = self._load(key)
+        if templates is not None:
+            self.stats.hits += 1
+            return templates, True
+
+        async with self._render_lock(key):
+            # Another process may have rendered it while we waited for the lock
+            templates = self._load(key)
+            if templates is not None:
+                self.stats.shared += 1
+                return templates, True
+
+            self.stats.misses += 1
+            templates = await render()
+            self.put(key, templates)
+            return templates, False
+
+    def put(self, key: str, templates: Any):
+        path = self._path(key)
+        # Write then rename so that an interrupted run never leaves a truncated entry behind
+        temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+        temporary_path.write_bytes(zlib.compress(pickle.dumps(templates, protocol=pickle.HIGHEST_PROTOCOL), 1))
+        temporary_path.replace(path)
+        self.stats.writes += 1
+
+    def evict(self):
+        entries = []
+        for path in self.directory.glob("*.pickle.z"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+            self.stats.evictions += 1
+
+        # A lock file could be in use by another process that is still running. Removing it would let a
+        # third process lock a new file of the same name, so only long untouched lock files are removed
+        stale_before = time.time() - _stale_lock_seconds
+        for path in self._locks_directory.glob("*.lock"):
+            try:
+                if path.stat().st_mtime < stale_before:
+                    path.unlink(missing_ok=True)
+            except OSError:
+                continue
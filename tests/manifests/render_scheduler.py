@@ -0,0 +1,102 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from pathlib import Path
+
+# A rough upper bound of the resident memory of a single `helm template` of this chart,
+# used to avoid starting more renders than the machine can hold in memory
+_memory_per_render = 256 * 1024 * 1024
+
+
+class RenderPriority(IntEnum):
+    # Renders of the unmodified CI values files. Most tests are waiting on one of these
+    BASE = 0
+    # Renders of values a test has modified via make_templates
+    MUTATION = 1
+
+
+@dataclass(frozen=True)
+class RenderTiming:
+    priority: RenderPriority
+    queue_wait: float
+    execution: float
+
+
+def _available_memory() -> int | None:
+    try:
+        for line in Path("/proc/meminfo").read_text("utf-8").splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def default_max_concurrency() -> int:
+    if "PYTEST_ESS_HELM_CONCURRENCY" in os.environ:
+        return max(1, int(os.environ["PYTEST_ESS_HELM_CONCURRENCY"]))
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    available_memory = _available_memory()
+    if available_memory is not None:
+        cpus = min(cpus, available_memory // _memory_per_render)
+    # pytest-xdist workers share the machine between them
+    return max(1, cpus // int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", "1")))
+
+
+class RenderScheduler:
+    """Limits the number of concurrent helm invocations.
+
+    Waiters are woken in priority order, and then in the order they started waiting. Each
+    slot records how long it waited in the queue vs how long it was held for.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.timings: list[RenderTiming] = []
+        self._running = 0
+        self._waiters: list[tuple[RenderPriority, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, priority: RenderPriority) -> AsyncIterator[None]:
+        queued_at = time.monotonic()
+        if self._running < self.max_concurrency and not self._waiters:
+            self._running += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # The slot may have been handed over to us just before we were cancelled
+                if waiter.done() and not waiter.cancelled():
+                    self._release()
+                raise
+
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings.append(RenderTiming(priority, started_at - queued_at, time.monotonic() - started_at))
+            self._release()
+
+    def _release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            # Cancelled waiters are left in the heap and skipped here
+            if not waiter.done():
+                # The slot passes straight to the waiter, so the running count is unchanged
+                waiter.set_result(None)
+                return
+        self._running -= 1
@@ -0,0 +1,359 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import gzip
+import hashlib
+import json
+import os
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from .rendered_manifests import RenderedManifests
+
+# Where a value was added or removed by a change
+ABSENT = "<absent>"
+
+
+@dataclass(frozen=True)
+class Change:
+    path: str
+    before: Any
+    after: Any
+
+
+def structural_diff(before: Any, after: Any, path: str = "") -> Iterator[Change]:
+    """The differences between two parsed manifests, as the paths of the values that differ."""
+    if isinstance(before, dict) and isinstance(after, dict):
+        for key in sorted(before.keys() | after.keys(), key=str):
+            key_path = f"{path}.{key}" if path else str(key)
+            yield from structural_diff(before.get(key, ABSENT), after.get(key, ABSENT), key_path)
+    elif isinstance(before, list) and isinstance(after, list):
+        for index in range(max(len(before), len(after))):
+            yield from structural_diff(
+                before[index] if index < len(before) else ABSENT,
+                after[index] if index < len(after) else ABSENT,
+                f"{path}[{index}]",
+            )
+    elif before != after:
+        yield Change(path, before, after)
+
+
+def _manifest_id(manifest: dict[str, Any]) -> str:
+    metadata = manifest.get("metadata") or {}
+    return f"{manifest['kind']}/{metadata.get('name')}"
+
+
+def _keyed(manifests: Iterable[dict[str, Any]]) -> Iterator[tuple[str, dict[str, Any]]]:
+    # A chart can render two manifests with the same kind and name, which are told apart by their order
+    occurrences: dict[str, int] = {}
+    for manifest in manifests:
+        manifest_id = _manifest_id(manifest)
+        occurrences[manifest_id] = occurrences.get(manifest_id, 0) + 1
+        yield (manifest_id if occurrences[manifest_id] == 1 else f"{manifest_id}#{occurrences[manifest_id]}"), manifest
+
+
+@dataclass
+class SnapshotDiff:
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    changed: dict[str, list[Change]] = field(default_factory=dict)
+
+    @property
+    def unchanged(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+class SnapshotStore:
+    """The parsed render of each values file, as gzipped JSON with one manifest per line.
+
+    The first line holds what else the render depends on, e.g. the release name. Snapshots are read
+    a manifest at a time, so only one manifest from a snapshot is held in memory when diffing.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, values_file: str) -> Path:
+        return self.directory / f"{values_file}.jsonl.gz"
+
+    def manifests(self, values_file: str, context: dict[str, str]) -> Iterator[tuple[str, dict[str, Any]]] | None:
+        path = self._path(values_file)
+        if not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as snapshot:
+            if json.loads(snapshot.readline() or "null") != context:
+                # Rendered with e.g. a different release name, so every manifest would differ
+                return None
+        return self._read(path)
+
+    def _read(self, path: Path) -> Iterator[tuple[str, dict[str, Any]]]:
+        with gzip.open(path, "rt", encoding="utf-8") as snapshot:
+            snapshot.readline()
+            for line in snapshot:
+                manifest_id, manifest = json.loads(line)
+                yield manifest_id, manifest
+
+    def pending_path(self, values_file: str, worker: str) -> Path:
+        """Where a pytest-xdist worker writes a snapshot, for the controller to keep or discard."""
+        return self.directory / f"{values_file}.{worker}.pending.jsonl.gz"
+
+    def keep_pending(self, values_file: str, pending_path: Path):
+        pending_path.replace(self._path(values_file))
+
+    def write(
+        self,
+        values_file: str,
+        context: dict[str, str],
+        manifests: Iterable[dict[str, Any]],
+        path: Path | None = None,
+    ):
+        path = path or self._path(values_file)
+        # Written then renamed so that an interrupted run never leaves a truncated snapshot
+        temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with gzip.open(temporary_path, "wt", encoding="utf-8", compresslevel=6) as snapshot:
+            snapshot.write(json.dumps(context, sort_keys=True) + "\n")
+            for manifest_id, manifest in _keyed(manifests):
+                snapshot.write(json.dumps([manifest_id, manifest], sort_keys=True) + "\n")
+        temporary_path.replace(path)
+
+    def _module_hashes_path(self) -> Path:
+        return self.directory / "test-modules.json"
+
+    def module_hashes(self) -> dict[str, str]:
+        """The hash of each test module as of the last run in which all of its tests passed."""
+        path = self._module_hashes_path()
+        return json.loads(path.read_text("utf-8")) if path.exists() else {}
+
+    def write_module_hashes(self, module_hashes: dict[str, str]):
+        path = self._module_hashes_path()
+        temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+        temporary_path.write_text(json.dumps(dict(sorted(module_hashes.items())), indent=2), "utf-8")
+        temporary_path.replace(path)
+
+    def diff(
+        self, values_file: str, context: dict[str, str], manifests: Iterable[dict[str, Any]]
+    ) -> SnapshotDiff | None:
+        """How the manifests differ from the snapshot, or None if there's no snapshot to compare to."""
+        snapshot = self.manifests(values_file, context)
+        if snapshot is None:
+            return None
+
+        rendered = dict(_keyed(manifests))
+        diff = SnapshotDiff()
+        for manifest_id, before in snapshot:
+            after = rendered.pop(manifest_id, None)
+            if after is None:
+                diff.removed.append(manifest_id)
+                continue
+            changes = list(structural_diff(before, after))
+            if changes:
+                diff.changed[manifest_id] = changes
+        diff.added = sorted(rendered)
+        return diff
+
+
+# Set from PYTEST_ESS_SNAPSHOTS. `diff` reports how the render of each values file differs from the
+# previous run and `skip-unchanged` also skips the tests of values files that render the same as then
+snapshot_mode: str | None = None
+snapshot_store: SnapshotStore | None = None
+snapshot_diffs: dict[str, SnapshotDiff | None] = {}
+_snapshot_renders: dict[str, tuple[dict[str, str], RenderedManifests]] = {}
+_failed_values_files: set[str] = set()
+# The tests collected in each test module, by node id, before any were deselected, and the tests that reported
+_collected_by_module: dict[str, set[str]] = {}
+_reported_tests: set[str] = set()
+_failed_modules: set[str] = set()
+_recorded_module_hashes: dict[str, str] | None = None
+# With pytest-xdist, the snapshots written by the workers for the controller to keep once every test has reported
+_pending_snapshots: dict[str, list[Path]] = {}
+_workers_crashed = False
+
+
+def compare_to_snapshot(values_file: str, context: dict[str, str], rendered: RenderedManifests) -> SnapshotDiff | None:
+    """Diffs the render of the unmodified values file against its snapshot, once per session."""
+    if values_file not in snapshot_diffs:
+        snapshot_diffs[values_file] = snapshot_store.diff(values_file, context, rendered)
+        _snapshot_renders[values_file] = (context, rendered)
+    return snapshot_diffs[values_file]
+
+
+def values_file_of(item: pytest.Item) -> str | None:
+    callspec = getattr(item, "callspec", None)
+    return callspec.params.get("values_file") if callspec is not None else None
+
+
+@cache
+def _test_infrastructure_hash() -> str:
+    """Content hash of the modules shared by the manifest tests, e.g. utils.py and the fixtures."""
+    digest = hashlib.sha256()
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        if not path.name.startswith("test_"):
+            digest.update(path.name.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(path.read_bytes())
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@cache
+def module_hash(path: Path) -> str:
+    """The hash of a test module together with the test infrastructure that it depends on."""
+    digest = hashlib.sha256(_test_infrastructure_hash().encode("utf-8"))
+    digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _module_of(item: pytest.Item) -> str:
+    return item.nodeid.split("::")[0]
+
+
+def _module_unchanged(item: pytest.Item) -> bool:
+    global _recorded_module_hashes
+    if _recorded_module_hashes is None:
+        _recorded_module_hashes = snapshot_store.module_hashes()
+    return _recorded_module_hashes.get(_module_of(item)) == module_hash(item.path)
+
+
+def skip_if_unchanged(item: pytest.Item):
+    """Skips the test if its values file renders the same as its snapshot and PYTEST_ESS_SNAPSHOTS=skip-unchanged.
+
+    Only for tests of the render of the unmodified values file. Tests that render modified values can
+    be affected by template changes that don't show in that render, so always run. So do the tests of
+    any test module that has changed since all of its tests last passed.
+    """
+    if snapshot_mode != "skip-unchanged" or "make_templates" in item.fixturenames:
+        return
+    values_file = values_file_of(item)
+    diff = snapshot_diffs.get(values_file)
+    if diff is not None and diff.unchanged and _module_unchanged(item):
+        # pytest-asyncio-cooperative only stops pytest from setting up the fixtures again, synchronously,
+        # once they have all been filled. A skip from a fixture has to do the same
+        item.fixturenames = []
+        pytest.skip(f"{values_file} renders the same as its previous snapshot")
+
+
+def pytest_configure(config: pytest.Config):
+    global snapshot_mode, snapshot_store
+    snapshot_mode = os.environ.get("PYTEST_ESS_SNAPSHOTS")
+    if snapshot_mode is None:
+        return
+    if snapshot_mode not in ("diff", "skip-unchanged"):
+        raise pytest.UsageError(f"PYTEST_ESS_SNAPSHOTS must be diff or skip-unchanged, not {snapshot_mode}")
+    if not hasattr(config, "cache"):
+        raise pytest.UsageError("PYTEST_ESS_SNAPSHOTS needs pytest's cacheprovider plugin")
+    snapshot_store = SnapshotStore(config.cache.mkdir("ess-helm-snapshots"))
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_makereport(item: pytest.Item, call: pytest.CallInfo):
+    report = yield
+    # So that the controller knows the values file of the tests that pytest-xdist workers ran
+    values_file = values_file_of(item)
+    if values_file is not None:
+        report.user_properties.append(("values_file", values_file))
+    return report
+
+
+# Before any other plugin deselects tests, e.g. with -k
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(session: pytest.Session, config: pytest.Config, items: list[pytest.Item]):
+    for item in items:
+        _collected_by_module.setdefault(_module_of(item), set()).add(item.nodeid)
+
+
+def pytest_runtest_logreport(report: pytest.TestReport):
+    module = report.nodeid.split("::")[0]
+    _reported_tests.add(report.nodeid)
+    if report.failed:
+        _failed_modules.add(module)
+        values_file = dict(report.user_properties).get("values_file")
+        if values_file is not None:
+            _failed_values_files.add(values_file)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    global _workers_crashed
+    # Which tests a crashed worker failed isn't known, so nothing it rendered can be trusted
+    _workers_crashed = _workers_crashed or error is not None
+    workeroutput = getattr(node, "workeroutput", {}).get("ess_helm_snapshots", {})
+    for values_file, path in workeroutput.get("pending", {}).items():
+        _pending_snapshots.setdefault(values_file, []).append(Path(path))
+    for module, tests in workeroutput.get("collected", {}).items():
+        _collected_by_module.setdefault(module, set()).update(tests)
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int):
+    if snapshot_store is None:
+        return
+
+    if hasattr(session.config, "workeroutput"):
+        # A pytest-xdist worker only sees its own tests' failures, so the controller decides which snapshots to keep
+        pending = {}
+        for values_file, (context, rendered) in _snapshot_renders.items():
+            diff = snapshot_diffs[values_file]
+            if diff is None or not diff.unchanged:
+                path = snapshot_store.pending_path(values_file, session.config.workerinput["workerid"])
+                snapshot_store.write(values_file, context, rendered, path)
+                pending[values_file] = str(path)
+        session.config.workeroutput["ess_helm_snapshots"] = {
+            "pending": pending,
+            "collected": {module: sorted(tests) for module, tests in _collected_by_module.items()},
+        }
+        return
+
+    # Only renders whose tests all passed become the snapshot to compare to, otherwise a failure
+    # would be skipped as unchanged by the next run
+    for values_file, (context, rendered) in _snapshot_renders.items():
+        diff = snapshot_diffs[values_file]
+        if values_file not in _failed_values_files and (diff is None or not diff.unchanged):
+            snapshot_store.write(values_file, context, rendered)
+    for values_file, paths in _pending_snapshots.items():
+        # Every worker that rendered the values file rendered the same, so any one of them can be kept
+        if values_file not in _failed_values_files and not _workers_crashed:
+            snapshot_store.keep_pending(values_file, paths.pop())
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    if _workers_crashed:
+        return
+    # Tests selected by node id are all that is collected of their module
+    selected_by_node_id = {Path(arg.split("::")[0]).resolve() for arg in session.config.args if "::" in arg}
+    module_hashes = snapshot_store.module_hashes()
+    for module, tests in _collected_by_module.items():
+        module_path = session.config.rootpath / module
+        if module in _failed_modules:
+            module_hashes.pop(module, None)
+        # Only once every test of the module has passed, rather than e.g. those selected with -k
+        elif tests <= _reported_tests and module_path.resolve() not in selected_by_node_id:
+            module_hashes[module] = module_hash(module_path)
+    snapshot_store.write_module_hashes(module_hashes)
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus: int, config: pytest.Config):
+    if snapshot_store is None or not snapshot_diffs:
+        return
+
+    terminalreporter.write_sep("-", "manifest snapshots")
+    for values_file, diff in sorted(snapshot_diffs.items()):
+        if diff is None:
+            terminalreporter.write_line(f"{values_file}: no previous snapshot")
+        elif diff.unchanged:
+            terminalreporter.write_line(f"{values_file}: unchanged")
+        else:
+            terminalreporter.write_line(f"{values_file}:")
+            for manifest_id in diff.added:
+                terminalreporter.write_line(f"  + {manifest_id}", green=True)
+            for manifest_id in diff.removed:
+                terminalreporter.write_line(f"  - {manifest_id}", red=True)
+            for manifest_id, changes in diff.changed.items():
+                terminalreporter.write_line(f"  ~ {manifest_id}", yellow=True)
+                for change in changes:
+                    terminalreporter.write_line(f"      {change.path}: {change.before!r} -> {change.after!r}")
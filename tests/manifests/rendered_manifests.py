@@ -0,0 +1,62 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any
+
+
+class RenderedManifests(Sequence[dict[str, Any]]):
+    """The manifests from a single helm render.
+
+    Iterates, indexes and has a length like the list of manifests it was constructed from, in the
+    same order. The manifests are also indexed on construction so that tests can look up manifests by
+    kind and name, by kind or by their `app.kubernetes.io/name` label without scanning every manifest.
+
+    The collection itself can't be modified. The manifests in it are shared between every test using
+    the same render and so tests must not modify them either.
+
+    `source_templates` are the paths, relative to the chart, of the templates that the manifests
+    were rendered from.
+    """
+
+    def __init__(self, manifests: Iterable[dict[str, Any]], source_templates: Iterable[str] = ()):
+        self._manifests = tuple(manifests)
+        self.source_templates = frozenset(source_templates)
+        self._by_kind_and_name: dict[tuple[str, str], dict[str, Any]] = {}
+        by_kind: dict[str, list[dict[str, Any]]] = {}
+        by_app_name: dict[str, list[dict[str, Any]]] = {}
+        for manifest in self._manifests:
+            metadata = manifest.get("metadata") or {}
+            # Lookups by kind and name return the first match, as a linear search would have done
+            self._by_kind_and_name.setdefault((manifest["kind"], metadata.get("name")), manifest)
+            by_kind.setdefault(manifest["kind"], []).append(manifest)
+            app_name = (metadata.get("labels") or {}).get("app.kubernetes.io/name")
+            if app_name is not None:
+                by_app_name.setdefault(app_name, []).append(manifest)
+
+        self._by_kind = {kind: tuple(manifests) for kind, manifests in by_kind.items()}
+        self._by_app_name = {app_name: tuple(manifests) for app_name, manifests in by_app_name.items()}
+
+    def __getitem__(self, index):
+        return self._manifests[index]
+
+    def __len__(self) -> int:
+        return len(self._manifests)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        return iter(self._manifests)
+
+    def __repr__(self) -> str:
+        return repr(list(self._manifests))
+
+    def get(self, kind: str, name: str) -> dict[str, Any] | None:
+        return self._by_kind_and_name.get((kind, name))
+
+    def of_kind(self, *kinds: str) -> tuple[dict[str, Any], ...]:
+        if len(kinds) == 1:
+            return self._by_kind.get(kinds[0], ())
+        return tuple(manifest for kind in kinds for manifest in self._by_kind.get(kind, ()))
+
+    def with_app_name(self, app_name: str) -> tuple[dict[str, Any], ...]:
+        return self._by_app_name.get(app_name, ())
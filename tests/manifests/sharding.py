@@ -0,0 +1,74 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+# Splits the manifest tests between concurrent runs so that all of the tests of a values file run together.
+#
+# The tests of a values file share their renders, both the unmodified values file and many of the
+# mutations of it, so each values file is then only rendered by one worker.
+#
+# With pytest-xdist the tests are put in an `xdist_group` per values file, so run with
+# `pytest -n auto --dist loadgroup tests/manifests`. To shard across CI jobs or machines, set
+# `PYTEST_ESS_SHARD=<index>/<count>`, e.g. `1/4`, and each run will only run its share of the values files.
+
+import os
+from collections.abc import Mapping
+
+import pytest
+
+from .render_snapshots import values_file_of
+
+shard: tuple[int, int] | None = None
+
+
+def shard_group(item: pytest.Item) -> str:
+    """The group of tests that item should run with. Tests without a values file are grouped by module."""
+    return values_file_of(item) or item.nodeid.split("::")[0]
+
+
+def assign_shards(group_sizes: Mapping[str, int], shard_count: int) -> dict[str, int]:
+    """Assigns each group to a shard, numbered from 1, so that the shards have a similar number of tests.
+
+    Largest groups first, each to the shard with the fewest tests so far. This only depends on what was
+    collected, so every shard of a run assigns the groups in the same way.
+    """
+    shard_sizes = [0] * shard_count
+    assignments = {}
+    for group, size in sorted(group_sizes.items(), key=lambda group_size: (-group_size[1], group_size[0])):
+        smallest_shard = min(range(shard_count), key=lambda index: (shard_sizes[index], index))
+        shard_sizes[smallest_shard] += size
+        assignments[group] = smallest_shard + 1
+    return assignments
+
+
+def pytest_configure(config: pytest.Config):
+    global shard
+    if "PYTEST_ESS_SHARD" not in os.environ:
+        return
+
+    index, _, count = os.environ["PYTEST_ESS_SHARD"].partition("/")
+    if not (index.isdigit() and count.isdigit() and 1 <= int(index) <= int(count)):
+        raise pytest.UsageError(
+            f"PYTEST_ESS_SHARD must be <index>/<count> with 1 <= index <= count, not {os.environ['PYTEST_ESS_SHARD']}"
+        )
+    shard = (int(index), int(count))
+
+
+def pytest_collection_modifyitems(session: pytest.Session, config: pytest.Config, items: list[pytest.Item]):
+    if config.pluginmanager.hasplugin("xdist"):
+        for item in items:
+            item.add_marker(pytest.mark.xdist_group(shard_group(item)))
+
+    if shard is None:
+        return
+
+    group_sizes: dict[str, int] = {}
+    for item in items:
+        group_sizes[shard_group(item)] = group_sizes.get(shard_group(item), 0) + 1
+    assignments = assign_shards(group_sizes, shard[1])
+
+    selected = [item for item in items if assignments[shard_group(item)] == shard[0]]
+    deselected = [item for item in items if assignments[shard_group(item)] != shard[0]]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+    items[:] = selected
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+# Reports which `if` / `else` / `with` / `range` branches of the chart's templates each CI values
+# file renders, the values files whose coverage is a strict subset of another's and the branches
+# that no values file covers.
+#
+# From the project root: `python -m tests.manifests.template_coverage [values files...]`
+
+import base64
+import binascii
+import json
+import re
+import shutil
+import subprocess
+import tempfile
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+from . import values_files_to_deployables_details
+from .chart_templates import _define_pattern
+from .utils import read_values_file
+
+_chart_path = Path("charts/matrix-stack")
+
+# Every action, with comments matched separately so that their contents aren't taken as actions
+_action_pattern = re.compile(r"\{\{-?\s*/\*.*?\*/\s*-?\}\}|\{\{(-?)(.*?)(-?)\}\}", re.DOTALL)
+_branch_pattern = re.compile(r"^(if|else\s+if|else\s+with|else|with|range)\b")
+_token_pattern = re.compile(r'"(?:[^"\\]|\\.)*"|`[^`]*`|:=|[()|=]|[^\s()|=]+')
+_keywords = frozenset({"if", "else", "with", "range", "define", "block", "end"})
+_marker_pattern = re.compile(r"@@ess-coverage-(\d+)@@")
+# helm reports manifests that aren't valid YAML, as the markers can make them, only once every template has rendered
+_yaml_parse_error_pattern = re.compile(r"^Error: YAML parse error on ", re.MULTILINE)
+_base64_pattern = re.compile(r"[A-Za-z0-9+/]{16,}={0,2}")
+
+# The functions that pass the output of a named template or templated file on to the chart's output
+# without inspecting it, so that the coverage markers in it can't change what renders
+_output_functions = frozenset(
+    {
+        "b64enc",
+        "dict",
+        "include",
+        "indent",
+        "join",
+        "list",
+        "lower",
+        "nindent",
+        "print",
+        "printf",
+        "quote",
+        "replace",
+        "sha1sum",
+        "sha256sum",
+        "squote",
+        "template",
+        "toJson",
+        "toPrettyJson",
+        "toYaml",
+        "tpl",
+        "trim",
+        "trimPrefix",
+        "trimSuffix",
+        "trunc",
+        "upper",
+    }
+)
+
+
+@dataclass(frozen=True)
+class Branch:
+    # Relative to the chart
+    path: str
+    line: int
+    action: str
+
+    def __str__(self):
+        return f"{self.path}:{self.line} {{{{ {self.action} }}}}"
+
+
+@dataclass(frozen=True)
+class _Unit:
+    """A separately rendered part of the chart: a template file, a named template or a templated file."""
+
+    name: str
+    path: str
+    start: int
+    end: int
+
+
+def _units(chart_root: Path) -> list[_Unit]:
+    units = []
+    for path in sorted((chart_root / "templates").rglob("*")) + sorted((chart_root / "configs").rglob("*.tpl")):
+        if path.suffix not in (".yaml", ".tpl") or not path.is_file():
+            continue
+        relative_path = path.relative_to(chart_root).as_posix()
+        source = path.read_text("utf-8")
+        defines = list(_define_pattern.finditer(source))
+        units.append(_Unit(f"file:{relative_path}", relative_path, 0, defines[0].start() if defines else len(source)))
+        for index, define in enumerate(defines):
+            end = defines[index + 1].start() if index + 1 < len(defines) else len(source)
+            units.append(_Unit(f"define:{define.group(1)}", relative_path, define.start(), end))
+    return units
+
+
+def _tokens(action: str) -> list[str]:
+    return _token_pattern.findall(action)
+
+
+def _matching_paren(tokens: list[str], index: int, step: int) -> int:
+    depth = 0
+    while True:
+        depth += {"(": step, ")": -step}[tokens[index]] if tokens[index] in "()" else 0
+        if depth == 0:
+            return index
+        index += step
+
+
+def _flows_to_output(tokens: list[str], start: int, end: int) -> bool:
+    """Whether the value of `tokens[start:end]` ends up in the output of the action without being inspected."""
+    # Find the function of the command the expression is in
+    head = start
+    while head > 0 and tokens[head - 1] not in ("(", "|", ":=", "=") and tokens[head - 1] not in _keywords:
+        head = _matching_paren(tokens, head - 1, -1) if tokens[head - 1] == ")" else head - 1
+    if head < start:
+        # An argument to a function, which needs to pass it through to its own value
+        if tokens[head] not in _output_functions:
+            return False
+        start = head
+
+    # Follow the pipeline the command is the start of
+    position = end
+    while True:
+        while position < len(tokens) and tokens[position] not in ("|", ")"):
+            position = _matching_paren(tokens, position, 1) + 1 if tokens[position] == "(" else position + 1
+        if position < len(tokens) and tokens[position] == "|":
+            if position + 1 >= len(tokens) or tokens[position + 1] not in _output_functions:
+                return False
+            position += 2
+            continue
+        break
+
+    if position < len(tokens):
+        # The end of a parenthesised group, whose value flows on in turn
+        opening = _matching_paren(tokens, position, -1)
+        return _flows_to_output(tokens, opening, position + 1)
+    # The top of the action, which must output the value rather than assign or test it
+    return not (set(tokens) & {":=", "="}) and tokens[0] not in _keywords
+
+
+def _references(action: str, define_names: Iterable[str]) -> list[tuple[str, bool]]:
+    """The named templates and files rendered by the action, and whether their output goes straight to the output."""
+    tokens = _tokens(action)
+    references = []
+    for index, token in enumerate(tokens[:-1]):
+        if token in ("include", "template") and tokens[index + 1].startswith('"'):
+            names = [tokens[index + 1].strip('"')]
+        elif token in ("include", "template") and tokens[index + 1 : index + 3] == ["(", "printf"]:
+            name_format = tokens[index + 3].strip('"')
+            name_pattern = re.compile(".+".join(re.escape(part) for part in name_format.split("%s")))
+            names = [name for name in define_names if name_pattern.fullmatch(name)]
+        elif token.endswith(".Files.Get") and tokens[index + 1].startswith('"'):
+            path = tokens[index + 1].strip('"')
+            references.append((f"file:{path}", _flows_to_output(tokens, index, index + 2)))
+            continue
+        else:
+            continue
+        safe = _flows_to_output(tokens, index, index + 1)
+        references += [(f"define:{name}", safe) for name in names]
+    return references
+
+
+def instrumentable_units(chart_root: Path) -> tuple[list[_Unit], set[str]]:
+    """The units of the chart and the names of those whose branches can be instrumented.
+
+    A unit can only be instrumented if everywhere it is rendered its output goes straight into the
+    chart's output, rather than being e.g. parsed with `fromJson` or compared in a condition. Otherwise
+    the markers could change what renders.
+    """
+    units = _units(chart_root)
+    define_names = [unit.name.removeprefix("define:") for unit in units if unit.name.startswith("define:")]
+    sources = {unit.path: (chart_root / unit.path).read_text("utf-8") for unit in units}
+
+    referenced_by: dict[str, set[str]] = {}
+    unsafe = set()
+    for unit in units:
+        for match in _action_pattern.finditer(sources[unit.path], unit.start, unit.end):
+            action = (match.group(2) or "").strip()
+            for reference, flows_to_output in _references(action, define_names):
+                referenced_by.setdefault(unit.name, set()).add(reference)
+                if not flows_to_output:
+                    unsafe.add(reference)
+
+    # Anything rendered by an unsafe unit ends up in its output too
+    pending = list(unsafe)
+    while pending:
+        for reference in referenced_by.get(pending.pop(), ()):
+            if reference not in unsafe:
+                unsafe.add(reference)
+                pending.append(reference)
+    return units, {unit.name for unit in units if unit.name not in unsafe}
+
+
+def instrument_chart(chart_root: Path, destination: Path) -> tuple[list[Branch], list[Branch]]:
+    """Copies the chart to the destination with a marker rendered at the start of every branch.
+
+    Returns the instrumented branches, indexed by their marker number, and the branches that
+    couldn't be instrumented.
+    """
+    shutil.copytree(chart_root, destination, dirs_exist_ok=True)
+    units, instrumentable = instrumentable_units(chart_root)
+
+    branches: list[Branch] = []
+    uninstrumented: list[Branch] = []
+    for path in sorted({unit.path for unit in units}):
+        source = (chart_root / path).read_text("utf-8")
+        instrumented_source = []
+        position = 0
+        for unit in sorted((unit for unit in units if unit.path == path), key=lambda unit: unit.start):
+            for match in _action_pattern.finditer(source, unit.start, unit.end):
+                action = (match.group(2) or "").strip()
+                if not _branch_pattern.match(action):
+                    continue
+
+                branch = Branch(path, source.count("\n", 0, match.start()) + 1, " ".join(action.split()))
+                if unit.name not in instrumentable:
+                    uninstrumented.append(branch)
+                    continue
+
+                # Rendered as an action that trims like the branch, so the whitespace around it is unchanged
+                instrumented_source += [
+                    source[position : match.end()],
+                    f'{{{{ "@@ess-coverage-{len(branches)}@@" {match.group(3)}}}}}',
+                ]
+                position = match.end()
+                branches.append(branch)
+        instrumented_source.append(source[position:])
+        (destination / path).write_text("".join(instrumented_source), "utf-8")
+    return branches, uninstrumented
+
+
+def covered_branches(rendered: str) -> frozenset[int]:
+    """The markers in the output of `helm template`, including those in base64 encoded Secret data."""
+    covered = {int(marker) for marker in _marker_pattern.findall(rendered)}
+    for encoded in _base64_pattern.findall(rendered):
+        try:
+            decoded = base64.b64decode(encoded, validate=True).decode("utf-8", errors="ignore")
+        except binascii.Error:
+            continue
+        covered.update(int(marker) for marker in _marker_pattern.findall(decoded))
+    return frozenset(covered)
+
+
+@dataclass(frozen=True)
+class CoverageReport:
+    # For each values file covering a strict subset of another's branches, the values files covering more
+    redundant_values_files: dict[str, tuple[str, ...]]
+    # Groups of values files that cover exactly the same branches
+    equivalent_values_files: tuple[tuple[str, ...], ...]
+    uncovered_branches: tuple[int, ...]
+
+
+def analyse_coverage(coverage: dict[str, frozenset[int]], branch_count: int) -> CoverageReport:
+    redundant = {}
+    for values_file, covered in sorted(coverage.items()):
+        supersets = tuple(other for other, other_covered in sorted(coverage.items()) if covered < other_covered)
+        if supersets:
+            redundant[values_file] = supersets
+
+    by_coverage: dict[frozenset[int], list[str]] = {}
+    for values_file, covered in sorted(coverage.items()):
+        by_coverage.setdefault(covered, []).append(values_file)
+    equivalent = tuple(tuple(values_files) for values_files in by_coverage.values() if len(values_files) > 1)
+
+    all_covered = frozenset().union(*coverage.values())
+    return CoverageReport(
+        redundant, equivalent, tuple(branch for branch in range(branch_count) if branch not in all_covered)
+    )
+
+
+class RenderError(Exception):
+    pass
+
+
+def render(chart: Path, values_file: str) -> str:
+    result = subprocess.run(
+        [
+            "helm",
+            "template",
+            "ess-coverage",
+            str(chart),
+            "--values",
+            "-",
+            "-a",
+            "monitoring.coreos.com/v1/ServiceMonitor",
+            # The markers can make the rendered manifests invalid YAML, which helm only outputs with --debug
+            "--debug",
+        ],
+        input=json.dumps(read_values_file(values_file)),
+        capture_output=True,
+        text=True,
+    )
+    # Any other failure stops helm partway, so the markers it output are only some of those covered
+    if result.returncode != 0 and not _yaml_parse_error_pattern.search(result.stderr):
+        raise RenderError(f"Failed to render {values_file}: {result.stderr.strip()}")
+    return result.stdout
+
+
+def template_coverage(
+    values_files: Annotated[list[str] | None, typer.Argument(help="The CI values files, defaults to all")] = None,
+    show_uncovered: Annotated[bool, typer.Option(help="List every branch that no values file covers")] = True,
+):
+    values_files = values_files or sorted(values_files_to_deployables_details)
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        scratch_chart = Path(scratch_dir) / _chart_path.name
+        branches, uninstrumented = instrument_chart(_chart_path, scratch_chart)
+        failures: dict[str, RenderError] = {}
+
+        def render_coverage(values_file: str) -> frozenset[int] | None:
+            try:
+                return covered_branches(render(scratch_chart, values_file))
+            except RenderError as e:
+                failures[values_file] = e
+                return None
+
+        with ThreadPoolExecutor() as executor:
+            rendered = executor.map(render_coverage, values_files)
+            coverage = {
+                values_file: covered
+                for values_file, covered in zip(values_files, rendered)
+                if values_file not in failures
+            }
+
+    report = analyse_coverage(coverage, len(branches))
+    print(f"{len(branches)} branches instrumented, {len(uninstrumented)} in named templates whose output is consumed")
+    for values_file, covered in sorted(coverage.items()):
+        print(f"{values_file:<70} {len(covered):>5} branches ({len(covered) / max(len(branches), 1):.0%})")
+
+    print("\nValues files covering a strict subset of the branches of another:")
+    for values_file, supersets in report.redundant_values_files.items():
+        print(f"{values_file} ⊂ {', '.join(supersets)}")
+    print("\nValues files covering the same branches:")
+    for values_files_group in report.equivalent_values_files:
+        print(" = ".join(values_files_group))
+
+    print(f"\n{len(report.uncovered_branches)} branches not covered by any values file")
+    if show_uncovered:
+        for branch in report.uncovered_branches:
+            print(branches[branch])
+
+    if failures:
+        print(f"\n{len(failures)} values files failed to render and aren't included above:")
+        for _, error in sorted(failures.items()):
+            print(error)
+        raise typer.Exit(1)
+
+
+def main():
+    typer.run(template_coverage)
+
+
+if __name__ == "__main__":
+    main()
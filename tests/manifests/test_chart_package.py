@@ -0,0 +1,26 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import tarfile
+
+from .chart_package import chart_source, chart_sources, with_chart_version
+
+
+def test_with_chart_version_only_rewrites_chart_yaml(tmp_path):
+    chart_dir = tmp_path / "matrix-stack"
+    (chart_dir / "templates").mkdir(parents=True)
+    (chart_dir / "Chart.yaml").write_text('apiVersion: v2\nname: matrix-stack\nversion: "1.2.3"\n')
+    (chart_dir / "templates" / "a.yaml").write_text("kind: ConfigMap\n")
+    package = tmp_path / "matrix-stack-1.2.3.tgz"
+    with tarfile.open(package, "w:gz") as tar:
+        tar.add(chart_dir, arcname="matrix-stack")
+    chart_sources[package.resolve()] = chart_dir.resolve()
+
+    versioned_package = with_chart_version(package, "1.3.3")
+    assert chart_source(versioned_package) == chart_dir.resolve()
+    with tarfile.open(package) as original, tarfile.open(versioned_package) as versioned:
+        assert original.getnames() == versioned.getnames()
+        chart_yaml = versioned.extractfile("matrix-stack/Chart.yaml").read().decode("utf-8")
+        assert chart_yaml == 'apiVersion: v2\nname: matrix-stack\nversion: "1.3.3"\n'
+        assert versioned.extractfile("matrix-stack/templates/a.yaml").read() == b"kind: ConfigMap\n"
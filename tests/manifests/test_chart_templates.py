@@ -0,0 +1,40 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from pathlib import Path
+
+from .chart_templates import template_dependencies, template_kinds, templates_emitting
+
+
+def test_template_kinds_maps_every_manifest_template():
+    chart_path = Path(__file__).parent.parent.parent / Path("charts/matrix-stack")
+    kinds = template_kinds(chart_path)
+
+    assert kinds["templates/synapse/synapse_ingress.yaml"] == {"Ingress"}
+    # Only emits a ServiceAccount via the ess-library helper
+    assert kinds["templates/synapse/synapse_serviceaccount.yaml"] == {"ServiceAccount"}
+    # The nested kinds of the roleRef and subjects aren't manifests
+    assert kinds["templates/init-secrets/rolebinding.yaml"] == {"RoleBinding"}
+    assert set(templates_emitting(chart_path, ["Ingress"])) == {
+        f"templates/{component}/ingress.yaml"
+        for component in ("element-web", "matrix-authentication-service", "matrix-rtc", "well-known")
+    } | {"templates/synapse/synapse_ingress.yaml"}
+
+    for template_path in (chart_path / "templates").rglob("*.yaml"):
+        assert template_path.relative_to(chart_path).as_posix() in kinds, f"{template_path} emits no known kinds"
+
+
+def test_template_dependencies_follow_includes_and_config_files():
+    chart_path = Path(__file__).parent.parent.parent / Path("charts/matrix-stack")
+    dependencies = template_dependencies(chart_path)
+
+    assert {
+        "templates/haproxy/configmap.yaml",
+        "templates/haproxy/_helpers.tpl",
+        "configs/haproxy/haproxy.cfg.tpl",
+        # Included from haproxy.cfg.tpl
+        "configs/synapse/partial-haproxy.cfg.tpl",
+    } <= dependencies["templates/haproxy/configmap.yaml"]
+    assert "templates/ess-library/_serviceAccounts.tpl" in dependencies["templates/synapse/synapse_serviceaccount.yaml"]
+    assert "configs/haproxy/haproxy.cfg.tpl" not in dependencies["templates/synapse/synapse_serviceaccount.yaml"]
@@ -2,12 +2,11 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-only
 
-import copy
-import re
-
 import pytest
 
 from . import secret_values_files_to_test, values_files_to_test
+from .mounted_paths import MountedPathsIndex, find_absolute_paths
+from .prefix_trie import PrefixTrie
 from .utils import get_or_empty
 
 
@@ -17,10 +16,10 @@ def get_configmap(templates, configmap_name):
     :param configmap_name: The name of the ConfigMap to retrieve.
     :return: A string containing the content of the ConfigMap, or an empty string if not found.
     """
-    for t in templates:
-        if t["kind"] == "ConfigMap" and t["metadata"]["name"] == configmap_name:
-            return t
-    raise ValueError(f"ConfigMap {configmap_name} not found")
+    configmap = templates.get("ConfigMap", configmap_name)
+    if configmap is None:
+        raise ValueError(f"ConfigMap {configmap_name} not found")
+    return configmap
 
 
 def get_secret(templates, other_secrets, secret_name):
@@ -29,9 +28,9 @@ def get_secret(templates, other_secrets, secret_name):
     :param secret_name: The name of the Secret to retrieve.
     :return: A string containing the content of the Secret, or an empty string if not found.
     """
-    for t in templates:
-        if t["kind"] == "Secret" and t["metadata"]["name"] == secret_name:
-            return t
+    secret = templates.get("Secret", secret_name)
+    if secret is not None:
+        return secret
     for s in other_secrets:
         if s["metadata"]["name"] == secret_name:
             return s
@@ -55,53 +54,6 @@ def get_volume_from_mount(template, volume_mount):
     )
 
 
-def find_paths_in_contents(container, mounted_config_maps, deployable_details):
-    paths_found = []
-    content_to_match = [e.get("value", "") for e in container.get("env", [])]
-    content_to_match += [c for c in container.get("command", [""])[1:] + container.get("args", [])]
-    for cm in mounted_config_maps:
-        for key, content in cm["data"].items():
-            if key not in deployable_details.skip_path_consistency_for_files:
-                content_to_match += content.split("\n")
-
-    for content in content_to_match:
-        assert type(content) is str, f"Content must be a string: {content}"
-        for match_in in content.split("\n"):
-            for exclude in ["://", "/bin/sh", "helm.sh/"]:
-                if exclude in match_in:
-                    break
-            else:
-                # The negative lookahead prevents matching subnets like "192.168.0.0/16", "fe80::/10"
-                # And also things that do not start with / like "text/xml"
-                # The pattern [^\s\n\")`:%;,/]+[^\s\n\")`:%;,]+ is a regex that will find paths like /path/to/file
-                # It expects to find absolute paths only
-                # It is possible to add noqa in the content to ignore this path
-                for match in re.findall(r"((?<![0-9a-zA-Z:])/[^\s\n\")`:'%;,/]+[^\s\n\")`:'%;,]+(?!.*noqa))", match_in):
-                    paths_found.append(match)
-
-    return paths_found
-
-
-def find_mount_paths_and_assert_key_is_consistent(container_name, mounted_keys, mount_path, matches_in):
-    found_mount = False
-    for match_in in matches_in:
-        for match in re.findall(rf"(?:^|\s|\"){mount_path}/([^\s\n\")`;,]+(?!.*noqa))", match_in):
-            assert f"{mount_path}/{match}" in mounted_keys, (
-                f"{mount_path}/{match} used in {container_name} but it is not found "
-                f"from any mounted secret or configmap"
-            )
-            found_mount = True
-    return found_mount
-
-
-def find_keys_mounts_in_content(mounted_key, matches_in):
-    for match_in in matches_in:
-        for match in re.findall(rf"(?:^|\s|\"){re.escape(mounted_key)}(?:[^\s\n\")`;,]*)", match_in):
-            if match:
-                return True
-    return False
-
-
 def get_key_from_render_config(template):
     for container in template["spec"]["template"]["spec"]["initContainers"]:
         if container["name"] == "render-config":
@@ -134,7 +86,6 @@ def get_mounts_part(secret_or_cm, volume_mount):
 def filter_mounted_path_only(template, container, mounted_config_maps):
     filtered_configmaps = []
     for configmap in mounted_config_maps:
-        filtered_configmap = copy.deepcopy(configmap)
         related_volume_mounts = [
             v
             for v in container["volumeMounts"]
@@ -142,14 +93,14 @@ def filter_mounted_path_only(template, container, mounted_config_maps):
         ]
         for volume_mount in related_volume_mounts:
             if "subPath" not in volume_mount:
+                filtered_configmaps.append(configmap)
                 break  # The whole configmap content is mounted, ignore
         else:
             sub_paths = [v["subPath"] for v in related_volume_mounts]
-            # Pop all configmap data keys which are not in a subpath
-            for key in configmap["data"]:
-                if key not in sub_paths:
-                    del filtered_configmap["data"][key]
-        filtered_configmaps.append(filtered_configmap)
+            # Only keep the configmap data keys which are in a subpath
+            filtered_configmaps.append(
+                {**configmap, "data": {key: content for key, content in configmap["data"].items() if key in sub_paths}}
+            )
     return filtered_configmaps
 
 
@@ -239,8 +190,7 @@ async def test_secrets_consistency(templates, other_secrets, template_to_deploya
     it will read its content and find paths matching potential mounted secrets or configmap data.
     If there's a match, it makes sure that it points to an existing data mounted in the container.
     """
-    workloads = [t for t in templates if t["kind"] in ("Deployment", "StatefulSet", "Job")]
-    for template in workloads:
+    for template in templates.of_kind("Deployment", "StatefulSet", "Job"):
         deployable_details = template_to_deployable_details(template)
         # Gather all containers and initContainers from the template spec
         containers = template["spec"]["template"]["spec"].get("containers", []) + template["spec"]["template"][
@@ -302,6 +252,20 @@ async def test_secrets_consistency(templates, other_secrets, template_to_deploya
                 mounted_keys += rendered_mounted_keys
                 mounted_keys_to_parents.update(rendered_mounted_keys_to_parents)
 
+            # Index every reference to the mounted keys and to paths under their mount parents in the
+            # env, command, args and mounted configmaps in a single pass, rather than once per mounted key
+            container_contents = [
+                (f"container {container['name']}", content)
+                for content in [e.get("value", "") for e in container.get("env", [])]
+                + container.get("command", [])
+                + container.get("args", [])
+            ] + [
+                (f"configmap {cm['metadata']['name']}/{data} mounted in {container['name']}", content)
+                for cm in mounted_config_maps
+                for data, content in cm["data"].items()
+            ]
+            mounted_paths = MountedPathsIndex(mounted_keys, set(mounted_keys_to_parents.values()), container_contents)
+
             # We look for all mountKeys
             # refers <some key> to an existing configuration somewhere
             for mounted_key in mounted_keys:
@@ -310,26 +274,7 @@ async def test_secrets_consistency(templates, other_secrets, template_to_deploya
                 # For example, nginx container uses /etc/nginx natively.
                 if mounted_key in deployable_details.paths_consistency_noqa:
                     continue
-                mount_path_found = False
-                # Parse container commands to find paths which would match a mounted key
-                if find_keys_mounts_in_content(
-                    mounted_key,
-                    [e.get("value", "") for e in container.get("env", [])]
-                    + container.get("command", [])
-                    + container.get("args", []),
-                ):
-                    mount_path_found = True
-                else:
-                    # Parse container configmaps to find paths which would match a mounted secret
-                    # Make sure that paths which match are actually present in mounted secrets
-                    for cm in mounted_config_maps:
-                        for _, content in cm["data"].items():
-                            if find_keys_mounts_in_content(
-                                mounted_key,
-                                [content],
-                            ):
-                                mount_path_found = True
-                if not mount_path_found and not uses_rendered_config:
+                if mounted_key not in mounted_paths.used_keys and not uses_rendered_config:
                     raise AssertionError(
                         f"{mounted_key} mounted in container {container['name']} "
                         f"but no config {','.join([cm['metadata']['name'] for cm in mounted_config_maps])} "
@@ -337,34 +282,14 @@ async def test_secrets_consistency(templates, other_secrets, template_to_deploya
                     )
 
                 # We look for all secrets mountPath parents directories in configs and commands
-                # And using a regex, make sure that patterns `<parent mount path>/<some key>`
+                # and make sure that paths `<parent mount path>/<some key>`
                 # refers <some key> to an existing mounted secret key
-                mount_path_found = False
-
-                # Parse container commands to find paths which would match a mounted secret
-                # Make sure that paths which match are actually present in mounted secrets
-                if find_mount_paths_and_assert_key_is_consistent(
-                    f"container {container['name']}",
-                    mounted_keys,
-                    mounted_keys_to_parents[mounted_key],
-                    [e.get("value", "") for e in container.get("env", [])]
-                    + container.get("command", [])
-                    + container.get("args", []),
-                ):
-                    mount_path_found = True
-
-                # Parse container configmaps to find paths which would match a mounted secret
-                # Make sure that paths which match are actually present in mounted secrets
-                for cm in mounted_config_maps:
-                    for data, content in cm["data"].items():
-                        if find_mount_paths_and_assert_key_is_consistent(
-                            f"configmap {cm['metadata']['name']}/{data} mounted in {container['name']}",
-                            mounted_keys,
-                            mounted_keys_to_parents[mounted_key],
-                            [content],
-                        ):
-                            mount_path_found = True
-                if not mount_path_found and not uses_rendered_config:
+                references = mounted_paths.references[mounted_keys_to_parents[mounted_key]]
+                for path, used_in in references:
+                    assert path in mounted_keys, (
+                        f"{path} used in {used_in} but it is not found from any mounted secret or configmap"
+                    )
+                if not references and not uses_rendered_config:
                     raise AssertionError(
                         f"{mounted_keys_to_parents[mounted_key]} used in container {container['name']} "
                         f"but no config {','.join([cm['metadata']['name'] for cm in mounted_config_maps])} "
@@ -375,12 +300,20 @@ async def test_secrets_consistency(templates, other_secrets, template_to_deploya
             if uses_rendered_config:
                 filtered_mounted_config_maps.append(get_virtual_config_map_from_render_config(template, templates))
             potential_paths = mounted_keys + get_pvcs_and_empty_dirs_mount_paths(template)
-            for path in find_paths_in_contents(container, filtered_mounted_config_maps, deployable_details):
+            potential_paths_trie = PrefixTrie(potential_paths)
+            contents_to_match = (
+                [e.get("value", "") for e in container.get("env", [])]
+                + container.get("command", [""])[1:]
+                + container.get("args", [])
+                + [
+                    content
+                    for cm in filtered_mounted_config_maps
+                    for key, content in cm["data"].items()
+                    if key not in deployable_details.skip_path_consistency_for_files
+                ]
+            )
+            for path in find_absolute_paths(contents_to_match):
                 if path not in deployable_details.paths_consistency_noqa:
-                    mount_path_found = False
-                    for potential in potential_paths:
-                        if path.startswith(potential):
-                            mount_path_found = True
-                    assert mount_path_found, (
+                    assert potential_paths_trie.has_prefix_of(path), (
                         f"{path} used in container {container['name']} but not mounted in {potential_paths}"
                     )
@@ -0,0 +1,73 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from .impact_analysis import Impact, analyse, select_tests, selection_arguments
+
+
+def test_impact_analysis_selects_tests_rendering_changed_templates():
+    impact = analyse(["charts/matrix-stack/configs/haproxy/haproxy.cfg.tpl"])
+    assert not impact.full_run
+    assert "templates/haproxy/configmap.yaml" in impact.templates
+    assert "templates/synapse/synapse_ingress.yaml" not in impact.templates
+
+    fragment_values_files = analyse(["charts/matrix-stack/ci/fragments/element-web-minimal.yaml"]).values_files
+    assert "element-web-minimal-values.yaml" in fragment_values_files
+    assert "synapse-minimal-values.yaml" not in fragment_values_files
+    assert analyse(["tests/manifests/utils.py"]).full_run
+
+    recorded = {
+        "tests/manifests/test_a.py::test_haproxy[synapse-minimal-values.yaml]": {
+            "values_file": "synapse-minimal-values.yaml",
+            "templates": ["templates/haproxy/configmap.yaml"],
+        },
+        "tests/manifests/test_a.py::test_ingress[synapse-minimal-values.yaml]": {
+            "values_file": "synapse-minimal-values.yaml",
+            "templates": ["templates/synapse/synapse_ingress.yaml"],
+        },
+    }
+    collected = [
+        *recorded,
+        # Not recorded, but another test rendered the changed template for its values file
+        "tests/manifests/test_b.py::test_new[synapse-minimal-values.yaml]",
+        # Not recorded and nothing is recorded for its values file
+        "tests/manifests/test_b.py::test_new[element-web-minimal-values.yaml]",
+        "tests/manifests/test_c.py::test_unparameterised",
+    ]
+    assert select_tests(Impact(templates={"templates/haproxy/configmap.yaml"}), collected, recorded) == [
+        "tests/manifests/test_a.py::test_haproxy[synapse-minimal-values.yaml]",
+        "tests/manifests/test_b.py::test_new[synapse-minimal-values.yaml]",
+        "tests/manifests/test_b.py::test_new[element-web-minimal-values.yaml]",
+    ]
+    assert select_tests(Impact(test_modules={"tests/manifests/test_c.py"}), collected, recorded) == [
+        "tests/manifests/test_c.py::test_unparameterised"
+    ]
+
+    # Templates that didn't render for a values file may now, if it has the component the template belongs to
+    synapse_minimal_tests = [test for test in collected if test.endswith("[synapse-minimal-values.yaml]")]
+    assert select_tests(Impact(templates={"templates/synapse/synapse_pdb.yaml"}), collected, recorded) == [
+        *synapse_minimal_tests,
+        "tests/manifests/test_b.py::test_new[element-web-minimal-values.yaml]",
+    ]
+    assert select_tests(Impact(templates={"templates/NOTES.txt"}), collected, recorded) == [
+        *synapse_minimal_tests,
+        "tests/manifests/test_b.py::test_new[element-web-minimal-values.yaml]",
+    ]
+    assert select_tests(
+        Impact(templates={"templates/matrix-authentication-service/deployment.yaml"}), collected, recorded
+    ) == ["tests/manifests/test_b.py::test_new[element-web-minimal-values.yaml]"]
+
+
+def test_impact_analysis_runs_no_tests_when_none_are_affected():
+    recorded = {
+        "tests/manifests/test_a.py::test_ingress[synapse-minimal-values.yaml]": {
+            "values_file": "synapse-minimal-values.yaml",
+            "templates": ["templates/synapse/synapse_ingress.yaml"],
+        },
+    }
+    collected = [*recorded, "tests/manifests/test_c.py::test_unparameterised"]
+
+    assert selection_arguments(Impact(), collected, recorded) == ["--collect-only", "-qq", "tests/manifests"]
+    assert selection_arguments(Impact(test_modules={"tests/manifests/test_c.py"}), collected, recorded) == [
+        "tests/manifests/test_c.py::test_unparameterised"
+    ]
@@ -28,24 +28,10 @@ async def test_has_ingress(templates, template_to_deployable_details):
 
 @pytest.mark.parametrize("values_file", values_files_with_ingresses)
 @pytest.mark.asyncio_cooperative
-async def test_ingress_is_expected_host(deployables_details, values, templates):
-    def get_hosts_from_fragment(values_fragment, deployable_details):
-        if deployable_details.name == "well-known":
-            if not values_fragment.setdefault("ingress", {}).get("host"):
-                yield values["serverName"]
-            else:
-                yield values_fragment.setdefault("ingress", {})["host"]
-        else:
-            yield values_fragment["ingress"]["host"]
-
-    def get_hosts():
-        for deployable_details in deployables_details:
-            if deployable_details.has_ingress:
-                yield from get_hosts_from_fragment(
-                    deployable_details.get_helm_values_fragment(values), deployable_details
-                )
-
-    expected_hosts = get_hosts()
+async def test_ingress_is_expected_host(values_index, templates):
+    for deployable_details, host in values_index.ingress_hosts.items():
+        assert host is not None, f"{deployable_details.name} has an ingress but no ingress.host in its values"
+    expected_hosts = values_index.ingress_hosts.values()
 
     found_hosts = []
     for template in templates:
@@ -95,7 +81,7 @@ async def test_renders_component_ingress_annotations(deployables_details, values
 
     iterate_deployables_ingress_parts(deployables_details, values, set_annotations)
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "annotations" in template["metadata"]
             assert "component" in template["metadata"]["annotations"]
@@ -109,7 +95,7 @@ async def test_renders_global_ingress_annotations(values, make_templates):
         "global": "set",
     }
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "annotations" in template["metadata"]
             assert "global" in template["metadata"]["annotations"]
@@ -132,7 +118,7 @@ async def test_merges_global_and_component_ingress_annotations(deployables_detai
         "merged": "from_global",
     }
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "annotations" in template["metadata"]
             assert "component" in template["metadata"]["annotations"]
@@ -151,7 +137,7 @@ async def test_merges_global_and_component_ingress_annotations(deployables_detai
 @pytest.mark.asyncio_cooperative
 async def test_no_ingress_tlsSecret_global(make_templates, values):
     values.setdefault("ingress", {})["tlsEnabled"] = False
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "tls" not in template["spec"]
 
@@ -163,7 +149,7 @@ async def test_no_ingress_tlsSecret_beats_global(make_templates, values, deploya
         values_fragment.setdefault("ingress", {})["tlsEnabled"] = False
 
     iterate_deployables_ingress_parts(deployables_details, values, set_tls_disabled)
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "tls" not in template["spec"]
 
@@ -176,7 +162,7 @@ async def test_uses_component_ingress_tlsSecret(deployables_details, values, mak
 
     iterate_deployables_ingress_parts(deployables_details, values, set_tls_secret)
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "tls" in template["spec"]
             assert len(template["spec"]["tls"]) == 1
@@ -190,7 +176,7 @@ async def test_uses_component_ingress_tlsSecret(deployables_details, values, mak
 async def test_uses_global_ingress_tlsSecret(values, make_templates):
     values.setdefault("ingress", {})["tlsSecret"] = "global"
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "tls" in template["spec"]
             assert len(template["spec"]["tls"]) == 1
@@ -208,7 +194,7 @@ async def test_component_ingress_tlsSecret_beats_global(deployables_details, val
     iterate_deployables_ingress_parts(deployables_details, values, set_tls_secret)
     values.setdefault("ingress", {})["tlsSecret"] = "global"
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "tls" in template["spec"]
             assert len(template["spec"]["tls"]) == 1
@@ -243,7 +229,7 @@ async def test_uses_component_ingressClassName(deployables_details, values, make
 
     iterate_deployables_ingress_parts(deployables_details, values, set_ingress_className)
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "ingressClassName" in template["spec"]
             assert template["spec"]["ingressClassName"] == "component"
@@ -254,7 +240,7 @@ async def test_uses_component_ingressClassName(deployables_details, values, make
 async def test_uses_global_ingressClassName(values, make_templates):
     values.setdefault("ingress", {})["className"] = "global"
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "ingressClassName" in template["spec"]
             assert template["spec"]["ingressClassName"] == "global"
@@ -269,7 +255,7 @@ async def test_component_ingressClassName_beats_global(deployables_details, valu
     iterate_deployables_ingress_parts(deployables_details, values, set_ingress_className)
     values.setdefault("ingress", {})["className"] = "global"
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "ingressClassName" in template["spec"]
             assert template["spec"]["ingressClassName"] == "component"
@@ -311,7 +297,7 @@ async def test_ingress_services(templates):
 @pytest.mark.asyncio_cooperative
 async def test_ingress_certManager_clusterissuer(make_templates, values):
     values.setdefault("certManager", {})["clusterIssuer"] = "cluster-issuer-name"
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "cert-manager.io/cluster-issuer" in template["metadata"]["annotations"], (
                 f"Ingress {template['name']} does not have cert-manager annotation"
@@ -326,7 +312,7 @@ async def test_ingress_certManager_clusterissuer(make_templates, values):
 @pytest.mark.asyncio_cooperative
 async def test_ingress_certManager_issuer(make_templates, values):
     values.setdefault("certManager", {})["issuer"] = "issuer-name"
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "cert-manager.io/issuer" in template["metadata"]["annotations"], (
                 f"Ingress {template['name']} does not have cert-manager annotation"
@@ -346,7 +332,7 @@ async def test_component_ingress_tlsSecret_beats_certManager(deployables_details
     iterate_deployables_ingress_parts(deployables_details, values, set_tls_secret)
     values.setdefault("certManager", {})["issuer"] = "issuer-name"
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "tls" in template["spec"]
             assert len(template["spec"]["tls"]) == 1
@@ -0,0 +1,24 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from .manifest_parsing import _batches, parse_documents, split_documents
+
+
+def test_manifest_parsing_splits_and_batches_documents_in_order():
+    rendered = (
+        "---\n# Source: matrix-stack/templates/a.yaml\nkind: ConfigMap\ndata:\n  config.yaml: |\n    ---\n    a: b\n"
+        "---\n# Source: matrix-stack/templates/b.yaml\n"
+        "---\n# Source: matrix-stack/templates/c.yaml\nkind: Secret\n"
+    )
+    documents = split_documents(rendered)
+    # The indented separator in the block scalar doesn't start a new document
+    assert len(documents) == 3
+    expected = parse_documents(rendered)
+    assert [manifest["kind"] for manifest in expected] == ["ConfigMap", "Secret"]
+    assert expected[0]["data"]["config.yaml"] == "---\na: b\n"
+
+    for batch_count in range(1, 5):
+        batches = _batches(documents, batch_count)
+        assert len(batches) <= batch_count
+        assert [manifest for batch in batches for manifest in parse_documents(batch)] == expected
@@ -0,0 +1,33 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from .mounted_paths import MountedPathsIndex, find_absolute_paths
+from .prefix_trie import PrefixTrie
+
+
+def test_mounted_paths_index_finds_keys_and_references_in_one_pass():
+    index = MountedPathsIndex(
+        ["/conf/synapse.yaml", "/secrets/key", "/unused/key"],
+        ["/conf", "/secrets", "/unused"],
+        [
+            ("container", '--config="/conf/synapse.yaml"'),
+            ("container", "/secrets/key;/secrets/other"),
+            # Only referenced after whitespace, a quote or at the start
+            ("configmap", "path: a/unused/key\nother: /conf/missing.yaml # noqa\nlog: /conf/log.yaml"),
+        ],
+    )
+    assert index.used_keys == {"/conf/synapse.yaml", "/secrets/key"}
+    assert index.references == {
+        "/conf": [("/conf/synapse.yaml", "container"), ("/conf/log.yaml", "configmap")],
+        "/secrets": [("/secrets/key", "container")],
+        "/unused": [],
+    }
+
+    trie = PrefixTrie(["/conf", "/conf/synapse.yaml", "/data"])
+    assert list(trie.prefixes_of("/conf/synapse.yaml.d")) == ["/conf", "/conf/synapse.yaml"]
+    assert trie.has_prefix_of("/data/media")
+    assert not trie.has_prefix_of("/dat")
+    assert list(find_absolute_paths(["run /conf/a.yaml", "https://host/path", "10.0.0.0/8", "/tmp/x # noqa"])) == [
+        "/conf/a.yaml"
+    ]
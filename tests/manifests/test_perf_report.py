@@ -0,0 +1,40 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from types import SimpleNamespace
+
+from .perf_report import PerfRecorder
+
+
+def test_perf_recorder_attributes_renders_and_finds_regressions():
+    recorder = PerfRecorder()
+    node = SimpleNamespace(
+        nodeid="test_a[x-values.yaml]", callspec=SimpleNamespace(params={"values_file": "x-values.yaml"})
+    )
+
+    # Nothing is attributed outside of a test
+    recorder.record_render(1.0, 0.5, 100, base_render=True)
+    assert recorder.by_values_file == {}
+
+    with recorder.attribute_to(node):
+        recorder.record_render(2.0, 0.5, 100, base_render=True)
+        recorder.record_render(1.0, 0.25, 50, base_render=False)
+        recorder.record_cache_hit(from_disk=True)
+
+    assert recorder.by_values_file["x-values.yaml"].renders == 2
+    assert recorder.by_values_file["x-values.yaml"].manifest_bytes == 150
+    assert recorder.by_test["test_a[x-values.yaml]"].disk_cache_hits == 1
+    assert recorder.base_render_seconds == {"x-values.yaml": 2.0}
+
+    assert recorder.regressions({"x-values.yaml": 1.5}, threshold=1.5) == {}
+    assert recorder.regressions({"x-values.yaml": 1.0}, threshold=1.5) == {"x-values.yaml": (1.0, 2.0)}
+    assert recorder.regressions({"y-values.yaml": 1.0}, threshold=1.5) == {}
+
+    # As the pytest-xdist controller does with what each worker recorded
+    merged = PerfRecorder()
+    merged.merge(recorder.as_dict())
+    merged.merge(recorder.as_dict())
+    assert merged.by_values_file["x-values.yaml"].renders == 4
+    assert merged.by_test["test_a[x-values.yaml]"].helm_seconds == 6.0
+    assert merged.base_render_seconds == {"x-values.yaml": 2.0}
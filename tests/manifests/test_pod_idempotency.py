@@ -3,7 +3,6 @@
 # SPDX-License-Identifier: AGPL-3.0-only
 
 import pytest
-import yaml
 
 from . import values_files_to_test
 from .utils import helm_template, template_id
@@ -11,26 +10,20 @@ from .utils import helm_template, template_id
 
 @pytest.mark.parametrize("values_file", values_files_to_test)
 @pytest.mark.asyncio_cooperative
-async def test_values_file_renders_idempotent_pods(release_name, values, helm_client, temp_chart):
-    async def _patch_version_chart():
-        with open(f"{temp_chart}/Chart.yaml") as f:
-            chart = yaml.safe_load(f)
-        with open(f"{temp_chart}/Chart.yaml", "w") as f:
-            version_parts = chart["version"].split(".")
-            minor_version = str(int(version_parts[1]) + 1)
-            new_version = ".".join([version_parts[0], minor_version, version_parts[2]])
-            chart["version"] = new_version
-            yaml.dump(chart, f)
-        return await helm_client.get_chart(temp_chart)
+async def test_values_file_renders_idempotent_pods(release_name, values, chart, versioned_chart):
+    def _bumped_version(minor_increment):
+        version_parts = chart.metadata.version.split(".")
+        minor_version = str(int(version_parts[1]) + minor_increment)
+        return ".".join([version_parts[0], minor_version, version_parts[2]])
 
     first_render = {}
     second_render = {}
     for template in await helm_template(
-        (await _patch_version_chart()), release_name, values, has_service_monitor_crd=True, skip_cache=True
+        (await versioned_chart(_bumped_version(1))), release_name, values, has_service_monitor_crd=True, skip_cache=True
     ):
         first_render[template_id(template)] = template
     for template in await helm_template(
-        (await _patch_version_chart()), release_name, values, has_service_monitor_crd=True, skip_cache=True
+        (await versioned_chart(_bumped_version(2))), release_name, values, has_service_monitor_crd=True, skip_cache=True
     ):
         second_render[template_id(template)] = template
 
@@ -14,7 +14,7 @@ async def test_sets_global_pull_secrets(values, make_templates):
     values["imagePullSecrets"] = [
         {"name": "global-secret"},
     ]
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Deployment", "StatefulSet", "Job"]):
         if template["kind"] in ["Deployment", "StatefulSet", "Job"]:
             id = f"{template['kind']}/{template['metadata']['name']}"
             assert "imagePullSecrets" in template["spec"]["template"]["spec"], f"{id} should have an imagePullSecrets"
@@ -41,7 +41,7 @@ async def test_local_pull_secrets(deployables_details, values, base_values, make
         ),
     )
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Deployment", "StatefulSet", "Job"]):
         if template["kind"] in ["Deployment", "StatefulSet", "Job"]:
             id = f"{template['kind']}/{template['metadata']['name']}"
             any_container_uses_matrix_tools_image = any(
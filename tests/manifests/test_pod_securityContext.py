@@ -47,7 +47,7 @@ async def test_can_nuke_pod_securityContext_ids(deployables_details, values, mak
         ),
     )
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Deployment", "StatefulSet", "Job"]):
         if template["kind"] in ["Deployment", "StatefulSet", "Job"]:
             id = f"{template['kind']}/{template['metadata']['name']}"
 
@@ -94,7 +94,7 @@ async def test_can_nuke_pod_securityContext_seccompProfile(deployables_details,
         ),
     )
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Deployment", "StatefulSet", "Job"]):
         if template["kind"] in ["Deployment", "StatefulSet", "Job"]:
             id = f"{template['kind']}/{template['metadata']['name']}"
 
@@ -0,0 +1,79 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import asyncio
+import os
+import zlib
+
+from . import render_cache as render_cache_module
+from .render_cache import RenderCache, render_cache_key
+from .rendered_manifests import RenderedManifests
+
+
+def test_render_cache_round_trips_and_evicts_least_recently_used(tmp_path):
+    render_cache = RenderCache(tmp_path, max_bytes=1024 * 1024)
+    assert render_cache.get("missing") is None
+
+    templates = [{"kind": "ConfigMap", "metadata": {"name": "test"}, "data": {"key": "value"}}]
+    render_cache.put("first", templates)
+    render_cache.put("second", templates)
+    assert render_cache.get("first") == templates
+    assert render_cache.stats.hits == 1
+    assert render_cache.stats.misses == 1
+
+    # Make first the most recently used entry and then shrink the cache so only 1 entry fits
+    os.utime(tmp_path / "second.pickle.z", (0, 0))
+    render_cache.max_bytes = (tmp_path / "first.pickle.z").stat().st_size
+    render_cache.evict()
+    assert render_cache.get("first") == templates
+    assert render_cache.get("second") is None
+    assert render_cache.stats.evictions == 1
+
+
+def test_render_cache_misses_entries_it_cannot_use(tmp_path, monkeypatch):
+    render_cache = RenderCache(tmp_path, max_bytes=1024 * 1024, entry_type=RenderedManifests)
+    templates = RenderedManifests([{"kind": "ConfigMap", "metadata": {"name": "test"}}])
+    render_cache.put("current", templates)
+    assert list(render_cache.get("current")) == list(templates)
+
+    # Written by a version of the tests that cached something else
+    render_cache.put("other-type", [{"kind": "ConfigMap", "metadata": {"name": "test"}}])
+    assert render_cache.get("other-type") is None
+    # Referencing a class that no longer exists
+    (tmp_path / "missing-class.pickle.z").write_bytes(zlib.compress(b"\x80\x04\x95\x00cbuiltins\nMissing\n."))
+    assert render_cache.get("missing-class") is None
+    assert render_cache.stats.misses == 2
+
+    key_arguments = ("charts/matrix-stack", "1.0.0", "values-hash", [], "pytest-abc", "v3.17.0")
+    first_key = render_cache_key(*key_arguments)
+    monkeypatch.setattr(render_cache_module, "cache_format_version", render_cache_module.cache_format_version + 1)
+    assert render_cache_key(*key_arguments) != first_key
+
+
+def test_render_cache_shares_in_progress_renders_between_processes(tmp_path):
+    async def run():
+        # Each process has its own RenderCache over the same directory
+        first_process, second_process = RenderCache(tmp_path, max_bytes=1024 * 1024), RenderCache(tmp_path, 1024 * 1024)
+        templates = [{"kind": "ConfigMap", "metadata": {"name": "test"}}]
+        renders = []
+        release_render = asyncio.Event()
+
+        async def render():
+            renders.append("render")
+            await release_render.wait()
+            return templates
+
+        first = asyncio.ensure_future(first_process.get_or_render("key", render))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(second_process.get_or_render("key", render))
+        await asyncio.sleep(0.1)
+        assert not second.done()
+        release_render.set()
+
+        assert await first == (templates, False)
+        assert await second == (templates, True)
+        assert renders == ["render"]
+        assert second_process.stats.shared == 1
+
+    asyncio.run(run())
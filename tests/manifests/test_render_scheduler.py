@@ -0,0 +1,32 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import asyncio
+
+from .render_scheduler import RenderPriority, RenderScheduler
+
+
+def test_render_scheduler_limits_concurrency_and_prefers_base_renders():
+    async def run():
+        render_scheduler = RenderScheduler(max_concurrency=1)
+        started = []
+
+        async def render(name, priority):
+            async with render_scheduler.slot(priority):
+                started.append(name)
+                await asyncio.sleep(0)
+
+        async with render_scheduler.slot(RenderPriority.BASE):
+            waiting = [
+                asyncio.ensure_future(render("mutation", RenderPriority.MUTATION)),
+                asyncio.ensure_future(render("base", RenderPriority.BASE)),
+            ]
+            await asyncio.sleep(0)
+            assert started == []
+        await asyncio.gather(*waiting)
+
+        assert started == ["base", "mutation"]
+        assert len(render_scheduler.timings) == 3
+
+    asyncio.run(run())
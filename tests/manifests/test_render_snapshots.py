@@ -0,0 +1,109 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from . import (
+    render_snapshots,
+)
+from .render_snapshots import ABSENT, Change, SnapshotDiff, SnapshotStore, structural_diff
+
+
+def test_snapshot_store_diffs_manifests_structurally(tmp_path):
+    before = [
+        {"kind": "ConfigMap", "metadata": {"name": "a"}, "data": {"x": "1", "y": "2"}},
+        {"kind": "Secret", "metadata": {"name": "b"}},
+        {"kind": "Service", "metadata": {"name": "c"}, "spec": {"ports": [{"port": 80}]}},
+    ]
+    after = [
+        {"kind": "ConfigMap", "metadata": {"name": "a"}, "data": {"x": "1", "z": "3"}},
+        {"kind": "Service", "metadata": {"name": "c"}, "spec": {"ports": [{"port": 80}, {"port": 443}]}},
+        {"kind": "Deployment", "metadata": {"name": "d"}},
+    ]
+    assert list(structural_diff(before[0], after[0])) == [Change("data.y", "2", ABSENT), Change("data.z", ABSENT, "3")]
+
+    store = SnapshotStore(tmp_path / "snapshots")
+    context = {"release_name": "pytest-abc"}
+    assert store.diff("a-values.yaml", context, after) is None
+    store.write("a-values.yaml", context, before)
+    assert store.diff("a-values.yaml", context, before).unchanged
+    # Snapshots of renders with e.g. a different release name can't be compared
+    assert store.diff("a-values.yaml", {"release_name": "pytest-xyz"}, before) is None
+
+    # A pytest-xdist worker's snapshot only replaces the previous one once the controller keeps it
+    pending_path = store.pending_path("a-values.yaml", "gw0")
+    store.write("a-values.yaml", context, after, pending_path)
+    assert store.diff("a-values.yaml", context, before).unchanged
+    store.keep_pending("a-values.yaml", pending_path)
+    assert store.diff("a-values.yaml", context, after).unchanged
+    store.write("a-values.yaml", context, before)
+
+    diff = store.diff("a-values.yaml", context, after)
+    assert diff.added == ["Deployment/d"]
+    assert diff.removed == ["Secret/b"]
+    assert diff.changed == {
+        "ConfigMap/a": [Change("data.y", "2", ABSENT), Change("data.z", ABSENT, "3")],
+        "Service/c": [Change("spec.ports[1]", ABSENT, {"port": 443})],
+    }
+
+
+def test_skip_if_unchanged_only_skips_unmodified_renders_from_unchanged_modules(tmp_path, monkeypatch):
+    test_module = tmp_path / "test_a.py"
+    test_module.write_text("def test_a(): pass\n")
+    store = SnapshotStore(tmp_path / "snapshots")
+    store.write_module_hashes({"test_a.py": render_snapshots.module_hash(test_module)})
+    monkeypatch.setattr(render_snapshots, "snapshot_mode", "skip-unchanged")
+    monkeypatch.setattr(render_snapshots, "snapshot_store", store)
+    monkeypatch.setattr(render_snapshots, "snapshot_diffs", {"a-values.yaml": SnapshotDiff()})
+    monkeypatch.setattr(render_snapshots, "_recorded_module_hashes", None)
+
+    def item(nodeid: str, fixturenames: list[str]) -> SimpleNamespace:
+        return SimpleNamespace(
+            nodeid=nodeid,
+            path=test_module,
+            fixturenames=fixturenames,
+            callspec=SimpleNamespace(params={"values_file": "a-values.yaml"}),
+        )
+
+    with pytest.raises(pytest.skip.Exception):
+        render_snapshots.skip_if_unchanged(item("test_a.py::test_a[a-values.yaml]", ["templates"]))
+    # Renders modified values, which the snapshot says nothing about
+    render_snapshots.skip_if_unchanged(item("test_a.py::test_a[a-values.yaml]", ["templates", "make_templates"]))
+    # Never passed, or changed since it last did
+    render_snapshots.skip_if_unchanged(item("test_b.py::test_b[a-values.yaml]", ["templates"]))
+    render_snapshots.module_hash.cache_clear()
+    test_module.write_text("def test_a(): assert False\n")
+    render_snapshots.skip_if_unchanged(item("test_a.py::test_a[a-values.yaml]", ["templates"]))
+    render_snapshots.module_hash.cache_clear()
+
+
+def test_module_hashes_are_only_recorded_once_every_test_of_the_module_passed(tmp_path):
+    (tmp_path / "test_module.py").write_text(
+        "import os\n\ndef test_a(): pass\n\ndef test_b(): assert os.environ['B']\n"
+    )
+
+    def run_pytest(*args: str, b_passes: bool) -> dict[str, str]:
+        env = {**os.environ, "PYTEST_ESS_SNAPSHOTS": "skip-unchanged", "PYTHONPATH": str(Path(__file__).parent.parent)}
+        env["B"] = "1" if b_passes else ""
+        subprocess.run(
+            [sys.executable, "-m", "pytest", "-q", "-p", "manifests.render_snapshots", *args],
+            cwd=tmp_path,
+            env=env,
+            capture_output=True,
+        )
+        return SnapshotStore(tmp_path / ".pytest_cache" / "d" / "ess-helm-snapshots").module_hashes()
+
+    assert run_pytest("test_module.py", b_passes=False) == {}
+    # Every test that ran passed, but the failing test was deselected
+    assert run_pytest("test_module.py", "-k", "test_a", b_passes=False) == {}
+    assert run_pytest("test_module.py::test_a", b_passes=False) == {}
+    assert run_pytest("test_module.py", b_passes=True).keys() == {"test_module.py"}
+    # Still recorded after a run of only some of its tests
+    assert run_pytest("test_module.py", "-k", "test_a", b_passes=False).keys() == {"test_module.py"}
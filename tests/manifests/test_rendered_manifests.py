@@ -0,0 +1,24 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from .rendered_manifests import RenderedManifests
+
+
+def test_rendered_manifests_indexes_and_iterates_like_a_list():
+    manifests = [
+        {"kind": "ConfigMap", "metadata": {"name": "first", "labels": {"app.kubernetes.io/name": "synapse"}}},
+        {"kind": "Secret", "metadata": {"name": "first", "labels": {"app.kubernetes.io/name": "synapse"}}},
+        {"kind": "ConfigMap", "metadata": {"name": "second", "labels": {"app.kubernetes.io/name": "haproxy"}}},
+    ]
+    rendered_manifests = RenderedManifests(manifests)
+
+    assert list(rendered_manifests) == manifests
+    assert len(rendered_manifests) == 3
+    assert rendered_manifests[1] is manifests[1]
+    assert rendered_manifests.get("Secret", "first") is manifests[1]
+    assert rendered_manifests.get("Secret", "second") is None
+    assert rendered_manifests.of_kind("ConfigMap") == (manifests[0], manifests[2])
+    assert rendered_manifests.of_kind("Secret", "ConfigMap") == (manifests[1], manifests[0], manifests[2])
+    assert rendered_manifests.of_kind("Ingress") == ()
+    assert rendered_manifests.with_app_name("synapse") == (manifests[0], manifests[1])
@@ -2,12 +2,12 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-only
 
-from collections.abc import Iterator
 from typing import Any
 
 import pytest
 
 from . import DeployableDetails, values_files_to_test
+from .rendered_manifests import RenderedManifests
 from .utils import iterate_deployables_parts, template_id
 
 
@@ -15,20 +15,18 @@ def selector_match(labels: dict[str, str], selector: dict[str, str]) -> bool:
     return all(labels[key] == value for key, value in selector.items())
 
 
-def find_services_matching_selector(templates: Iterator[Any], selector: dict[str, str]) -> list[Any]:
+def find_services_matching_selector(templates: RenderedManifests, selector: dict[str, str]) -> list[Any]:
     services = []
-    for template in templates:
-        if template["kind"] == "Service" and selector_match(template["metadata"]["labels"], selector):
+    for template in templates.of_kind("Service"):
+        if selector_match(template["metadata"]["labels"], selector):
             services.append(template)
     return services
 
 
-def find_workload_ids_matching_selector(templates: Iterator[Any], selector: dict[str, str]) -> list[str]:
+def find_workload_ids_matching_selector(templates: RenderedManifests, selector: dict[str, str]) -> list[str]:
     workload_ids = []
-    for template in templates:
-        if template["kind"] in ("Deployment", "StatefulSet", "Job") and selector_match(
-            template["spec"]["template"]["metadata"]["labels"], selector
-        ):
+    for template in templates.of_kind("Deployment", "StatefulSet", "Job"):
+        if selector_match(template["spec"]["template"]["metadata"]["labels"], selector):
             workload_ids.append(f"{template['kind']}/{template['metadata']['name']}")
 
     return workload_ids
@@ -49,15 +47,14 @@ def workload_ids_for_service_monitor(service_monitor, templates) -> set[str]:
     return set(workload_ids)
 
 
-def workload_ids_monitored(templates: Iterator[Any]) -> set[str]:
+def workload_ids_monitored(templates: RenderedManifests) -> set[str]:
     workload_ids_monitored = set()
-    for template in templates:
-        if template["kind"] == "ServiceMonitor":
-            these_monitored_workload_ids = workload_ids_for_service_monitor(template, templates)
-            assert workload_ids_monitored.intersection(these_monitored_workload_ids) == set(), (
-                "Multiple ServiceMonitors cover the same workload"
-            )
-            workload_ids_monitored.update(these_monitored_workload_ids)
+    for template in templates.of_kind("ServiceMonitor"):
+        these_monitored_workload_ids = workload_ids_for_service_monitor(template, templates)
+        assert workload_ids_monitored.intersection(these_monitored_workload_ids) == set(), (
+            "Multiple ServiceMonitors cover the same workload"
+        )
+        workload_ids_monitored.update(these_monitored_workload_ids)
 
     return workload_ids_monitored
 
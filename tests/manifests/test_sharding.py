@@ -0,0 +1,11 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from .sharding import assign_shards
+
+
+def test_shards_keep_values_files_together_and_balance_tests():
+    assignments = assign_shards({"a-values.yaml": 5, "b-values.yaml": 3, "c-values.yaml": 2, "test_x.py": 1}, 2)
+    assert assignments == {"a-values.yaml": 1, "b-values.yaml": 2, "c-values.yaml": 2, "test_x.py": 1}
+    assert assign_shards({"a-values.yaml": 5}, 3) == {"a-values.yaml": 1}
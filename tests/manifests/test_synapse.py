@@ -71,13 +71,13 @@ async def test_appservice_secrets_are_templated(release_name, values, make_templ
 @pytest.mark.parametrize("values_file", ["synapse-minimal-values.yaml"])
 @pytest.mark.asyncio_cooperative
 async def test_max_upload_size_annotation_global_ingressType(values, make_templates):
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "nginx.ingress.kubernetes.io/proxy-body-size" not in template["metadata"].get("annotations", {})
 
     values.setdefault("ingress", {})["controllerType"] = "ingress-nginx"
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "nginx.ingress.kubernetes.io/proxy-body-size" in template["metadata"].get("annotations", {})
 
@@ -88,12 +88,12 @@ async def test_max_upload_size_annotation_component_ingressType(values, deployab
     def set_ingress_type(values_fragment: dict[str, Any], deployable_details: DeployableDetails):
         values_fragment.setdefault("ingress", {})["controllerType"] = "ingress-nginx"
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "nginx.ingress.kubernetes.io/proxy-body-size" not in template["metadata"].get("annotations", {})
 
     iterate_deployables_ingress_parts(deployables_details, values, set_ingress_type)
 
-    for template in await make_templates(values):
+    for template in await make_templates(values, kinds=["Ingress"]):
         if template["kind"] == "Ingress":
             assert "nginx.ingress.kubernetes.io/proxy-body-size" in template["metadata"].get("annotations", {})
@@ -0,0 +1,65 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import base64
+import subprocess
+
+import pytest
+
+from . import template_coverage
+from .template_coverage import RenderError, analyse_coverage, covered_branches, instrument_chart
+
+
+def test_template_coverage_instruments_branches_whose_output_is_not_consumed(tmp_path):
+    chart_dir = tmp_path / "chart"
+    (chart_dir / "templates").mkdir(parents=True)
+    (chart_dir / "templates" / "_helpers.tpl").write_text(
+        '{{- define "enabled" -}}\n{{- if .enabled -}}true{{- end -}}\n{{- end -}}\n'
+        '{{- define "labels" -}}\n{{- with .labels }}\n{{ toYaml . }}\n{{- end }}\n{{- end -}}\n'
+    )
+    (chart_dir / "templates" / "configmap.yaml").write_text(
+        '{{- if (include "enabled" .Values) -}}\nkind: ConfigMap\nmetadata:\n  labels:\n'
+        '    {{- include "labels" .Values | nindent 4 }}\n{{- else }}\n# Disabled\n{{- end }}\n'
+    )
+
+    branches, uninstrumented = instrument_chart(chart_dir, tmp_path / "instrumented")
+    assert [(branch.path, branch.line, branch.action) for branch in branches] == [
+        ("templates/_helpers.tpl", 5, "with .labels"),
+        ("templates/configmap.yaml", 1, 'if (include "enabled" .Values)'),
+        ("templates/configmap.yaml", 6, "else"),
+    ]
+    # The output of "enabled" is tested in a condition, so markers would change what renders
+    assert [(branch.path, branch.line) for branch in uninstrumented] == [("templates/_helpers.tpl", 2)]
+    assert (
+        (tmp_path / "instrumented" / "templates" / "configmap.yaml")
+        .read_text()
+        .startswith('{{- if (include "enabled" .Values) -}}{{ "@@ess-coverage-1@@" -}}\nkind: ConfigMap')
+    )
+
+    assert covered_branches(
+        "@@ess-coverage-1@@kind: Secret\ndata:\n  a: " + base64.b64encode(b"x: @@ess-coverage-0@@").decode()
+    ) == {0, 1}
+    report = analyse_coverage(
+        {"a-values.yaml": frozenset({0}), "b-values.yaml": frozenset({0, 1}), "c-values.yaml": frozenset({0, 1})}, 3
+    )
+    assert report.redundant_values_files == {"a-values.yaml": ("b-values.yaml", "c-values.yaml")}
+    assert report.equivalent_values_files == (("b-values.yaml", "c-values.yaml"),)
+    assert report.uncovered_branches == (2,)
+
+
+def test_template_coverage_only_accepts_helm_failures_from_invalid_yaml(tmp_path, monkeypatch):
+    def helm_exiting_with(stderr: str):
+        def run(command, **kwargs):
+            return subprocess.CompletedProcess(command, 1, stdout="@@ess-coverage-0@@kind: ConfigMap\n", stderr=stderr)
+
+        monkeypatch.setattr(subprocess, "run", run)
+
+    # Every template rendered, but the markers made a manifest invalid YAML
+    helm_exiting_with("Error: YAML parse error on matrix-stack/templates/a.yaml: error converting YAML to JSON\n")
+    assert template_coverage.render(tmp_path, "synapse-minimal-values.yaml") == "@@ess-coverage-0@@kind: ConfigMap\n"
+
+    # Rendering stopped partway, so only some of the covered markers were output
+    helm_exiting_with("Error: template: matrix-stack/templates/b.yaml:3:4: executing ... nil pointer\n")
+    with pytest.raises(RenderError, match="synapse-minimal-values.yaml"):
+        template_coverage.render(tmp_path, "synapse-minimal-values.yaml")
@@ -0,0 +1,21 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from .utils import _filter_rendered_documents, _RenderFilter
+
+
+def test_filter_rendered_documents_keeps_only_selected_templates():
+    rendered = (
+        "---\n# Source: matrix-stack/templates/a/ingress.yaml\nkind: Ingress\n"
+        "---\n# Source: matrix-stack/templates/a/deployment.yaml\nkind: Deployment\n"
+        "---\n# Source: matrix-stack/templates/b/ingress.yaml\nkind: Ingress\n"
+    )
+    render_filter = _RenderFilter(
+        frozenset(["Ingress"]), frozenset(["templates/a/ingress.yaml", "templates/b/ingress.yaml"])
+    )
+
+    filtered = _filter_rendered_documents(rendered, render_filter)
+    assert "templates/a/ingress.yaml" in filtered
+    assert "templates/b/ingress.yaml" in filtered
+    assert "Deployment" not in filtered
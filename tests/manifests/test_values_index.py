@@ -0,0 +1,65 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from . import (
+    values_files_to_deployables_details,
+)
+from .rendered_manifests import RenderedManifests
+from .values_index import build_values_index, init_secrets_requests
+from .values_overlay import ValuesOverlay
+
+
+def test_values_index_matches_values_and_render():
+    deployables_details = values_files_to_deployables_details["matrix-authentication-service-minimal-values.yaml"]
+    values = {
+        "serverName": "ess.localhost",
+        "matrixAuthenticationService": {
+            "ingress": {"host": "mas.ess.localhost"},
+            "postgres": {"password": {"secret": "{{ $.Release.Name }}-pg", "secretKey": "password"}},
+            "additional": {"extra": {"configSecret": "extra", "configSecretKey": "config.yaml"}},
+        },
+        "initSecrets": {"enabled": True},
+        "list": [{"value": {"secret": "listed", "secretKey": "key"}}],
+        # Credentials in the Helm values are added to a Secret generated by the chart
+        "inHelm": {"value": "password", "secret": "ignored", "secretKey": "ignored"},
+    }
+    index = build_values_index(ValuesOverlay(values), deployables_details)
+    assert index.credentials == (("{{ $.Release.Name }}-pg", "password"), ("listed", "key"))
+    assert {deployable.name: host for deployable, host in index.ingress_hosts.items()} == {
+        "matrix-authentication-service": "mas.ess.localhost"
+    }
+    (owner,) = index.ownership.owners_of("matrix-authentication-service-syn2mas")
+    assert owner.name == "matrix-authentication-service"
+    assert index.ownership.owners_of("synapse") == []
+
+    rendered = RenderedManifests(
+        [
+            {
+                "kind": "Job",
+                "metadata": {"name": "ess-init-secrets"},
+                "spec": {
+                    "template": {
+                        "spec": {
+                            "containers": [
+                                {
+                                    "command": [
+                                        "/matrix-tools",
+                                        "generate-secrets",
+                                        "-secrets",
+                                        "ess-generated:A,ess-generated:B,ess-other:C",
+                                        "-labels",
+                                        "app=ess,managed=init",
+                                    ]
+                                }
+                            ]
+                        }
+                    }
+                },
+            }
+        ]
+    )
+    requests = init_secrets_requests(rendered, "ess-init-secrets")
+    assert requests == ({"ess-generated": ("A", "B"), "ess-other": ("C",)}, {"app": "ess", "managed": "init"})
+    assert init_secrets_requests(rendered, "ess-init-secrets") is requests
+    assert init_secrets_requests(RenderedManifests([]), "ess-init-secrets") is None
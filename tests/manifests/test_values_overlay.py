@@ -0,0 +1,40 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import copy
+
+from .values_overlay import ValuesOverlay, materialise, structural_hash
+
+
+def test_values_overlay_copies_on_write():
+    base = {"synapse": {"ingress": {"host": "synapse"}, "tolerations": []}, "serverName": "example.com"}
+    base_hash = structural_hash(base)
+    values = ValuesOverlay(base, base_hash)
+
+    # Reading doesn't change anything, even reading lists which are copied
+    assert values["synapse"]["ingress"]["host"] == "synapse"
+    assert values["synapse"]["tolerations"] == []
+    assert values.structural_hash() == base_hash
+    assert materialise(values) == base
+
+    values["synapse"]["tolerations"].append({"key": "value"})
+    values.setdefault("ingress", {})["annotations"] = {"global": "set"}
+    del values["serverName"]
+    assert base == {"synapse": {"ingress": {"host": "synapse"}, "tolerations": []}, "serverName": "example.com"}
+    assert materialise(values) == {
+        "synapse": {"ingress": {"host": "synapse"}, "tolerations": [{"key": "value"}]},
+        "ingress": {"annotations": {"global": "set"}},
+    }
+
+    # The same changes made to another overlay of the same base hash the same
+    other_values = ValuesOverlay(base, base_hash)
+    del other_values["serverName"]
+    other_values["ingress"] = {"annotations": {"global": "set"}}
+    other_values["synapse"]["tolerations"].append({"key": "value"})
+    assert other_values.structural_hash() == values.structural_hash()
+    assert values.structural_hash() != base_hash
+
+    copied_values = copy.deepcopy(values)
+    copied_values["synapse"]["ingress"]["host"] = "changed"
+    assert values["synapse"]["ingress"]["host"] == "synapse"
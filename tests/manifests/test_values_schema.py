@@ -0,0 +1,58 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from pathlib import Path
+
+import pytest
+
+from .values_schema import SchemaError, ValuesSchema, ValuesSchemaError, validate_values_files
+
+
+def test_values_schema_reports_invalid_values_with_their_paths():
+    values_schema = ValuesSchema(
+        {
+            "type": "object",
+            "properties": {
+                "serverName": {"type": "string"},
+                "synapse": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "required": ["ingress"],
+                    "properties": {
+                        "ingress": {
+                            "type": "object",
+                            "properties": {"host": {"type": "string", "pattern": "^[a-z.]+$"}},
+                        },
+                        "extraArgs": {"type": "array", "items": {"type": "string"}},
+                        "replicas": {"anyOf": [{"type": "integer", "minimum": 1}, {"type": "null"}]},
+                    },
+                },
+            },
+        },
+        defaults={"synapse": {"ingress": {"host": "synapse.localhost"}, "replicas": 1}},
+    )
+    assert values_schema.errors({"serverName": "ess.localhost"}) == []
+    assert values_schema.errors({"synapse": {"replicas": None}}) == []
+
+    errors = values_schema.errors(
+        {"serverName": 1, "synapse": {"ingress": {"host": "Synapse"}, "extraArgs": ["--a", 2], "bogus": True}}
+    )
+    assert [str(error) for error in errors] == [
+        "$.serverName: got integer, want string",
+        "$.synapse: additional properties 'bogus' not allowed",
+        "$.synapse.ingress.host: 'Synapse' doesn't match pattern '^[a-z.]+$'",
+        "$.synapse.extraArgs[1]: got integer, want string",
+    ]
+    # A null removes the default, as it does with helm
+    assert values_schema.errors({"synapse": {"ingress": None}}) == [
+        SchemaError(("synapse",), "missing property 'ingress'")
+    ]
+    with pytest.raises(ValuesSchemaError, match=r"\$\.synapse\.replicas: doesn't match any of the anyOf schemas"):
+        values_schema.validate({"synapse": {"replicas": 0}})
+
+
+def test_values_schema_accepts_every_ci_values_file():
+    chart = Path(__file__).parent.parent.parent / "charts" / "matrix-stack"
+    values_files = sorted((chart / "ci").glob("*-values.yaml"))
+    assert validate_values_files(chart, values_files, workers=2) == {values_file: [] for values_file in values_files}
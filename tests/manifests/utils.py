@@ -2,46 +2,173 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-only
 
-import copy
+from __future__ import annotations
+
+import asyncio
 import json
+import os
 import random
-import shutil
+import re
 import string
 import tempfile
-from collections.abc import Iterator
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Callable
+from typing import TYPE_CHECKING, Any, Callable
 
-import pyhelm3
 import pytest
 import yaml
 
-from . import DeployableDetails, values_files_to_deployables_details
-
-template_cache = {}
+from . import DeployableDetails, manifest_parsing, render_snapshots, values_files_to_deployables_details
+from .chart_package import chart_source, package_chart, with_chart_version
+from .chart_templates import templates_emitting
+from .impact_analysis import record_render
+from .manifest_parsing import parse_manifests, split_documents
+from .perf_report import perf_recorder
+from .render_cache import RenderCache, locked, render_cache_key
+from .render_scheduler import RenderPriority, RenderScheduler, default_max_concurrency
+from .rendered_manifests import RenderedManifests
+from .values_index import ValuesIndex, build_values_index, deployable_ownership, init_secrets_requests
+from .values_overlay import ValuesOverlay, materialise, structural_hash
+from .values_schema import chart_values_schema
+
+# pyhelm3 and pydantic take longer to import than the rest of the tests take to collect, so pyhelm3 is only
+# imported once something is rendered
+if TYPE_CHECKING:
+    import pyhelm3
+
+template_cache: dict[str, RenderedManifests] = {}
 values_cache = {}
+# The index of each values file, keyed by the hash of the values it was built from
+values_index_cache: dict[str, ValuesIndex] = {}
+# The (sub-)component each app.kubernetes.io/name belongs to, for a given set of deployables
+deployable_details_cache: dict[tuple[tuple[DeployableDetails], str], DeployableDetails] = {}
 
+# Renders that have been started but not yet finished, so that concurrent tests rendering
+# identical values wait on the same helm invocation rather than each starting their own
+template_renders_in_flight: dict[str, asyncio.Task] = {}
+coalesced_renders = 0
 
-@pytest.fixture(scope="session")
-async def release_name():
+# Parsed renders persisted between pytest sessions and shared between concurrent ones. Disabled with
+# PYTEST_ESS_RENDER_CACHE=0 or when pytest's cacheprovider plugin is disabled
+render_cache: RenderCache | None = None
+helm_version: str | None = None
+
+# Limits how many helm processes we run at once. Overridden with PYTEST_ESS_HELM_CONCURRENCY
+render_scheduler = RenderScheduler(default_max_concurrency())
+
+# Values are checked against the chart's values.schema.json before rendering, so that invalid values fail
+# with the path to each invalid value rather than after spawning helm. Disabled with PYTEST_ESS_VALUES_SCHEMA=0
+validate_values_schema = os.environ.get("PYTEST_ESS_VALUES_SCHEMA", "1") != "0"
+
+
+def pytest_configure(config: pytest.Config):
+    global render_cache
+    if os.environ.get("PYTEST_ESS_RENDER_CACHE", "1") == "0" or not hasattr(config, "cache"):
+        return
+
+    if "PYTEST_ESS_RENDER_CACHE_DIR" in os.environ:
+        render_cache_directory = Path(os.environ["PYTEST_ESS_RENDER_CACHE_DIR"])
+        render_cache_directory.mkdir(parents=True, exist_ok=True)
+    else:
+        render_cache_directory = config.cache.mkdir("ess-helm-renders")
+    render_cache = RenderCache(
+        render_cache_directory,
+        max_bytes=int(os.environ.get("PYTEST_ESS_RENDER_CACHE_MAX_MB", "512")) * 1024 * 1024,
+        entry_type=RenderedManifests,
+    )
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int):
+    manifest_parsing.shutdown()
+    if render_cache is not None:
+        render_cache.evict()
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus: int, config: pytest.Config):
+    cache_used = render_cache is not None and render_cache.stats.hits + render_cache.stats.misses > 0
+    if not cache_used and coalesced_renders == 0 and not render_scheduler.timings:
+        return
+
+    terminalreporter.write_sep("-", "helm render cache")
+    if cache_used:
+        stats = render_cache.stats
+        terminalreporter.write_line(
+            f"{stats.hits} hits, {stats.misses} misses, {stats.writes} writes, {stats.evictions} evictions, "
+            f"{stats.shared} shared with other processes in {render_cache.directory}"
+        )
+    terminalreporter.write_line(f"{coalesced_renders} renders coalesced with an identical in-flight render")
+    for priority in RenderPriority:
+        timings = [timing for timing in render_scheduler.timings if timing.priority == priority]
+        if not timings:
+            continue
+        terminalreporter.write_line(
+            f"{len(timings)} {priority.name.lower()} renders with at most {render_scheduler.max_concurrency} "
+            f"concurrently: {sum(timing.queue_wait for timing in timings):.2f}s queued "
+            f"(max {max(timing.queue_wait for timing in timings):.2f}s), "
+            f"{sum(timing.execution for timing in timings):.2f}s executing "
+            f"(max {max(timing.execution for timing in timings):.2f}s)"
+        )
+
+
+def _random_release_name() -> str:
     return f"pytest-{''.join(random.choices(string.ascii_lowercase, k=6))}"
 
 
+@pytest.fixture(scope="session")
+async def release_name(pytestconfig: pytest.Config):
+    # The release name is part of every render cache key, so it is kept with the render cache. Every
+    # checkout and machine sharing PYTEST_ESS_RENDER_CACHE_DIR then uses the same one. Locked so that
+    # concurrent sessions pick the same one
+    if render_cache is not None:
+        release_name_path = render_cache.directory / "release_name"
+        with locked(render_cache.directory / "release_name.lock"):
+            if release_name_path.exists():
+                return release_name_path.read_text("utf-8").strip()
+            release_name = _random_release_name()
+            release_name_path.write_text(release_name, "utf-8")
+        return release_name
+    # Snapshots are of renders with a given release name, so it is kept for as long as the pytest cache is
+    if render_snapshots.snapshot_store is not None:
+        with locked(pytestconfig.cache.mkdir("ess-helm") / "release_name.lock"):
+            release_name = pytestconfig.cache.get("ess-helm/release_name", None)
+            if release_name is None:
+                release_name = _random_release_name()
+                pytestconfig.cache.set("ess-helm/release_name", release_name)
+        return release_name
+    return _random_release_name()
+
+
 @pytest.fixture(scope="session")
 async def helm_client():
+    import pyhelm3
+
     return pyhelm3.Client()
 
 
-@pytest.fixture()
-async def temp_chart(helm_client):
+@pytest.fixture(scope="session")
+async def chart_package():
     with tempfile.TemporaryDirectory() as tmpdirname:
-        shutil.copytree("charts/matrix-stack", Path(tmpdirname) / "matrix-stack")
-        yield Path(tmpdirname) / "matrix-stack"
+        yield await package_chart(Path("charts/matrix-stack"), Path(tmpdirname))
+
+
+@pytest.fixture(scope="session")
+async def chart(helm_client: pyhelm3.Client, chart_package: Path):
+    return await helm_client.get_chart(chart_package)
 
 
 @pytest.fixture(scope="session")
-async def chart(helm_client: pyhelm3.Client):
-    return await helm_client.get_chart("charts/matrix-stack")
+def versioned_chart(helm_client: pyhelm3.Client, chart_package: Path):
+    """Returns the packaged chart with its version changed, so tests can see what depends on the version"""
+    charts: dict[str, asyncio.Future[pyhelm3.Chart]] = {}
+
+    async def _versioned_chart(version: str) -> pyhelm3.Chart:
+        if version not in charts:
+            charts[version] = asyncio.ensure_future(helm_client.get_chart(with_chart_version(chart_package, version)))
+        return await asyncio.shield(charts[version])
+
+    return _versioned_chart
 
 
 @pytest.fixture(scope="function")
@@ -54,60 +181,90 @@ def base_values() -> dict[str, Any]:
     return yaml.safe_load(Path("charts/matrix-stack/values.yaml").read_text("utf-8"))
 
 
-@pytest.fixture(scope="function")
-def values(values_file) -> dict[str, Any]:
+def read_values_file(values_file: str) -> dict[str, Any]:
+    """The values of a CI values file as the tests render them, with the shared components enabled by default."""
+    v = yaml.safe_load((Path("charts/matrix-stack/ci") / values_file).read_text("utf-8"))
+    if not v.get("initSecrets"):
+        v["initSecrets"] = {"enabled": True}
+    if not v.get("postgres"):
+        v["postgres"] = {"enabled": True}
+    if not v.get("wellKnownDelegation"):
+        v["wellKnownDelegation"] = {"enabled": True}
+    return v
+
+
+def _values_file_overlay(values_file: str) -> ValuesOverlay:
     if values_file not in values_cache:
-        v = yaml.safe_load((Path("charts/matrix-stack/ci") / values_file).read_text("utf-8"))
-        if not v.get("initSecrets"):
-            v["initSecrets"] = {"enabled": True}
-        if not v.get("postgres"):
-            v["postgres"] = {"enabled": True}
-        if not v.get("wellKnownDelegation"):
-            v["wellKnownDelegation"] = {"enabled": True}
+        v = read_values_file(values_file)
+        values_cache[values_file] = (v, structural_hash(v))
+    base_values, base_values_hash = values_cache[values_file]
+    return ValuesOverlay(base_values, base_values_hash)
+
 
-        values_cache[values_file] = v
-    return copy.deepcopy(values_cache[values_file])
+@pytest.fixture(scope="function")
+def values(request: pytest.FixtureRequest, values_file) -> ValuesOverlay:
+    started_at = time.monotonic()
+    # Every test gets its own overlay over the same parsed values file, so only what the test changes is copied
+    overlay = _values_file_overlay(values_file)
+    with perf_recorder.attribute_to(request.node):
+        perf_recorder.record_values(time.monotonic() - started_at)
+    return overlay
 
 
 @pytest.fixture(scope="function")
-async def templates(chart: pyhelm3.Chart, release_name: str, values: dict[str, Any]):
-    return await helm_template(chart, release_name, values)
+async def templates(request: pytest.FixtureRequest, chart: pyhelm3.Chart, release_name: str, values: ValuesOverlay):
+    with perf_recorder.attribute_to(request.node):
+        rendered = await helm_template(chart, release_name, values, priority=RenderPriority.BASE)
+        await _compare_to_snapshot(request, chart, release_name, rendered)
+        # Only if nothing has modified the values before they were rendered
+        if not values.delta():
+            render_snapshots.skip_if_unchanged(request.node)
+        return rendered
+
+
+async def _compare_to_snapshot(
+    request: pytest.FixtureRequest,
+    chart: pyhelm3.Chart,
+    release_name: str,
+    rendered: RenderedManifests | None = None,
+):
+    """Diffs the render of the test's unmodified values file against its snapshot, with PYTEST_ESS_SNAPSHOTS."""
+    values_file = render_snapshots.values_file_of(request.node)
+    if render_snapshots.snapshot_store is None or values_file is None:
+        return
+
+    if rendered is None:
+        rendered = await helm_template(
+            chart, release_name, _values_file_overlay(values_file), priority=RenderPriority.BASE
+        )
+    context = {"release_name": release_name, "helm_version": await get_helm_version()}
+    render_snapshots.compare_to_snapshot(values_file, context, rendered)
 
 
 @pytest.fixture(scope="function")
-def other_secrets(release_name, values, templates):
-    return list(generated_secrets(release_name, values, templates)) + list(external_secrets(release_name, values))
+def values_index(values: ValuesOverlay, deployables_details: tuple[DeployableDetails]) -> ValuesIndex:
+    # Unmodified values have the hash of the values file, so this is only built once per values file
+    values_hash = structural_hash(values)
+    if values_hash not in values_index_cache:
+        values_index_cache[values_hash] = build_values_index(values, deployables_details)
+    return values_index_cache[values_hash]
 
 
-def generated_secrets(release_name: str, values: Any | None, helm_generated_templates: list[Any]) -> Iterator[Any]:
+@pytest.fixture(scope="function")
+def other_secrets(release_name, values, templates, values_index: ValuesIndex):
+    return list(generated_secrets(release_name, values, templates)) + list(external_secrets(release_name, values_index))
+
+
+def generated_secrets(
+    release_name: str, values: Any | None, helm_generated_templates: RenderedManifests
+) -> Iterator[Any]:
     if values["initSecrets"]["enabled"]:
-        init_secrets_job = None
-        for template in helm_generated_templates:
-            if template["kind"] == "Job" and template["metadata"]["name"] == f"{release_name}-init-secrets":
-                init_secrets_job = template
-                break
-        else:
+        requests = init_secrets_requests(helm_generated_templates, f"{release_name}-init-secrets")
+        if requests is None:
             # We don't have an init-secrets job
             return
 
-        command_line = (
-            init_secrets_job.get("spec", {})
-            .get("template", {})
-            .get("spec", {})
-            .get("containers", [{}])[0]
-            .get("command", {})
-        )
-        assert len(command_line) == 6, "Unexpected command line in the init-secrets job"
-        assert command_line[2] == "-secrets", "Can't find the secrets args for the init-secrets job"
-        assert command_line[4] == "-labels", "Can't find the labels args for the init-secrets job"
-
-        requested_secrets = command_line[3].split(",")
-        requested_labels = {label.split("=")[0]: label.split("=")[1] for label in command_line[5].split(",")}
-        generated_secrets_to_keys = {}
-        for requested_secret in requested_secrets:
-            secret_parts = requested_secret.split(":")
-            generated_secrets_to_keys.setdefault(secret_parts[0], []).append(secret_parts[1])
-
+        generated_secrets_to_keys, requested_labels = requests
         for secret_name, secret_keys in generated_secrets_to_keys.items():
             yield {
                 "kind": "Secret",
@@ -128,22 +285,10 @@ def generated_secrets(release_name: str, values: Any | None, helm_generated_temp
             }
 
 
-def external_secrets(release_name, values):
-    def find_credential(values_fragment):
-        if isinstance(values_fragment, (dict, list)):
-            for value in values_fragment.values() if isinstance(values_fragment, dict) else values_fragment:
-                if isinstance(value, dict):
-                    if "secret" in value and "secretKey" in value and len(value) == 2:
-                        yield (value["secret"].replace("{{ $.Release.Name }}", release_name), value["secretKey"])
-                    # We don't care about credentials in the Helm values as those will
-                    # be added to the Secret generated by the chart and won't be external
-                    else:
-                        yield from find_credential(value)
-                elif isinstance(value, list):
-                    yield from find_credential(value)
-
+def external_secrets(release_name, values_index: ValuesIndex):
     external_secrets_to_keys = {}
-    for secret_name, secretKey in find_credential(values):
+    for secret_name, secretKey in values_index.credentials:
+        secret_name = secret_name.replace("{{ $.Release.Name }}", release_name)
         external_secrets_to_keys.setdefault(secret_name, []).append(secretKey)
 
     for secret_name, secret_keys in external_secrets_to_keys.items():
@@ -163,13 +308,43 @@ def external_secrets(release_name, values):
         }
 
 
+@dataclass(frozen=True)
+class _RenderFilter:
+    kinds: frozenset[str]
+    # The chart templates, relative to the chart, that can emit any of the kinds
+    templates: frozenset[str]
+
+
+# Helm prefixes each rendered manifest with the template it came from, prefixed by the chart name
+_manifest_source_pattern = re.compile(r"^# Source: [^/]+/(\S+)$", re.MULTILINE)
+
+
+def _filter_rendered_documents(rendered: str, render_filter: _RenderFilter) -> str:
+    documents = []
+    for document in split_documents(rendered):
+        source = _manifest_source_pattern.search(document)
+        if source is not None and source.group(1) in render_filter.templates:
+            documents.append(document)
+    return "\n---\n".join(documents)
+
+
 async def helm_template(
-    chart: pyhelm3.Chart, release_name: str, values: Any | None, has_service_monitor_crd=True, skip_cache=False
-) -> Iterator[Any]:
+    chart: pyhelm3.Chart,
+    release_name: str,
+    values: Any | None,
+    has_service_monitor_crd=True,
+    skip_cache=False,
+    priority=RenderPriority.MUTATION,
+    kinds: Iterable[str] | None = None,
+) -> RenderedManifests:
     """Generate template with ServiceMonitor API Versions enabled
 
     The native pyhelm3 template command does expose the --api-versions flag,
     so we implement it here.
+
+    If kinds are given only the manifests of those kinds are returned and only the chart
+    templates that can emit them are parsed. These partial renders are cached separately
+    from full renders.
     """
     additional_apis = []
     if has_service_monitor_crd:
@@ -185,32 +360,116 @@ async def helm_template(
         "-",
     ] + additional_apis_args
 
-    template_cache_key = json.dumps(
-        {
-            "values": values,
-            "additional_apis": additional_apis,
-            "release_name": release_name,
-        }
+    render_filter = None
+    if kinds is not None:
+        render_filter = _RenderFilter(frozenset(kinds), frozenset(templates_emitting(chart_source(chart.ref), kinds)))
+
+    if skip_cache:
+        _check_values_schema(chart, values)
+        rendered = await _render_templates(command, values, priority, render_filter)
+        record_render(rendered)
+        return rendered
+
+    template_cache_key = render_cache_key(
+        chart_source(chart.ref),
+        chart.metadata.version,
+        structural_hash(values),
+        additional_apis,
+        release_name,
+        await get_helm_version(),
+        sorted(render_filter.kinds) if render_filter is not None else None,
     )
+    if template_cache_key in template_cache:
+        perf_recorder.record_cache_hit(from_disk=False)
+    else:
+        global coalesced_renders
+        if template_cache_key in template_renders_in_flight:
+            coalesced_renders += 1
+            perf_recorder.record_coalesced_render()
+        else:
+            _check_values_schema(chart, values)
+            template_renders_in_flight[template_cache_key] = asyncio.ensure_future(
+                _cached_render_templates(template_cache_key, command, values, priority, render_filter)
+            )
+        # Shielded so that a cancelled test doesn't cancel the render for everyone else waiting on it
+        await asyncio.shield(template_renders_in_flight[template_cache_key])
+    record_render(template_cache[template_cache_key])
+    return template_cache[template_cache_key]
 
-    if skip_cache or template_cache_key not in template_cache:
-        templates = list(
-            [
-                template
-                for template in yaml.load_all(
-                    await pyhelm3.Command().run(command, json.dumps(values or {}).encode()), Loader=yaml.SafeLoader
-                )
-                if template is not None
-            ]
-        )
+
+def _check_values_schema(chart: pyhelm3.Chart, values: Any | None):
+    if not validate_values_schema:
+        return
+    values_schema = chart_values_schema(chart_source(chart.ref))
+    if values_schema is not None:
+        values_schema.validate(materialise(values), "The values to render")
+
+
+async def _cached_render_templates(
+    template_cache_key: str,
+    command: list[str],
+    values: Any | None,
+    priority: RenderPriority,
+    render_filter: _RenderFilter | None,
+):
+    try:
+        if render_cache is None:
+            templates = await _render_templates(command, values, priority, render_filter)
+        else:
+            templates, from_disk = await render_cache.get_or_render(
+                template_cache_key, lambda: _render_templates(command, values, priority, render_filter)
+            )
+            if from_disk:
+                perf_recorder.record_cache_hit(from_disk=True)
         template_cache[template_cache_key] = templates
-    return template_cache[template_cache_key]
+    finally:
+        del template_renders_in_flight[template_cache_key]
+
+
+async def get_helm_version() -> str:
+    global helm_version
+    if helm_version is None:
+        import pyhelm3
+
+        helm_version = (await pyhelm3.Command().run(["version", "--short"])).decode("utf-8").strip()
+    return helm_version
+
+
+async def _render_templates(
+    command: list[str], values: Any | None, priority: RenderPriority, render_filter: _RenderFilter | None = None
+) -> RenderedManifests:
+    import pyhelm3
+
+    async with render_scheduler.slot(priority):
+        started_at = time.monotonic()
+        rendered = (await pyhelm3.Command().run(command, json.dumps(materialise(values)).encode())).decode("utf-8")
+        helm_seconds = time.monotonic() - started_at
+
+    started_at = time.monotonic()
+    manifest_bytes = len(rendered)
+    if render_filter is not None:
+        # Only the manifests from templates that can emit the requested kinds are parsed, which
+        # is the bulk of the cost of a render of a large values file
+        rendered = _filter_rendered_documents(rendered, render_filter)
+    source_templates = _manifest_source_pattern.findall(rendered)
+    templates = await parse_manifests(rendered)
+    if render_filter is not None:
+        templates = [template for template in templates if template["kind"] in render_filter.kinds]
+    perf_recorder.record_render(
+        helm_seconds,
+        time.monotonic() - started_at,
+        manifest_bytes,
+        base_render=priority == RenderPriority.BASE and render_filter is None,
+    )
+    return RenderedManifests(templates, source_templates)
 
 
 @pytest.fixture
-def make_templates(chart: pyhelm3.Chart, release_name: str):
-    async def _make_templates(values, has_service_monitor_crd=True, skip_cache=False):
-        return await helm_template(chart, release_name, values, has_service_monitor_crd, skip_cache)
+def make_templates(request: pytest.FixtureRequest, chart: pyhelm3.Chart, release_name: str):
+    async def _make_templates(values, has_service_monitor_crd=True, skip_cache=False, kinds=None):
+        with perf_recorder.attribute_to(request.node):
+            await _compare_to_snapshot(request, chart, release_name)
+            return await helm_template(chart, release_name, values, has_service_monitor_crd, skip_cache, kinds=kinds)
 
     return _make_templates
 
@@ -277,25 +536,27 @@ def template_to_deployable_details(deployables_details: tuple[DeployableDetails]
     def _template_to_deployable_details(template: dict[str, Any]) -> DeployableDetails:
         # As per test_labels this doesn't have the release_name prefixed to it
         manifest_name: str = template["metadata"]["labels"]["app.kubernetes.io/name"]
+        if (deployables_details, manifest_name) in deployable_details_cache:
+            return deployable_details_cache[(deployables_details, manifest_name)]
 
         match = None
-        for deployable_details in deployables_details:
-            # We name the various DeployableDetails to match the name the chart should use for
-            # the manifest name and thus the app.kubernetes.io/name label above. e.g. A manifest
-            # belonging to Synapse should be named `<release-name>-synapse(-<optional extra>)`.
-            #
-            # When we find a matching (sub-)component we ensure that there has been no other
-            # match (with the exception of matching both a sub-component and its parent) as
-            # otherwise we have no way of identifying the associated DeployableDeploys and
-            # thus which parts of the values files need manipulating for this deployable.
-            if deployable_details.owns_manifest_named(manifest_name):
-                assert match is None, (
-                    f"{template_id(template)} could belong to at least 2 (sub-)components: "
-                    f"{match.name} and {deployable_details.name}"
-                )
-                match = deployable_details
+        # We name the various DeployableDetails to match the name the chart should use for
+        # the manifest name and thus the app.kubernetes.io/name label above. e.g. A manifest
+        # belonging to Synapse should be named `<release-name>-synapse(-<optional extra>)`.
+        #
+        # When we find a matching (sub-)component we ensure that there has been no other
+        # match (with the exception of matching both a sub-component and its parent) as
+        # otherwise we have no way of identifying the associated DeployableDeploys and
+        # thus which parts of the values files need manipulating for this deployable.
+        for deployable_details in deployable_ownership(deployables_details).owners_of(manifest_name):
+            assert match is None, (
+                f"{template_id(template)} could belong to at least 2 (sub-)components: "
+                f"{match.name} and {deployable_details.name}"
+            )
+            match = deployable_details
 
         assert match is not None, f"{template_id(template)} can't be linked to any (sub-)component"
+        deployable_details_cache[(deployables_details, manifest_name)] = match
         return match
 
     return _template_to_deployable_details
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+# Validates values files against the chart's values.schema.json without running helm, e.g. as a pre-commit hook.
+#
+# From the project root: `python -m tests.manifests.validate_values [values files...]`. With no values files
+# given every CI values file is validated.
+
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+from .values_schema import validate_values_files
+
+
+def validate_values(
+    values_files: Annotated[list[Path] | None, typer.Argument()] = None,
+    chart: Annotated[Path, typer.Option(help="The chart directory")] = Path("charts/matrix-stack"),
+    workers: Annotated[int | None, typer.Option(help="How many processes to validate the values files in")] = None,
+):
+    values_files = values_files or sorted((chart / "ci").glob("*-values.yaml"))
+    results = validate_values_files(chart, values_files, workers)
+    invalid_count = 0
+    for values_file, errors in results.items():
+        invalid_count += bool(errors)
+        for error in errors:
+            print(f"{values_file}: {error}")
+    print(f"{len(results) - invalid_count} of {len(results)} values files match {chart / 'values.schema.json'}")
+    if invalid_count:
+        raise typer.Exit(1)
+
+
+def main():
+    typer.run(validate_values)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import cache
+from types import MappingProxyType
+from typing import Any
+from weakref import WeakKeyDictionary
+
+from . import ComponentDetails, DeployableDetails, SubComponentDetails
+from .prefix_trie import PrefixTrie
+from .rendered_manifests import RenderedManifests
+
+
+class DeployableOwnership:
+    """Which of a set of (sub-)components own a manifest, looked up by a single walk of the manifest's name.
+
+    A deployable can only own manifests whose names start with its name, so only the deployables whose
+    names are a prefix of the manifest name are asked whether they own it.
+    """
+
+    def __init__(self, deployables_details: tuple[DeployableDetails]):
+        self._deployables_details = deployables_details
+        self._by_name = {deployable_details.name: deployable_details for deployable_details in deployables_details}
+        self._names = PrefixTrie(self._by_name)
+
+    def owners_of(self, manifest_name: str) -> list[DeployableDetails]:
+        candidates = {self._by_name[name] for name in self._names.prefixes_of(manifest_name)}
+        # In the order of the deployables, as a scan of every deployable would have found them
+        return [
+            deployable_details
+            for deployable_details in self._deployables_details
+            if deployable_details in candidates and deployable_details.owns_manifest_named(manifest_name)
+        ]
+
+
+@cache
+def deployable_ownership(deployables_details: tuple[DeployableDetails]) -> DeployableOwnership:
+    return DeployableOwnership(deployables_details)
+
+
+@dataclass(frozen=True)
+class ValuesIndex:
+    """What the test helpers look up from a values file over and over, computed once from it.
+
+    The index must not be used with values that have been modified since it was built.
+    """
+
+    # The (Secret name, key) of every credential the values reference in a Secret that isn't
+    # managed by the chart. The Secret name can contain `{{ $.Release.Name }}`
+    credentials: tuple[tuple[str, str], ...]
+    # The host of each (sub-)component with an ingress, or None if there isn't one configured
+    ingress_hosts: Mapping[DeployableDetails, str | None]
+    ownership: DeployableOwnership
+
+
+def _find_credentials(values_fragment: Any):
+    if isinstance(values_fragment, (Mapping, list)):
+        for value in values_fragment.values() if isinstance(values_fragment, Mapping) else values_fragment:
+            if isinstance(value, Mapping):
+                if "secret" in value and "secretKey" in value and len(value) == 2:
+                    yield (value["secret"], value["secretKey"])
+                # We don't care about credentials in the Helm values as those will
+                # be added to the Secret generated by the chart and won't be external
+                else:
+                    yield from _find_credentials(value)
+            elif isinstance(value, list):
+                yield from _find_credentials(value)
+
+
+def _ingress_host(values: Mapping[str, Any], deployable_details: DeployableDetails) -> str | None:
+    # Read without setdefault, unlike get_helm_values_fragment, as the values mustn't be modified
+    if isinstance(deployable_details, SubComponentDetails):
+        values_fragment = (values.get(deployable_details.parent_helm_key) or {}).get(deployable_details.helm_key) or {}
+    else:
+        values_fragment = values.get(deployable_details.helm_key) or {}
+    host = (values_fragment.get("ingress") or {}).get("host")
+    if not host and isinstance(deployable_details, ComponentDetails) and deployable_details.name == "well-known":
+        return values.get("serverName")
+    return host
+
+
+def build_values_index(values: Mapping[str, Any], deployables_details: tuple[DeployableDetails]) -> ValuesIndex:
+    return ValuesIndex(
+        credentials=tuple(_find_credentials(values)),
+        ingress_hosts=MappingProxyType(
+            {
+                deployable_details: _ingress_host(values, deployable_details)
+                for deployable_details in deployables_details
+                if deployable_details.has_ingress
+            }
+        ),
+        ownership=deployable_ownership(deployables_details),
+    )
+
+
+# The secrets and their keys, and the labels, requested from the init-secrets Job of each render.
+# Renders are shared between tests so this is parsed once per render
+_init_secrets_requests: WeakKeyDictionary[RenderedManifests, tuple[dict[str, tuple[str, ...]], dict[str, str]]] = (
+    WeakKeyDictionary()
+)
+
+
+def init_secrets_requests(
+    rendered: RenderedManifests, init_secrets_job_name: str
+) -> tuple[dict[str, tuple[str, ...]], dict[str, str]] | None:
+    """The keys of each Secret requested from the init-secrets Job and the labels they'll have.
+
+    None if the render doesn't have an init-secrets Job.
+    """
+    if rendered in _init_secrets_requests:
+        return _init_secrets_requests[rendered]
+
+    init_secrets_job = rendered.get("Job", init_secrets_job_name)
+    if init_secrets_job is None:
+        return None
+
+    command_line = (
+        init_secrets_job.get("spec", {})
+        .get("template", {})
+        .get("spec", {})
+        .get("containers", [{}])[0]
+        .get("command", {})
+    )
+    assert len(command_line) == 6, "Unexpected command line in the init-secrets job"
+    assert command_line[2] == "-secrets", "Can't find the secrets args for the init-secrets job"
+    assert command_line[4] == "-labels", "Can't find the labels args for the init-secrets job"
+
+    requested_labels = {label.split("=")[0]: label.split("=")[1] for label in command_line[5].split(",")}
+    secrets_to_keys: dict[str, list[str]] = {}
+    for requested_secret in command_line[3].split(","):
+        secret_parts = requested_secret.split(":")
+        secrets_to_keys.setdefault(secret_parts[0], []).append(secret_parts[1])
+
+    requests = ({secret: tuple(keys) for secret, keys in secrets_to_keys.items()}, requested_labels)
+    _init_secrets_requests[rendered] = requests
+    return requests
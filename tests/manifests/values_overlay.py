@@ -0,0 +1,157 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+import copy
+import hashlib
+import json
+from collections.abc import Iterator, Mapping, MutableMapping
+from typing import Any
+
+
+def _canonical_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, ValuesOverlay):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: _plain(sub_value) for key, sub_value in value.items()}
+    if isinstance(value, list):
+        return [_plain(sub_value) for sub_value in value]
+    return value
+
+
+def structural_hash(values: Any | None) -> str:
+    """A stable hash of the values that would be sent to helm.
+
+    For a ValuesOverlay this only serialises what has changed from its base. A ValuesOverlay
+    that hasn't been changed has the same hash as its base.
+    """
+    if isinstance(values, ValuesOverlay):
+        return values.structural_hash()
+    return hashlib.sha256(_canonical_json(values or {}).encode("utf-8")).hexdigest()
+
+
+def materialise(values: Any | None) -> dict[str, Any]:
+    """The values as plain dicts & lists, suitable for sending to helm.
+
+    The result shares structure with the base of any ValuesOverlay and so must not be modified.
+    """
+    if isinstance(values, ValuesOverlay):
+        return values.to_dict()
+    return values or {}
+
+
+class ValuesOverlay(MutableMapping[str, Any]):
+    """A copy-on-write view over a values dict that is shared between tests.
+
+    The base is never modified. Reading a nested dict returns a nested overlay over that part of
+    the base. Reading a list returns a private copy of it, which only counts as a change if it is
+    then modified. Setting or deleting a key is recorded in this overlay alone.
+    """
+
+    def __init__(self, base: Mapping[str, Any], base_hash: str | None = None):
+        self._base = base
+        self._base_hash = base_hash
+        self._changes: dict[str, Any] = {}
+        self._deleted: set[str] = set()
+        self._children: dict[str, ValuesOverlay] = {}
+        self._list_copies: dict[str, list[Any]] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._changes:
+            return self._changes[key]
+        if key in self._deleted:
+            raise KeyError(key)
+        if key in self._children:
+            return self._children[key]
+        if key in self._list_copies:
+            return self._list_copies[key]
+
+        value = self._base[key]
+        if isinstance(value, dict):
+            self._children[key] = ValuesOverlay(value)
+            return self._children[key]
+        if isinstance(value, list):
+            self._list_copies[key] = copy.deepcopy(value)
+            return self._list_copies[key]
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        self._children.pop(key, None)
+        self._list_copies.pop(key, None)
+        self._deleted.discard(key)
+        self._changes[key] = value
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        self._changes.pop(key, None)
+        self._children.pop(key, None)
+        self._list_copies.pop(key, None)
+        if key in self._base:
+            self._deleted.add(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._changes or (key in self._base and key not in self._deleted)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._base:
+            if key not in self._deleted:
+                yield key
+        for key in self._changes:
+            if key not in self._base:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> "ValuesOverlay":
+        overlay_copy = ValuesOverlay(self._base, self._base_hash)
+        overlay_copy._changes = copy.deepcopy(self._changes, memo)
+        overlay_copy._deleted = set(self._deleted)
+        overlay_copy._children = copy.deepcopy(self._children, memo)
+        overlay_copy._list_copies = copy.deepcopy(self._list_copies, memo)
+        return overlay_copy
+
+    def delta(self) -> dict[str, Any]:
+        """Everything that differs from the base, as plain JSON-able values."""
+        delta = {}
+        changes = {key: _plain(value) for key, value in self._changes.items()}
+        changes.update({key: value for key, value in self._list_copies.items() if value != self._base.get(key)})
+        if changes:
+            delta["set"] = changes
+        if self._deleted:
+            delta["deleted"] = sorted(self._deleted)
+        children = {key: child.delta() for key, child in self._children.items()}
+        children = {key: child_delta for key, child_delta in children.items() if child_delta}
+        if children:
+            delta["children"] = children
+        return delta
+
+    def structural_hash(self) -> str:
+        if self._base_hash is None:
+            self._base_hash = structural_hash(self._base)
+
+        delta = self.delta()
+        if not delta:
+            return self._base_hash
+        return hashlib.sha256(f"{self._base_hash}:{_canonical_json(delta)}".encode()).hexdigest()
+
+    def to_dict(self) -> dict[str, Any]:
+        result = {}
+        for key in self:
+            if key in self._changes:
+                result[key] = _plain(self._changes[key])
+            elif key in self._children:
+                result[key] = self._children[key].to_dict()
+            elif key in self._list_copies:
+                result[key] = self._list_copies[key]
+            else:
+                result[key] = self._base[key]
+        return result
@@ -0,0 +1,425 @@
+# Copyright 2025 New Vector Ltd
+#
+# SPDX-License-Identifier: AGPL-3.0-only
+
+# Validates values files against a chart's values.schema.json without running helm.
+#
+# The schema is compiled once into a tree of checks, one per schema node with only the keywords that node
+# uses, so validating a values file is a single walk of it. As with `helm lint` the values are first
+# coalesced with the chart's values.yaml, so a null in a values file removes the default.
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import re
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    # PyYAML built without libyaml. The pure-Python loader parses identically, just slower
+    from yaml import SafeLoader
+
+_identifier = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+ValuesPath = tuple[str | int, ...]
+
+
+@dataclass(frozen=True)
+class SchemaError:
+    # The keys and indices from the root of the values to the invalid value
+    path: ValuesPath
+    message: str
+
+    @property
+    def json_path(self) -> str:
+        parts = ["$"]
+        for part in self.path:
+            if isinstance(part, int):
+                parts.append(f"[{part}]")
+            elif _identifier.match(part):
+                parts.append(f".{part}")
+            else:
+                parts.append(f"[{json.dumps(part)}]")
+        return "".join(parts)
+
+    def __str__(self) -> str:
+        return f"{self.json_path}: {self.message}"
+
+
+class ValuesSchemaError(ValueError):
+    def __init__(self, source: str, errors: list[SchemaError]):
+        self.source = source
+        self.errors = errors
+        super().__init__(f"{source} doesn't match the values schema:\n" + "\n".join(f"  {error}" for error in errors))
+
+
+Check = Callable[[Any, ValuesPath, list[SchemaError]], None]
+
+
+def _json_type(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "integer" if value.is_integer() else "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    return type(value).__name__
+
+
+def _enum_key(value: Any) -> tuple[str, str]:
+    json_type = _json_type(value)
+    if json_type == "integer":
+        value = int(value)
+    return ("number" if json_type in ("integer", "number") else json_type, json.dumps(value, sort_keys=True))
+
+
+def _accept(value: Any, path: ValuesPath, errors: list[SchemaError]):
+    pass
+
+
+def _reject(value: Any, path: ValuesPath, errors: list[SchemaError]):
+    errors.append(SchemaError(path, "no value is allowed here"))
+
+
+def _matches(check: Check, value: Any, path: ValuesPath) -> bool:
+    errors: list[SchemaError] = []
+    check(value, path, errors)
+    return not errors
+
+
+def _type_check(types: str | list[str]) -> Check:
+    allowed = {types} if isinstance(types, str) else set(types)
+    # Every integer is also a number
+    if "number" in allowed:
+        allowed.add("integer")
+    expected = " or ".join(sorted(allowed - {"integer"} if "number" in allowed else allowed))
+
+    def check(value: Any, path: ValuesPath, errors: list[SchemaError]):
+        json_type = _json_type(value)
+        if json_type not in allowed:
+            errors.append(SchemaError(path, f"got {json_type}, want {expected}"))
+
+    return check
+
+
+def _object_check(schema: dict[str, Any]) -> Check:
+    property_checks = {name: compile_schema(sub_schema) for name, sub_schema in schema.get("properties", {}).items()}
+    property_names = frozenset(property_checks)
+    pattern_checks = [
+        (re.compile(pattern), compile_schema(sub_schema))
+        for pattern, sub_schema in schema.get("patternProperties", {}).items()
+    ]
+    additional = schema.get("additionalProperties", True)
+    additional_check = None if isinstance(additional, bool) else compile_schema(additional)
+    required = tuple(schema.get("required", ()))
+    min_properties = schema.get("minProperties")
+    max_properties = schema.get("maxProperties")
+
+    def check(value: Any, path: ValuesPath, errors: list[SchemaError]):
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                errors.append(SchemaError(path, f"missing property {name!r}"))
+        if min_properties is not None and len(value) < min_properties:
+            errors.append(SchemaError(path, f"has {len(value)} properties, want at least {min_properties}"))
+        if max_properties is not None and len(value) > max_properties:
+            errors.append(SchemaError(path, f"has {len(value)} properties, want at most {max_properties}"))
+
+        if additional is False and not pattern_checks:
+            extra = value.keys() - property_names
+            if extra:
+                names = ", ".join(repr(name) for name in sorted(extra, key=str))
+                errors.append(SchemaError(path, f"additional properties {names} not allowed"))
+        for name, item in value.items():
+            property_check = property_checks.get(name)
+            if property_check is not None:
+                property_check(item, path + (name,), errors)
+            if not pattern_checks:
+                if property_check is None and additional_check is not None:
+                    additional_check(item, path + (name,), errors)
+                continue
+
+            matched_pattern = False
+            for pattern, pattern_check in pattern_checks:
+                if pattern.search(name):
+                    matched_pattern = True
+                    pattern_check(item, path + (name,), errors)
+            if property_check is None and not matched_pattern:
+                if additional is False:
+                    errors.append(SchemaError(path, f"additional properties {name!r} not allowed"))
+                elif additional_check is not None:
+                    additional_check(item, path + (name,), errors)
+
+    return check
+
+
+def _array_check(schema: dict[str, Any]) -> Check:
+    items_check = compile_schema(schema["items"]) if "items" in schema else None
+    min_items = schema.get("minItems")
+    max_items = schema.get("maxItems")
+    unique_items = schema.get("uniqueItems", False)
+
+    def check(value: Any, path: ValuesPath, errors: list[SchemaError]):
+        if not isinstance(value, list):
+            return
+        if min_items is not None and len(value) < min_items:
+            errors.append(SchemaError(path, f"has {len(value)} items, want at least {min_items}"))
+        if max_items is not None and len(value) > max_items:
+            errors.append(SchemaError(path, f"has {len(value)} items, want at most {max_items}"))
+        if unique_items and len({_enum_key(item) for item in value}) != len(value):
+            errors.append(SchemaError(path, "items aren't unique"))
+        if items_check is not None:
+            for index, item in enumerate(value):
+                items_check(item, path + (index,), errors)
+
+    return check
+
+
+def _string_check(schema: dict[str, Any]) -> Check:
+    pattern = re.compile(schema["pattern"]) if "pattern" in schema else None
+    min_length = schema.get("minLength")
+    max_length = schema.get("maxLength")
+
+    def check(value: Any, path: ValuesPath, errors: list[SchemaError]):
+        if not isinstance(value, str):
+            return
+        if pattern is not None and not pattern.search(value):
+            errors.append(SchemaError(path, f"{value!r} doesn't match pattern {pattern.pattern!r}"))
+        if min_length is not None and len(value) < min_length:
+            errors.append(SchemaError(path, f"is {len(value)} characters long, want at least {min_length}"))
+        if max_length is not None and len(value) > max_length:
+            errors.append(SchemaError(path, f"is {len(value)} characters long, want at most {max_length}"))
+
+    return check
+
+
+def _number_check(schema: dict[str, Any]) -> Check:
+    bounds = [
+        (schema.get("minimum"), lambda value, bound: value >= bound, "at least"),
+        (schema.get("maximum"), lambda value, bound: value <= bound, "at most"),
+        (schema.get("exclusiveMinimum"), lambda value, bound: value > bound, "more than"),
+        (schema.get("exclusiveMaximum"), lambda value, bound: value < bound, "less than"),
+    ]
+    bounds = [(bound, within, description) for bound, within, description in bounds if bound is not None]
+    multiple_of = schema.get("multipleOf")
+
+    def check(value: Any, path: ValuesPath, errors: list[SchemaError]):
+        if isinstance(value, bool) or not isinstance(value, int | float):
+            return
+        for bound, within, description in bounds:
+            if not within(value, bound):
+                errors.append(SchemaError(path, f"is {value}, want {description} {bound}"))
+        if multiple_of is not None and (value / multiple_of) != int(value / multiple_of):
+            errors.append(SchemaError(path, f"is {value}, want a multiple of {multiple_of}"))
+
+    return check
+
+
+def _enum_check(options: list[Any], keyword: str) -> Check:
+    allowed = frozenset(_enum_key(option) for option in options)
+    description = json.dumps(options[0]) if keyword == "const" else json.dumps(options)
+
+    def check(value: Any, path: ValuesPath, errors: list[SchemaError]):
+        if _enum_key(value) not in allowed:
+            want = description if keyword == "const" else f"one of {description}"
+            errors.append(SchemaError(path, f"is {json.dumps(value)}, want {want}"))
+
+    return check
+
+
+def _combination_check(keyword: str, sub_schemas: list[Any]) -> Check:
+    sub_checks = [compile_schema(sub_schema) for sub_schema in sub_schemas]
+
+    def check(value: Any, path: ValuesPath, errors: list[SchemaError]):
+        if keyword == "allOf":
+            for sub_check in sub_checks:
+                sub_check(value, path, errors)
+            return
+        matches = sum(_matches(sub_check, value, path) for sub_check in sub_checks)
+        if keyword == "anyOf" and matches == 0:
+            errors.append(SchemaError(path, "doesn't match any of the anyOf schemas"))
+        elif keyword == "oneOf" and matches != 1:
+            errors.append(SchemaError(path, f"matches {matches} of the oneOf schemas, want exactly 1"))
+
+    return check
+
+
+def _not_check(sub_schema: Any) -> Check:
+    sub_check = compile_schema(sub_schema)
+
+    def check(value: Any, path: ValuesPath, errors: list[SchemaError]):
+        if _matches(sub_check, value, path):
+            errors.append(SchemaError(path, "matches a schema it mustn't"))
+
+    return check
+
+
+_keyword_groups: dict[str, Callable[[dict[str, Any]], Check]] = {
+    "object": _object_check,
+    "array": _array_check,
+    "string": _string_check,
+    "number": _number_check,
+}
+_object_keywords = {"properties", "patternProperties", "additionalProperties", "required"}
+_object_keywords |= {"minProperties", "maxProperties"}
+_array_keywords = {"items", "minItems", "maxItems", "uniqueItems"}
+_string_keywords = {"pattern", "minLength", "maxLength"}
+_number_keywords = {"minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum", "multipleOf"}
+
+
+def compile_schema(schema: Any) -> Check:
+    """Compiles a JSON schema, with any sub-schemas already inlined, into a function that checks a value against it."""
+    if schema is True or schema == {}:
+        return _accept
+    if schema is False:
+        return _reject
+    if "$ref" in schema:
+        raise ValueError(f"$ref {schema['$ref']} must be inlined before the schema is compiled")
+
+    checks: list[Check] = []
+    if "type" in schema:
+        checks.append(_type_check(schema["type"]))
+    if "enum" in schema:
+        checks.append(_enum_check(schema["enum"], "enum"))
+    if "const" in schema:
+        checks.append(_enum_check([schema["const"]], "const"))
+    for group, keywords in (
+        ("object", _object_keywords),
+        ("array", _array_keywords),
+        ("string", _string_keywords),
+        ("number", _number_keywords),
+    ):
+        if keywords & schema.keys():
+            checks.append(_keyword_groups[group](schema))
+    for keyword in ("allOf", "anyOf", "oneOf"):
+        if keyword in schema:
+            checks.append(_combination_check(keyword, schema[keyword]))
+    if "not" in schema:
+        checks.append(_not_check(schema["not"]))
+
+    if not checks:
+        return _accept
+    if len(checks) == 1:
+        return checks[0]
+
+    def check(value: Any, path: ValuesPath, errors: list[SchemaError]):
+        for keyword_check in checks:
+            keyword_check(value, path, errors)
+
+    return check
+
+
+def coalesce(values: dict[str, Any], defaults: dict[str, Any]) -> dict[str, Any]:
+    """The values over the chart defaults as helm combines them, where a null value removes the default."""
+    coalesced = dict(values)
+    for key, default in defaults.items():
+        if key not in coalesced:
+            coalesced[key] = default
+        elif coalesced[key] is None:
+            del coalesced[key]
+        elif isinstance(coalesced[key], dict) and isinstance(default, dict):
+            coalesced[key] = coalesce(coalesced[key], default)
+    return coalesced
+
+
+class ValuesSchema:
+    """A chart's values.schema.json compiled into checks, along with the chart's default values."""
+
+    def __init__(self, schema: dict[str, Any], defaults: dict[str, Any] | None = None):
+        self._check = compile_schema(schema)
+        self.defaults = defaults or {}
+
+    @classmethod
+    def from_chart(cls, chart_dir: Path) -> ValuesSchema:
+        schema = json.loads((chart_dir / "values.schema.json").read_text("utf-8"))
+        defaults = yaml.load((chart_dir / "values.yaml").read_text("utf-8"), Loader=SafeLoader)
+        return cls(schema, defaults)
+
+    def errors(self, values: Any) -> list[SchemaError]:
+        """How the values, once coalesced with the chart defaults, don't match the schema."""
+        errors: list[SchemaError] = []
+        self._check(coalesce(values or {}, self.defaults) if isinstance(values, dict | None) else values, (), errors)
+        return errors
+
+    def validate(self, values: Any, source: str = "values"):
+        errors = self.errors(values)
+        if errors:
+            raise ValuesSchemaError(source, errors)
+
+
+@cache
+def _chart_values_schema(chart_dir: Path, schema_mtime_ns: int, values_mtime_ns: int) -> ValuesSchema:
+    return ValuesSchema.from_chart(chart_dir)
+
+
+def chart_values_schema(chart_dir: Path) -> ValuesSchema | None:
+    """The compiled schema of a chart directory, recompiled if it changes, or None if the chart hasn't a schema."""
+    try:
+        return _chart_values_schema(
+            chart_dir,
+            (chart_dir / "values.schema.json").stat().st_mtime_ns,
+            (chart_dir / "values.yaml").stat().st_mtime_ns,
+        )
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def validate_values_file(values_schema: ValuesSchema, values_file: Path) -> list[SchemaError]:
+    return values_schema.errors(yaml.load(values_file.read_text("utf-8"), Loader=SafeLoader))
+
+
+# Set in each worker process, so that the schema is compiled once per worker rather than once per file
+_worker_values_schema: ValuesSchema | None = None
+
+
+def _initialise_worker(chart_dir: Path):
+    global _worker_values_schema
+    _worker_values_schema = ValuesSchema.from_chart(chart_dir)
+
+
+def _validate_in_worker(values_file: Path) -> list[SchemaError]:
+    return validate_values_file(_worker_values_schema, values_file)
+
+
+# Below this many files it's quicker to validate them in-process than to start worker processes
+_parallel_threshold = 16
+
+
+def validate_values_files(
+    chart_dir: Path, values_files: Iterable[Path], workers: int | None = None
+) -> dict[Path, list[SchemaError]]:
+    """The schema errors of each values file, validating them across worker processes if there are many."""
+    values_files = list(values_files)
+    workers = workers or (len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1)
+    if len(values_files) < _parallel_threshold or workers == 1:
+        values_schema = ValuesSchema.from_chart(chart_dir)
+        return {values_file: validate_values_file(values_schema, values_file) for values_file in values_files}
+
+    with ProcessPoolExecutor(
+        min(workers, len(values_files)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_initialise_worker,
+        initargs=(chart_dir,),
+    ) as executor:
+        chunksize = max(1, len(values_files) // (workers * 4))
+        results = executor.map(_validate_in_worker, values_files, chunksize=chunksize)
+        return dict(zip(values_files, results, strict=True))